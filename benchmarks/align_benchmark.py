@@ -0,0 +1,139 @@
+# pylint: disable=C0114, C0116, E1101, R0913, R0914, R0917, W0718
+"""Benchmark of pooled OpenCV feature detectors, descriptors and matchers.
+
+Every detector/descriptor/matching combination accepted by validate_align_config is
+timed on synthetic frame pairs, once creating new OpenCV objects for each frame, as
+done before pooling, and once reusing the per-thread pooled objects. The time taken
+to create the objects of one frame, which is what pooling saves, is reported separately.
+
+Examples:
+    python benchmarks/align_benchmark.py --frames 10 --megapixels 2 -o align-bench.json
+    python benchmarks/align_benchmark.py --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pipeline_benchmark import frame_size, make_texture, environment  # noqa: E402
+from shinestacker.config.constants import constants  # noqa: E402
+from shinestacker.algorithms.align import (  # noqa: E402
+    validate_align_config, detect_and_compute, clear_pool, feature_detector,
+    feature_descriptor, flann_matcher, hamming_matcher)
+
+
+def combinations():
+    for detector, descriptor, match_method in itertools.product(
+            constants.VALID_DETECTORS, constants.VALID_DESCRIPTORS,
+            constants.VALID_MATCHING_METHODS):
+        try:
+            validate_align_config(detector, descriptor, match_method)
+        except ValueError:
+            continue
+        yield detector, descriptor, match_method
+
+
+def make_frames(frames, megapixels, seed=0):
+    rng = np.random.default_rng(seed)
+    w, h = frame_size(megapixels)
+    texture = (make_texture(rng, w, h) * 255).astype(np.uint8)
+    pairs = []
+    for _ in range(frames):
+        m = np.float32([[1, 0, rng.uniform(-5, 5)], [0, 1, rng.uniform(-5, 5)]])
+        pairs.append((cv2.warpAffine(texture, m, (w, h), borderMode=cv2.BORDER_REFLECT),
+                      texture))
+    return pairs
+
+
+def creation_time(detector, descriptor, match_method, repeat=100):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        clear_pool()
+        feature_detector(detector)
+        feature_descriptor(descriptor)
+        if match_method == constants.MATCHING_KNN:
+            flann_matcher(constants.DEFAULT_FLANN_IDX_KDTREE, constants.DEFAULT_FLANN_TREES,
+                          constants.DEFAULT_FLANN_CHECKS)
+        else:
+            hamming_matcher()
+    clear_pool()
+    return (time.perf_counter() - t0) / repeat
+
+
+def run_frames(pairs, feature_config, matching_config, pooled, workers):
+    def run(pair):
+        if not pooled:
+            clear_pool()
+        return len(detect_and_compute(*pair, feature_config, matching_config)[2])
+
+    t0 = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            n_matches = list(executor.map(run, pairs))
+    else:
+        n_matches = [run(pair) for pair in pairs]
+    return (time.perf_counter() - t0) / len(pairs), n_matches
+
+
+def run_benchmark(frames=10, megapixels=2.0, repeat=3, workers=1, seed=0):
+    pairs = make_frames(frames, megapixels, seed)
+    results = {}
+    for detector, descriptor, match_method in combinations():
+        key = f"{detector}/{descriptor}/{match_method}"
+        feature_config = {'detector': detector, 'descriptor': descriptor}
+        matching_config = {'match_method': match_method}
+        try:
+            # warm up the pool of every worker thread
+            run_frames(pairs, feature_config, matching_config, True, workers)
+            times = {}
+            for pooled in (False, True):
+                runs = [run_frames(pairs, feature_config, matching_config, pooled, workers)
+                        for _ in range(repeat)]
+                times[pooled] = min(r[0] for r in runs)
+            results[key] = {'unpooled_time': times[False], 'pooled_time': times[True],
+                            'saving': times[False] - times[True],
+                            'creation_time': creation_time(detector, descriptor, match_method),
+                            'matches': runs[-1][1]}
+        except (cv2.error, AttributeError) as e:
+            results[key] = {'error': str(e)}
+    return {'parameters': {'frames': frames, 'megapixels': megapixels, 'repeat': repeat,
+                           'workers': workers, 'seed': seed},
+            'environment': environment(), 'combinations': results}
+
+
+def report(results):
+    print(f"{'combination':<24} {'unpooled':>12} {'pooled':>12} {'saving':>12} "
+          f"{'creation':>12}")
+    for key, r in results['combinations'].items():
+        if 'error' in r:
+            print(f"{key:<24} not available: {r['error'].splitlines()[0]}")
+        else:
+            print(f"{key:<24} {r['unpooled_time'] * 1000:9.2f} ms "
+                  f"{r['pooled_time'] * 1000:9.2f} ms {r['saving'] * 1000:9.2f} ms "
+                  f"{r['creation_time'] * 1000:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=10, help='number of frame pairs')
+    parser.add_argument('--megapixels', type=float, default=2.0, help='frame size in megapixels')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions, the best is kept')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker threads')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('-o', '--output', help='JSON output file')
+    args = parser.parse_args()
+    results = run_benchmark(args.frames, args.megapixels, args.repeat, args.workers, args.seed)
+    report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+# pylint: disable=C0114, C0116, E1101, R0913, R0914, R0917, W0718
+"""Time and memory benchmark of the stacking pipeline on synthetic focus brackets.
+
+Stages run in order, each one in a fresh process. Balancing and stacking use the
+aligned frames when AlignFrames is among the selected stages, the raw frames otherwise.
+
+Examples:
+    python benchmarks/pipeline_benchmark.py --frames 10 --megapixels 4 --bits 16 -o bench.json
+    python benchmarks/pipeline_benchmark.py --compare bench-old.json bench.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import multiprocessing
+import numpy as np
+import cv2
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STAGES = ['AlignFrames', 'BalanceFrames', 'Vignetting', 'MaskNoise',
+          'PyramidStack', 'DepthMapStack', 'write_multilayer_tiff']
+FRAMES_PATH = 'frames'
+ALIGNED_PATH = 'aligned'
+NOISE_MAP = 'noise-map/hot_pixels.png'
+
+
+def frame_size(megapixels):
+    w = int(np.sqrt(megapixels * 1e6 * 3 / 2))
+    return w, int(w * 2 / 3)
+
+
+def make_texture(rng, w, h):
+    texture = np.zeros((h, w, 3), dtype=np.float32)
+    for scale, weight in ((4, 0.4), (16, 0.3), (64, 0.2), (256, 0.1)):
+        small = rng.random((max(2, h // scale), max(2, w // scale), 3), dtype=np.float32)
+        texture += weight * cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    for _ in range(max(50, w * h // 20000)):
+        center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+        color = tuple(float(c) for c in rng.random(3))
+        cv2.circle(texture, center, int(rng.integers(2, 12)), color, -1)
+    return np.clip(texture, 0, 1)
+
+
+def make_depth(rng, w, h):
+    small = rng.random((4, 6), dtype=np.float32)
+    depth = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    depth = 0.5 * depth + 0.5 * np.linspace(0, 1, w, dtype=np.float32)[np.newaxis, :]
+    return (depth - depth.min()) / max(depth.max() - depth.min(), 1e-6)
+
+
+def make_focus_bracket(working_path, frames=10, megapixels=4.0, bits=8, seed=0,
+                       max_blur=6.0, extension='tif'):
+    rng = np.random.default_rng(seed)
+    w, h = frame_size(megapixels)
+    texture = make_texture(rng, w, h)
+    depth = make_depth(rng, w, h)
+    sigmas = [0.0, 1.0, 2.0, 4.0, max_blur]
+    blurred = [texture if s == 0 else cv2.GaussianBlur(texture, (0, 0), s) for s in sigmas]
+    y, x = np.ogrid[:h, :w]
+    radius = np.sqrt((x - w / 2)**2 + (y - h / 2)**2) / np.sqrt((w / 2)**2 + (h / 2)**2)
+    vignette = (1.0 - 0.35 * radius**2).astype(np.float32)[..., np.newaxis]
+    hot_pixels = (rng.integers(0, h, 50), rng.integers(0, w, 50))
+    max_val = 255 if bits == 8 else 65535
+    dtype = np.uint8 if bits == 8 else np.uint16
+    os.makedirs(os.path.join(working_path, FRAMES_PATH), exist_ok=True)
+    for i in range(frames):
+        focus = i / max(1, frames - 1)
+        sigma = np.abs(depth - focus) * max_blur
+        level = np.interp(sigma, sigmas, np.arange(len(sigmas))).astype(np.float32)
+        img = np.zeros_like(texture)
+        for j, b in enumerate(blurred):
+            weight = np.clip(1.0 - np.abs(level - j), 0, 1)[..., np.newaxis]
+            img += weight * b
+        img *= vignette * rng.uniform(0.95, 1.05)
+        scale = 1.0 + 0.002 * (i - frames / 2)
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), 0, scale)
+        m[:, 2] += rng.uniform(-3, 3, 2)
+        img = cv2.warpAffine(img, m, (w, h), borderMode=cv2.BORDER_REFLECT)
+        img = (np.clip(img, 0, 1) * max_val).astype(dtype)
+        img[hot_pixels] = max_val
+        cv2.imwrite(os.path.join(working_path, FRAMES_PATH, f"{i:04d}.{extension}"), img)
+    noise_map = np.zeros((h, w, 3), dtype=np.uint8)
+    noise_map[hot_pixels] = 255
+    os.makedirs(os.path.join(working_path, os.path.dirname(NOISE_MAP)), exist_ok=True)
+    cv2.imwrite(os.path.join(working_path, NOISE_MAP), noise_map)
+
+
+def run_stage(stage, working_path):
+    # pylint: disable=C0415
+    from shinestacker.core.logging import setup_logging
+    from shinestacker.algorithms.stack_framework import StackJob, CombinedActions
+    from shinestacker.algorithms.align import AlignFrames
+    from shinestacker.algorithms.balance import BalanceFrames
+    from shinestacker.algorithms.vignetting import Vignetting
+    from shinestacker.algorithms.noise_detection import MaskNoise
+    from shinestacker.algorithms.stack import FocusStack
+    from shinestacker.algorithms.pyramid import PyramidStack
+    from shinestacker.algorithms.depth_map import DepthMapStack
+    from shinestacker.algorithms.multilayer import write_multilayer_tiff
+    setup_logging(console_level=logging.WARNING, log_file=None)
+    frames_path = os.path.join(working_path, FRAMES_PATH)
+    aligned_path = ALIGNED_PATH if os.path.isdir(os.path.join(working_path, ALIGNED_PATH)) \
+        else FRAMES_PATH
+    if stage == 'write_multilayer_tiff':
+        files = [os.path.join(frames_path, f) for f in sorted(os.listdir(frames_path))]
+        write_multilayer_tiff(files, os.path.join(working_path, 'multilayer.tif'))
+        return
+    if stage in ('PyramidStack', 'DepthMapStack'):
+        algo = PyramidStack() if stage == 'PyramidStack' else DepthMapStack()
+        job = StackJob('benchmark', working_path, input_path=aligned_path)
+        job.add_action(FocusStack(stage, algo, output_path=f"stack-{stage}",
+                                  plot_stack=False))
+    else:
+        sub_action = {
+            'AlignFrames': AlignFrames,
+            'BalanceFrames': BalanceFrames,
+            'Vignetting': Vignetting,
+            'MaskNoise': lambda: MaskNoise(noise_mask=NOISE_MAP)
+        }[stage]()
+        input_path = aligned_path if stage == 'BalanceFrames' else FRAMES_PATH
+        output_path = ALIGNED_PATH if stage == 'AlignFrames' else f"out-{stage}"
+        job = StackJob('benchmark', working_path, input_path=input_path)
+        job.add_action(CombinedActions(stage, [sub_action], output_path=output_path))
+    job.run()
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure_stage(stage, working_path, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    wall_0, cpu_0 = time.perf_counter(), time.process_time()
+    run_stage(stage, working_path)
+    result = {'wall_time': time.perf_counter() - wall_0,
+              'cpu_time': time.process_time() - cpu_0,
+              'peak_rss': peak_rss_bytes()}
+    if trace_memory:
+        result['traced_peak'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def measure_stage_in_subprocess(stage, working_path, trace_memory):
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(measure_stage, (stage, working_path, trace_memory))
+
+
+def run_benchmark(frames=10, megapixels=4.0, bits=8, seed=0, repeat=1, stages=None,
+                  trace_memory=False, extension='tif', working_path=None):
+    stages = stages or STAGES
+    own_dir = working_path is None
+    working_path = working_path or tempfile.mkdtemp(prefix='shinestacker-bench-')
+    try:
+        t0 = time.perf_counter()
+        make_focus_bracket(working_path, frames, megapixels, bits, seed, extension=extension)
+        generation_time = time.perf_counter() - t0
+        results = {}
+        for stage in [s for s in STAGES if s in stages]:
+            runs = [measure_stage_in_subprocess(stage, working_path, trace_memory)
+                    for _ in range(repeat)]
+            results[stage] = summarize(runs)
+            print(f"{stage:24s} wall: {results[stage]['wall_time']:8.3f}s  "
+                  f"cpu: {results[stage]['cpu_time']:8.3f}s  "
+                  f"peak RSS: {format_bytes(results[stage]['peak_rss'])}", flush=True)
+    finally:
+        if own_dir:
+            shutil.rmtree(working_path, ignore_errors=True)
+    w, h = frame_size(megapixels)
+    return {
+        'environment': environment(),
+        'parameters': {'frames': frames, 'megapixels': megapixels, 'width': w, 'height': h,
+                       'bits': bits, 'seed': seed, 'repeat': repeat, 'format': extension},
+        'generation_time': generation_time,
+        'stages': results
+    }
+
+
+def summarize(runs):
+    summary = {'runs': runs}
+    for key in ('wall_time', 'cpu_time'):
+        summary[key] = float(np.median([r[key] for r in runs]))
+    for key in ('peak_rss', 'traced_peak'):
+        values = [r[key] for r in runs if r.get(key) is not None]
+        summary[key] = max(values) if values else None
+    return summary
+
+
+def environment():
+    try:
+        from shinestacker import __version__  # pylint: disable=C0415
+    except ImportError:
+        __version__ = 'unknown'
+    return {'shinestacker': __version__, 'python': platform.python_version(),
+            'numpy': np.__version__, 'opencv': cv2.__version__,
+            'platform': platform.platform(), 'machine': platform.machine(),
+            'cpu_count': os.cpu_count(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def format_bytes(value):
+    return 'n/a' if value is None else f"{value / 2**20:9.1f} MB"
+
+
+def compare(baseline_file, current_file, threshold=0.1):
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_file, encoding='utf-8') as f:
+        current = json.load(f)
+    if baseline['parameters'] != current['parameters']:
+        print("warning: benchmark parameters differ", file=sys.stderr)
+    regressions = []
+    print(f"{'stage':24s} {'metric':10s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for stage, res in current['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base is None:
+            continue
+        for key in ('wall_time', 'cpu_time', 'peak_rss'):
+            if base.get(key) in (None, 0) or res.get(key) is None:
+                continue
+            change = res[key] / base[key] - 1
+            flag = ' <-- regression' if change > threshold else ''
+            if flag:
+                regressions.append((stage, key))
+            print(f"{stage:24s} {key:10s} {base[key]:12.4g} {res[key]:12.4g} "
+                  f"{change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=10, help='number of frames')
+    parser.add_argument('--megapixels', type=float, default=4.0, help='frame size in megapixels')
+    parser.add_argument('--bits', type=int, choices=[8, 16], default=8, help='bit depth')
+    parser.add_argument('--format', choices=['tif', 'png', 'jpg'], default='tif',
+                        help='frame file format')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--repeat', type=int, default=1, help='repetitions per stage')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, help='stages to run')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record the peak of traced Python/numpy allocations')
+    parser.add_argument('--working-path', help='keep generated data in this directory')
+    parser.add_argument('-o', '--output', help='JSON output file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two JSON result files')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative change reported as regression')
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    if args.bits == 16 and args.format == 'jpg':
+        parser.error("16-bit frames can't be saved as JPEG")
+    if args.working_path:
+        os.makedirs(args.working_path, exist_ok=True)
+    results = run_benchmark(args.frames, args.megapixels, args.bits, args.seed, args.repeat,
+                            args.stages, args.trace_memory, args.format, args.working_path)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
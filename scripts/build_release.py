@@ -19,6 +19,11 @@ sys_name = platform.system().lower()
 pyinstaller_cmd = ["pyinstaller", "--onedir", f"--name={app_name}", "--paths=src",
                    f"--distpath=dist/{package_dir}", f"--collect-all={project_name}",
                    "--collect-data=imagecodecs", "--collect-submodules=imagecodecs", "--copy-metadata=imagecodecs"]
+# modules imported lazily are not detected by the dependency analysis
+lazy_imports = ["matplotlib.pyplot", "matplotlib.backends.backend_agg", "matplotlib.backends.backend_pdf",
+                "scipy.optimize", "scipy.interpolate", "tifffile", "psdtags", "PIL.Image",
+                "PIL.TiffImagePlugin", "PIL.ExifTags"]
+pyinstaller_cmd += [f"--hidden-import={m}" for m in lazy_imports]
 if sys_name == 'darwin':
     pyinstaller_cmd += ["--windowed", "--icon=src/shinestacker/gui/ico/shinestacker.icns"]
 elif sys_name == 'windows':
@@ -1,13 +1,19 @@
 # pylint: disable=C0114, C0115, C0116, E1101, R0914, R0913, R0917, R0912, R0915, R0902
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
 import cv2
 from .. config.constants import constants
 from .. core.exceptions import AlignmentError, InvalidOptionError
 from .. core.colors import color_str
-from .utils import img_8bit, img_bw_8bit, save_plot, get_img_metadata, validate_image, img_subsample
-from .stack_framework import SubAction
+from .. core.core_utils import lazy_import
+from .utils import (img_8bit, img_bw_8bit, save_plot, get_img_metadata, validate_image,
+                    img_subsample, read_img, plt)
+from .stack_framework import SubAction, transform_coords
+
+optimize = lazy_import('scipy.optimize')
+sparse = lazy_import('scipy.sparse')
 
 _DEFAULT_FEATURE_CONFIG = {
     'detector': constants.DEFAULT_DETECTOR,
@@ -34,7 +40,10 @@ _DEFAULT_ALIGNMENT_CONFIG = {
     'border_blur': constants.DEFAULT_BORDER_BLUR,
     'subsample': constants.DEFAULT_ALIGN_SUBSAMPLE,
     'fast_subsampling': constants.DEFAULT_ALIGN_FAST_SUBSAMPLING,
-    'min_good_matches': constants.DEFAULT_ALIGN_MIN_GOOD_MATCHES
+    'min_good_matches': constants.DEFAULT_ALIGN_MIN_GOOD_MATCHES,
+    'solver': constants.DEFAULT_ALIGN_SOLVER,
+    'phase_scale': constants.DEFAULT_PHASE_SCALE,
+    'min_phase_response': constants.DEFAULT_MIN_PHASE_RESPONSE
 }
 
 
@@ -45,20 +54,75 @@ _cv2_border_mode_map = {
 }
 
 
+_detector_factories = {
+    constants.DETECTOR_SIFT: 'SIFT_create',
+    constants.DETECTOR_ORB: 'ORB_create',
+    constants.DETECTOR_SURF: 'FastFeatureDetector_create',
+    constants.DETECTOR_AKAZE: 'AKAZE_create',
+    constants.DETECTOR_BRISK: 'BRISK_create'
+}
+
+_descriptor_factories = {
+    constants.DESCRIPTOR_SIFT: 'SIFT_create',
+    constants.DESCRIPTOR_ORB: 'ORB_create',
+    constants.DESCRIPTOR_AKAZE: 'AKAZE_create',
+    constants.DESCRIPTOR_BRISK: 'BRISK_create'
+}
+
+_pool = threading.local()
+
+
+def pooled(key, factory, *args, **kwargs):
+    """Per-thread instance of an OpenCV object, created on first use.
+
+    OpenCV feature and matcher objects are not safe to share between threads,
+    each worker thread gets its own instances.
+    """
+    objects = getattr(_pool, 'objects', None)
+    if objects is None:
+        objects = _pool.objects = {}
+    obj = objects.get(key, None)
+    if obj is None:
+        obj = objects[key] = factory(*args, **kwargs)
+    return obj
+
+
+def clear_pool():
+    _pool.objects = {}
+
+
+def feature_detector(name):
+    factory = _detector_factories[name]
+    return pooled(factory, getattr(cv2, factory))
+
+
+def feature_descriptor(name):
+    factory = _descriptor_factories[name]
+    return pooled(factory, getattr(cv2, factory))
+
+
+def flann_matcher(idx_kdtree, trees, checks):
+    return pooled(('FlannBasedMatcher', idx_kdtree, trees, checks), cv2.FlannBasedMatcher,
+                  {'algorithm': idx_kdtree, 'trees': trees}, {'checks': checks})
+
+
+def hamming_matcher():
+    return pooled(('BFMatcher', cv2.NORM_HAMMING), cv2.BFMatcher, cv2.NORM_HAMMING,
+                  crossCheck=True)
+
+
 def get_good_matches(des_0, des_1, matching_config=None):
     matching_config = {**_DEFAULT_MATCHING_CONFIG, **(matching_config or {})}
     match_method = matching_config['match_method']
     good_matches = []
     if match_method == constants.MATCHING_KNN:
-        flann = cv2.FlannBasedMatcher(
-            {'algorithm': matching_config['flann_idx_kdtree'],
-             'trees': matching_config['flann_trees']},
-            {'checks': matching_config['flann_checks']})
+        flann = flann_matcher(matching_config['flann_idx_kdtree'],
+                              matching_config['flann_trees'], matching_config['flann_checks'])
         matches = flann.knnMatch(des_0, des_1, k=2)
         good_matches = [m for m, n in matches
                         if m.distance < matching_config['threshold'] * n.distance]
     elif match_method == constants.MATCHING_NORM_HAMMING:
-        bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        bf = hamming_matcher()
         good_matches = sorted(bf.match(des_0, des_1), key=lambda x: x.distance)
     else:
         raise InvalidOptionError(
@@ -87,38 +151,25 @@ def validate_align_config(detector, descriptor, match_method):
                          " require matching method Hamming distance")
 
 
+def compute_features(img, feature_config):
+    img_bw = img_bw_8bit(img)
+    detector = feature_detector(feature_config['detector'])
+    if feature_config['detector'] == feature_config['descriptor'] and \
+       feature_config['detector'] in (constants.DETECTOR_SIFT,
+                                      constants.DETECTOR_AKAZE,
+                                      constants.DETECTOR_BRISK):
+        return detector.detectAndCompute(img_bw, None)
+    descriptor = feature_descriptor(feature_config['descriptor'])
+    return descriptor.compute(img_bw, detector.detect(img_bw, None))
+
+
 def detect_and_compute(img_0, img_1, feature_config=None, matching_config=None):
     feature_config = {**_DEFAULT_FEATURE_CONFIG, **(feature_config or {})}
     matching_config = {**_DEFAULT_MATCHING_CONFIG, **(matching_config or {})}
-    feature_config_detector = feature_config['detector']
-    feature_config_descriptor = feature_config['descriptor']
-    match_method = matching_config['match_method']
-    validate_align_config(feature_config_detector, feature_config_descriptor, match_method)
-    img_bw_0, img_bw_1 = img_bw_8bit(img_0), img_bw_8bit(img_1)
-    detector_map = {
-        constants.DETECTOR_SIFT: cv2.SIFT_create,
-        constants.DETECTOR_ORB: cv2.ORB_create,
-        constants.DETECTOR_SURF: cv2.FastFeatureDetector_create,
-        constants.DETECTOR_AKAZE: cv2.AKAZE_create,
-        constants.DETECTOR_BRISK: cv2.BRISK_create
-    }
-    descriptor_map = {
-        constants.DESCRIPTOR_SIFT: cv2.SIFT_create,
-        constants.DESCRIPTOR_ORB: cv2.ORB_create,
-        constants.DESCRIPTOR_AKAZE: cv2.AKAZE_create,
-        constants.DETECTOR_BRISK: cv2.BRISK_create
-    }
-    detector = detector_map[feature_config_detector]()
-    if feature_config_detector == feature_config_descriptor and \
-       feature_config_detector in (constants.DETECTOR_SIFT,
-                                   constants.DETECTOR_AKAZE,
-                                   constants.DETECTOR_BRISK):
-        kp_0, des_0 = detector.detectAndCompute(img_bw_0, None)
-        kp_1, des_1 = detector.detectAndCompute(img_bw_1, None)
-    else:
-        descriptor = descriptor_map[feature_config_descriptor]()
-        kp_0, des_0 = descriptor.compute(img_bw_0, detector.detect(img_bw_0, None))
-        kp_1, des_1 = descriptor.compute(img_bw_1, detector.detect(img_bw_1, None))
+    validate_align_config(feature_config['detector'], feature_config['descriptor'],
+                          matching_config['match_method'])
+    kp_0, des_0 = compute_features(img_0, feature_config)
+    kp_1, des_1 = compute_features(img_1, feature_config)
     return kp_0, kp_1, get_good_matches(des_0, des_1, matching_config)
 
 
@@ -151,28 +202,116 @@ def find_transform(src_pts, dst_pts, transform=constants.DEFAULT_TRANSFORM,
     return result
 
 
+def luminance(img):
+    img = img.astype(np.float32)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
+
+
+def dft_crop(lum):
+    # OpenCV pads to the optimal DFT size, odd or padded sizes bias the peak position
+    sizes = []
+    for n in lum.shape[:2]:
+        while n > 2 and (n % 2 or cv2.getOptimalDFTSize(n) != n):
+            n -= 1
+        sizes.append(n)
+    return lum[:sizes[0], :sizes[1]]
+
+
+def log_polar_spectrum(lum, window):
+    h, w = lum.shape
+    y, x = np.ogrid[-0.5:0.5:h * 1j, -0.5:0.5:w * 1j]
+    cos_xy = np.cos(np.pi * x) * np.cos(np.pi * y)
+    # high-pass filter, the low frequencies don't constrain the scale
+    spectrum = np.abs(np.fft.fftshift(np.fft.fft2(lum * window))) * (1 - cos_xy) * (2 - cos_xy)
+    return cv2.warpPolar(spectrum.astype(np.float32), (w, h), (w / 2, h / 2), min(w, h) / 2,
+                         cv2.WARP_POLAR_LOG | cv2.INTER_LINEAR)
+
+
+def phase_scale(lum_1, lum_0, window):
+    """Magnification of lum_0 relative to lum_1 from the log-polar magnitude spectra."""
+    h, w = lum_1.shape
+    (d_rho, _d_angle), _response = cv2.phaseCorrelate(log_polar_spectrum(lum_1, window),
+                                                      log_polar_spectrum(lum_0, window))
+    return np.exp(-d_rho * np.log(min(w, h) / 2) / w)
+
+
+def phase_correlation_transform(img_1, img_0, alignment_config, img_0_detect=None):
+    """Transform mapping img_0 to img_1 estimated by phase correlation, translation and,
+    optionally, scale, and the response of the correlation peak."""
+    subsample = alignment_config['subsample']
+    fast_subsampling = alignment_config['fast_subsampling']
+    if img_0_detect is not None:
+        img_0_sub = img_0_detect(subsample, fast_subsampling)
+    else:
+        img_0_sub = img_subsample(img_0, subsample, fast_subsampling) if subsample > 1 else img_0
+    img_1_sub = img_subsample(img_1, subsample, fast_subsampling) if subsample > 1 else img_1
+    lum_1, lum_0 = dft_crop(luminance(img_1_sub)), dft_crop(luminance(img_0_sub))
+    h, w = lum_1.shape
+    window = cv2.createHanningWindow((w, h), cv2.CV_32F)
+    scale = 1.0
+    if alignment_config['phase_scale']:
+        scale = phase_scale(lum_1, lum_0, window)
+        lum_0 = cv2.warpAffine(lum_0, cv2.getRotationMatrix2D((w / 2, h / 2), 0, 1 / scale),
+                               (w, h), borderMode=cv2.BORDER_REFLECT)
+    (dx, dy), response = cv2.phaseCorrelate(lum_1, lum_0, window)
+    m = cv2.getRotationMatrix2D((w * subsample / 2, h * subsample / 2), 0, 1 / scale)
+    m[:, 2] -= (dx * subsample, dy * subsample)
+    if subsample > 1:
+        # the sub-pixel peak estimate is biased away from integer shifts, iterate once more
+        for _ in range(2):
+            m[:, 2] -= refine_shift(img_1, img_0, m)
+    return m.astype(np.float32), response
+
+
+def refine_shift(img_1, img_0, m, size=constants.PHASE_REFINE_SIZE):
+    """Residual shift after the transform m, on a full resolution central window."""
+    h, w = img_1.shape[:2]
+    h_c, w_c = dft_crop(np.empty((min(h, size), min(w, size)), dtype=np.uint8)).shape
+    y_0, x_0 = (h - h_c) // 2, (w - w_c) // 2
+    m_crop = m.copy()
+    m_crop[:, 2] -= (x_0, y_0)
+    lum_0 = cv2.warpAffine(luminance(img_0), m_crop, (w_c, h_c), borderMode=cv2.BORDER_REFLECT)
+    lum_1 = luminance(img_1[y_0:y_0 + h_c, x_0:x_0 + w_c])
+    (dx, dy), _response = cv2.phaseCorrelate(lum_1, lum_0,
+                                             cv2.createHanningWindow((w_c, h_c), cv2.CV_32F))
+    return dx, dy
+
+
 def align_images(img_1, img_0, feature_config=None, matching_config=None, alignment_config=None,
-                 plot_path=None, callbacks=None):
+                 plot_path=None, callbacks=None, img_0_detect=None):
     feature_config = {**_DEFAULT_FEATURE_CONFIG, **(feature_config or {})}
     matching_config = {**_DEFAULT_MATCHING_CONFIG, **(matching_config or {})}
     alignment_config = {**_DEFAULT_ALIGNMENT_CONFIG, **(alignment_config or {})}
-    try:
-        cv2_border_mode = _cv2_border_mode_map[alignment_config['border_mode']]
-    except KeyError as e:
-        raise InvalidOptionError("border_mode", alignment_config['border_mode']) from e
-    min_matches = 4 if alignment_config['transform'] == constants.ALIGN_HOMOGRAPHY else 3
+    if alignment_config['border_mode'] not in _cv2_border_mode_map:
+        raise InvalidOptionError("border_mode", alignment_config['border_mode'])
     validate_image(img_0, *get_img_metadata(img_1))
+    if alignment_config['transform'] == constants.ALIGN_TRANSLATION:
+        m, response = phase_correlation_transform(img_1, img_0, alignment_config, img_0_detect)
+        if callbacks and 'phase_message' in callbacks:
+            callbacks['phase_message'](response)
+        if response >= alignment_config['min_phase_response']:
+            if callbacks and 'align_message' in callbacks:
+                callbacks['align_message']()
+            return None, m, warp_image(img_0, m, alignment_config, callbacks)
+        if callbacks and 'warning' in callbacks:
+            callbacks['warning'](
+                f"weak phase correlation peak: {response:.3f} < "
+                f"{alignment_config['min_phase_response']}, using feature matching")
+        alignment_config = {**alignment_config, 'transform': constants.ALIGN_RIGID}
+    min_matches = 4 if alignment_config['transform'] == constants.ALIGN_HOMOGRAPHY else 3
     if callbacks and 'message' in callbacks:
         callbacks['message']()
     subsample = alignment_config['subsample']
     fast_subsampling = alignment_config['fast_subsampling']
     min_good_matches = alignment_config['min_good_matches']
     while True:
-        if subsample > 1:
+        if img_0_detect is not None:
+            img_0_sub = img_0_detect(subsample, fast_subsampling)
+        elif subsample > 1:
             img_0_sub = img_subsample(img_0, subsample, fast_subsampling)
-            img_1_sub = img_subsample(img_1, subsample, fast_subsampling)
         else:
-            img_0_sub, img_1_sub = img_0, img_1
+            img_0_sub = img_0
+        img_1_sub = img_subsample(img_1, subsample, fast_subsampling) if subsample > 1 else img_1
         kp_0, kp_1, good_matches = detect_and_compute(img_0_sub, img_1_sub,
                                                       feature_config, matching_config)
         n_good_matches = len(good_matches)
@@ -204,7 +343,7 @@ def align_images(img_1, img_0, feature_config=None, matching_config=None, alignm
                 flags=2), cv2.COLOR_BGR2RGB)
             plt.figure(figsize=(10, 5))
             plt.imshow(img_match, 'gray')
-            plt.savefig(plot_path)
+            save_plot(plot_path)
             if callbacks and 'save_plot' in callbacks:
                 callbacks['save_plot'](plot_path)
         h, w = img_0.shape[:2]
@@ -227,37 +366,219 @@ def align_images(img_1, img_0, feature_config=None, matching_config=None, alignm
                 raise InvalidOptionError("transform", transform)
         if callbacks and 'align_message' in callbacks:
             callbacks['align_message']()
-        img_mask = np.ones_like(img_0, dtype=np.uint8)
-        if alignment_config['transform'] == constants.ALIGN_HOMOGRAPHY:
-            img_warp = cv2.warpPerspective(
-                img_0, m, (w, h),
-                borderMode=cv2_border_mode, borderValue=alignment_config['border_value'])
-            if alignment_config['border_mode'] == constants.BORDER_REPLICATE_BLUR:
-                mask = cv2.warpPerspective(img_mask, m, (w, h),
-                                           borderMode=cv2.BORDER_CONSTANT, borderValue=0)
-        elif alignment_config['transform'] == constants.ALIGN_RIGID:
-            img_warp = cv2.warpAffine(
-                img_0, m, (w, h),
-                borderMode=cv2_border_mode, borderValue=alignment_config['border_value'])
-            if alignment_config['border_mode'] == constants.BORDER_REPLICATE_BLUR:
-                mask = cv2.warpAffine(img_mask, m, (w, h),
-                                      borderMode=cv2.BORDER_CONSTANT, borderValue=0)
-        if alignment_config['border_mode'] == constants.BORDER_REPLICATE_BLUR:
-            if callbacks and 'blur_message' in callbacks:
-                callbacks['blur_message']()
-            mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
-            blurred_warp = cv2.GaussianBlur(
-                img_warp, (21, 21), sigmaX=alignment_config['border_blur'])
-            img_warp[mask == 0] = blurred_warp[mask == 0]
+        img_warp = warp_image(img_0, m, alignment_config, callbacks)
     return n_good_matches, m, img_warp
 
 
+def border_strips(m, shape):
+    """Regions of the warped frame that can contain pixels coming from outside the source
+    frame: the strips outside the largest axis-aligned rectangle within the transformed
+    frame corners. None if the transformed frame can't be bounded this way."""
+    h, w = shape[:2]
+    # pixel centers of the source corners, with a one pixel margin for rounding
+    xs, ys = transform_coords(to_homogeneous(m), np.float64([1, w - 2, w - 2, 1]),
+                              np.float64([1, 1, h - 2, h - 2]))
+    if m.shape == (3, 3):
+        d = m[2, 0] * np.float64([0, w, w, 0]) + m[2, 1] * np.float64([0, 0, h, h]) + m[2, 2]
+        if np.any(d <= 0):
+            return None
+    if not np.all(np.isfinite(xs)) or not np.all(np.isfinite(ys)) or \
+            max(xs[0], xs[3]) >= min(xs[1], xs[2]) or max(ys[0], ys[1]) >= min(ys[2], ys[3]):
+        return None
+    top = int(np.clip(np.ceil(max(ys[0], ys[1])), 0, h))
+    bottom = int(np.clip(np.floor(min(ys[2], ys[3])) + 1, top, h))
+    left = int(np.clip(np.ceil(max(xs[0], xs[3])), 0, w))
+    right = int(np.clip(np.floor(min(xs[1], xs[2])) + 1, left, w))
+    strips = ((0, top, 0, w), (bottom, h, 0, w), (top, bottom, 0, left), (top, bottom, right, w))
+    return [s for s in strips if s[1] > s[0] and s[3] > s[2]]
+
+
+def outside_mask(m, shape, strip):
+    """Pixels of a strip of the warped frame whose center maps outside the source frame."""
+    h, w = shape[:2]
+    y0, y1, x0, x1 = strip
+    ys, xs = np.ogrid[y0:y1, x0:x1]
+    x, y = transform_coords(np.linalg.inv(to_homogeneous(m)), xs, ys)
+    return (x < -0.5) | (x > w - 0.5) | (y < -0.5) | (y > h - 0.5)
+
+
+def blur_borders(img_warp, m, border_blur):
+    """Replace the pixels of a warped frame that fall outside the source frame with a
+    blurred copy of the warped frame, blurring only strips along the frame edges."""
+    h, w = img_warp.shape[:2]
+    radius = constants.BORDER_BLUR_KERNEL // 2
+    strips = border_strips(m, img_warp.shape)
+    if strips is None:
+        strips = [(0, h, 0, w)]
+    blurred = []
+    for y0, y1, x0, x1 in strips:
+        py0, py1, px0, px1 = max(y0 - radius, 0), min(y1 + radius, h), \
+            max(x0 - radius, 0), min(x1 + radius, w)
+        strip_blur = cv2.GaussianBlur(img_warp[py0:py1, px0:px1],
+                                      (constants.BORDER_BLUR_KERNEL, constants.BORDER_BLUR_KERNEL),
+                                      sigmaX=border_blur)
+        blurred.append(strip_blur[y0 - py0:y1 - py0, x0 - px0:x1 - px0])
+    for (y0, y1, x0, x1), strip_blur in zip(strips, blurred):
+        mask = outside_mask(m, img_warp.shape, (y0, y1, x0, x1))
+        img_warp[y0:y1, x0:x1][mask] = strip_blur[mask]
+    return img_warp
+
+
+def warp_image(img_0, m, alignment_config=None, callbacks=None):
+    alignment_config = {**_DEFAULT_ALIGNMENT_CONFIG, **(alignment_config or {})}
+    try:
+        cv2_border_mode = _cv2_border_mode_map[alignment_config['border_mode']]
+    except KeyError as e:
+        raise InvalidOptionError("border_mode", alignment_config['border_mode']) from e
+    h, w = img_0.shape[:2]
+    if alignment_config['transform'] == constants.ALIGN_HOMOGRAPHY:
+        img_warp = cv2.warpPerspective(
+            img_0, m, (w, h),
+            borderMode=cv2_border_mode, borderValue=alignment_config['border_value'])
+    elif alignment_config['transform'] in (constants.ALIGN_RIGID, constants.ALIGN_TRANSLATION):
+        img_warp = cv2.warpAffine(
+            img_0, m, (w, h),
+            borderMode=cv2_border_mode, borderValue=alignment_config['border_value'])
+    else:
+        raise InvalidOptionError("transform", alignment_config['transform'])
+    if alignment_config['border_mode'] == constants.BORDER_REPLICATE_BLUR:
+        if callbacks and 'blur_message' in callbacks:
+            callbacks['blur_message']()
+        blur_borders(img_warp, m, alignment_config['border_blur'])
+    return img_warp
+
+
+def frame_features(img, feature_config, alignment_config):
+    """Keypoint positions, in full resolution pixels, and descriptors of one frame."""
+    subsample = alignment_config['subsample']
+    if subsample > 1:
+        img = img_subsample(img, subsample, alignment_config['fast_subsampling'])
+    kp, des = compute_features(img, feature_config)
+    return np.float32([k.pt for k in kp]).reshape(-1, 2) * subsample, des
+
+
+def match_frames(features_0, features_1, matching_config, alignment_config):
+    """Number of good matches and, if a transform is found, the transform from frame 0
+    to frame 1 with the inlier points of both frames."""
+    pts_0, des_0 = features_0
+    pts_1, des_1 = features_1
+    if des_0 is None or des_1 is None or len(pts_0) < 2 or len(pts_1) < 2:
+        return 0, None
+    good_matches = get_good_matches(des_0, des_1, matching_config)
+    transform = alignment_config['transform']
+    min_matches = 4 if transform == constants.ALIGN_HOMOGRAPHY else 3
+    if len(good_matches) < min_matches:
+        return len(good_matches), None
+    src_pts = pts_0[[m.queryIdx for m in good_matches]]
+    dst_pts = pts_1[[m.trainIdx for m in good_matches]]
+    m, msk = find_transform(src_pts.reshape(-1, 1, 2), dst_pts.reshape(-1, 1, 2), transform,
+                            alignment_config['align_method'],
+                            alignment_config['rans_threshold'] * alignment_config['subsample'],
+                            *(alignment_config[k]
+                              for k in ['max_iters', 'align_confidence', 'refine_iters']))
+    if m is None:
+        return len(good_matches), None
+    inliers = msk.ravel() > 0
+    return len(good_matches), (to_homogeneous(m), src_pts[inliers], dst_pts[inliers])
+
+
+def to_homogeneous(m):
+    m = np.asarray(m, dtype=np.float64)
+    return np.vstack([m, (0, 0, 1)]) if m.shape == (2, 3) else m
+
+
+def chain_transforms(n_frames, ref_idx, edges):
+    """Initial transforms to the reference frame, chaining pair transforms breadth first."""
+    transforms = {ref_idx: np.eye(3)}
+    queue = [ref_idx]
+    while queue:
+        j = queue.pop(0)
+        for (a, b), (m, _, _) in edges.items():
+            if b == j and a not in transforms:
+                transforms[a] = transforms[j] @ m
+                queue.append(a)
+            elif a == j and b not in transforms:
+                transforms[b] = transforms[j] @ np.linalg.inv(m)
+                queue.append(b)
+    return [transforms.get(i, None) for i in range(n_frames)]
+
+
+def solve_transforms(n_frames, ref_idx, edges, shape, transform=constants.DEFAULT_TRANSFORM,
+                     max_points=constants.ALIGN_GLOBAL_MAX_POINTS):
+    """Transforms of all frames to the reference frame from the pair matches.
+
+    edges maps frame pairs (i, j) to the pair transform from frame i to frame j and
+    the matching inlier points. The transforms minimize the distance, in the reference
+    frame, of all matching points. They are similarities for rigid alignment and
+    homographies otherwise. Frames not connected to the reference frame are None.
+    """
+    initial = chain_transforms(n_frames, ref_idx, edges)
+    free = [i for i in range(n_frames) if i != ref_idx and initial[i] is not None]
+    if len(free) == 0:
+        return initial
+    h, w = shape[:2]
+    scale = max(h, w) / 2
+    norm = np.array([[1 / scale, 0, -w / 2 / scale], [0, 1 / scale, -h / 2 / scale], [0, 0, 1]])
+    norm_inv = np.linalg.inv(norm)
+    homography = transform == constants.ALIGN_HOMOGRAPHY
+    n_pars = 8 if homography else 4
+    index = {i: k for k, i in enumerate(free)}
+
+    def to_matrix(p):
+        if homography:
+            return np.append(p, 1).reshape(3, 3)
+        return np.array([[p[0], -p[1], p[2]], [p[1], p[0], p[3]], [0, 0, 1]])
+
+    def to_pars(m):
+        m = m / m[2, 2]
+        return m.ravel()[:8] if homography else np.array([m[0, 0], m[1, 0], m[0, 2], m[1, 2]])
+
+    pairs = []
+    for (a, b), (_, pts_a, pts_b) in edges.items():
+        if a not in index and b not in index:
+            continue
+        step = max(1, len(pts_a) // max_points)
+        pts = [np.hstack([p[::step], np.ones((len(p[::step]), 1))]) @ norm.T
+               for p in (pts_a, pts_b)]
+        pairs.append((a, b, pts[0], pts[1]))
+
+    def project(p, pars, i):
+        if i not in index:
+            return p[:, :2]
+        q = p @ to_matrix(pars[index[i] * n_pars:(index[i] + 1) * n_pars]).T
+        return q[:, :2] / q[:, 2:]
+
+    def residuals(pars):
+        return np.concatenate([(project(pa, pars, a) - project(pb, pars, b)).ravel()
+                               for a, b, pa, pb in pairs])
+
+    n_res = sum(2 * len(pa) for _, _, pa, _ in pairs)
+    sparsity = sparse.lil_matrix((n_res, n_pars * len(free)), dtype=int)
+    row = 0
+    for a, b, pa, _ in pairs:
+        for i in (a, b):
+            if i in index:
+                sparsity[row:row + 2 * len(pa), index[i] * n_pars:(index[i] + 1) * n_pars] = 1
+        row += 2 * len(pa)
+    x0 = np.concatenate([to_pars(norm @ initial[i] @ norm_inv) for i in free])
+    result = optimize.least_squares(residuals, x0, jac_sparsity=sparsity, method='trf',
+                                    x_scale='jac')
+    transforms = list(initial)
+    transforms[ref_idx] = np.eye(3)
+    for i in free:
+        transforms[i] = norm_inv @ to_matrix(
+            result.x[index[i] * n_pars:(index[i] + 1) * n_pars]) @ norm
+    return transforms
+
+
 class AlignFrames(SubAction):
     def __init__(self, enabled=True, feature_config=None, matching_config=None,
                  alignment_config=None, **kwargs):
         super().__init__(enabled)
         self.process = None
         self.n_matches = None
+        self.phase_responses = None
+        self.transforms = None
         self.feature_config = {**_DEFAULT_FEATURE_CONFIG, **(feature_config or {})}
         self.matching_config = {**_DEFAULT_MATCHING_CONFIG, **(matching_config or {})}
         self.alignment_config = {**_DEFAULT_ALIGNMENT_CONFIG, **(alignment_config or {})}
@@ -278,13 +599,34 @@ class AlignFrames(SubAction):
     def run_frame(self, idx, ref_idx, img_0):
         if idx == self.process.ref_idx:
             return img_0
+        if self.transforms is not None:
+            return self.warp_frame(img_0, self.transforms[idx])
         img_ref = self.process.img_ref(ref_idx)
         return self.align_images(idx, img_ref, img_0)
 
+    def process_frame(self, idx, ref_idx, frame):
+        if idx == self.process.ref_idx:
+            return
+        if self.transforms is not None:
+            m = self.transforms[idx]
+            frame.warp(self.warp_frame(frame.base, m), m)
+            return
+        # matches are searched on the shared, corrected proxy, the full-resolution
+        # corrections are moved after the warp
+        img_ref = self.process.img_ref(ref_idx)
+        img, m = self.align_transform(idx, img_ref, frame.base, frame.proxy)
+        frame.warp(img, m)
+
+    def working_resolution(self):
+        return self.alignment_config['subsample'], self.alignment_config['fast_subsampling']
+
     def sub_msg(self, msg, color=constants.LOG_COLOR_LEVEL_3):
         self.process.sub_message_r(color_str(msg, color))
 
     def align_images(self, idx, img_1, img_0):
+        return self.align_transform(idx, img_1, img_0)[0]
+
+    def align_transform(self, idx, img_1, img_0, img_0_detect=None):
         idx_str = f"{idx:04d}"
         callbacks = {
             'message': lambda: self.sub_msg(': find matches'),
@@ -294,6 +636,7 @@ class AlignFrames(SubAction):
             'blur_message': lambda: self.sub_msg(': blur borders'),
             'warning': lambda msg: self.sub_msg(
                 f': {msg}', constants.LOG_COLOR_ALERT),
+            'phase_message': lambda response: self.phase_message(idx, response),
             'save_plot': lambda plot_path: self.process.callback(
                 'save_plot', self.process.id,
                 f"{self.process.name}: matches\nframe {idx_str}", plot_path)
@@ -303,51 +646,135 @@ class AlignFrames(SubAction):
                 f"{self.process.name}-matches-{idx_str}.pdf"
         else:
             plot_path = None
-        n_good_matches, _m, img = align_images(
+        n_good_matches, m, img = align_images(
             img_1, img_0,
             feature_config=self.feature_config,
             matching_config=self.matching_config,
             alignment_config=self.alignment_config,
             plot_path=plot_path,
-            callbacks=callbacks
+            callbacks=callbacks,
+            img_0_detect=img_0_detect
         )
+        if n_good_matches is None:
+            return img, m
         self.n_matches[idx] = n_good_matches
         if n_good_matches < self.min_matches:
             self.process.sub_message(f": image not aligned, too few matches found: "
                                      f"{n_good_matches}", level=logging.CRITICAL)
             raise AlignmentError(idx, f"too few matches found: "
                                  f"{n_good_matches} < {self.min_matches}")
-        return img
+        return img, m
+
+    def phase_message(self, idx, response):
+        self.phase_responses[idx] = response
+        self.sub_msg(f": phase correlation peak: {response:.3f}")
+
+    def warp_frame(self, img_0, m):
+        self.sub_msg(': align images')
+        return warp_image(img_0, m, self.alignment_config,
+                          {'blur_message': lambda: self.sub_msg(': blur borders')})
+
+    def global_transforms(self):
+        validate_align_config(self.feature_config['detector'], self.feature_config['descriptor'],
+                              self.matching_config['match_method'])
+        process = self.process
+        n_frames, ref_idx = process.counts, process.ref_idx
+        alignment_config = self.alignment_config
+        if alignment_config['transform'] == constants.ALIGN_TRANSLATION:
+            # pair translations are estimated from matches as well
+            alignment_config = {**alignment_config, 'transform': constants.ALIGN_RIGID}
+
+        def read_features(filename):
+            img = read_img(f"{process.input_full_path}/{filename}")
+            return img.shape, frame_features(img, self.feature_config, alignment_config)
+
+        def match_pair(pair):
+            return match_frames(features[pair[0]], features[pair[1]],
+                                self.matching_config, alignment_config)
+
+        # neighbour frames and each frame with the reference frame
+        pairs = [(i, i + 1) for i in range(n_frames - 1)] + \
+            [(i, ref_idx) for i in range(n_frames) if abs(i - ref_idx) > 1]
+        with ThreadPoolExecutor(max_workers=constants.MAX_ALIGN_WORKERS,
+                                thread_name_prefix='align') as executor:
+            process.print_message_r(color_str("global alignment: extract features",
+                                              constants.LOG_COLOR_LEVEL_2))
+            with process.measure('align', 'extract_features'):
+                results = list(executor.map(read_features, process.filenames))
+            features = [f for _, f in results]
+            process.print_message_r(color_str("global alignment: match frames",
+                                              constants.LOG_COLOR_LEVEL_2))
+            with process.measure('align', 'match_frames'):
+                matches = list(executor.map(match_pair, pairs))
+        edges = {}
+        for (a, b), (n_good_matches, match) in zip(pairs, matches):
+            self.n_matches[a] = max(self.n_matches[a], n_good_matches)
+            self.n_matches[b] = max(self.n_matches[b], n_good_matches)
+            if match is not None and n_good_matches >= self.min_matches:
+                edges[(a, b)] = match
+        process.print_message_r(color_str("global alignment: solve transforms",
+                                          constants.LOG_COLOR_LEVEL_2))
+        with process.measure('align', 'solve_transforms'):
+            transforms = solve_transforms(n_frames, ref_idx, edges, results[0][0],
+                                          alignment_config['transform'])
+        for idx, m in enumerate(transforms):
+            if m is None:
+                process.sub_message(f": frame {idx} not aligned, too few matches found",
+                                    level=logging.CRITICAL)
+                raise AlignmentError(idx, "too few matches found to connect the frame "
+                                     "to the reference frame")
+        if alignment_config['transform'] == constants.ALIGN_RIGID:
+            return [m[:2].astype(np.float32) for m in transforms]
+        return transforms
 
     def begin(self, process):
         self.process = process
         self.n_matches = np.zeros(process.counts)
+        self.phase_responses = np.zeros(process.counts)
+        self.transforms = None
+        if self.alignment_config['solver'] == constants.ALIGN_SOLVER_GLOBAL:
+            self.transforms = self.global_transforms()
+        elif self.alignment_config['solver'] != constants.ALIGN_SOLVER_LOCAL:
+            raise InvalidOptionError("solver", self.alignment_config['solver'])
+
+    def plot_frames(self, y, y_min, label, min_label, ylabel, name):
+        plt.figure(figsize=(10, 5))
+        x = np.arange(1, len(y) + 1, dtype=int)
+        no_ref = x != self.process.ref_idx + 1
+        x = x[no_ref]
+        y = y[no_ref]
+        y_max = y[1] \
+            if self.process.ref_idx == 0 \
+            else y[-1] if self.process.ref_idx == len(y) - 1 \
+            else (y[self.process.ref_idx - 1] + y[self.process.ref_idx]) / 2
+
+        plt.plot([self.process.ref_idx + 1, self.process.ref_idx + 1],
+                 [0, y_max], color='cornflowerblue', linestyle='--', label='reference frame')
+        plt.plot([x[0], x[-1]], [y_min, y_min], color='lightgray',
+                 linestyle='--', label=min_label)
+        plt.plot(x, y, color='navy', label=label)
+        plt.xlabel('frame')
+        plt.ylabel(ylabel)
+        plt.legend()
+        plt.ylim(0)
+        plt.xlim(x[0], x[-1])
+        plot_path = f"{self.process.working_path}/{self.process.plot_path}/" \
+                    f"{self.process.name}-{name}.pdf"
+        save_plot(plot_path)
+        plt.close('all')
+        self.process.callback('save_plot', self.process.id,
+                              f"{self.process.name}: {name.replace('-', ' ')}", plot_path)
 
     def end(self):
-        if self.plot_summary:
-            plt.figure(figsize=(10, 5))
-            x = np.arange(1, len(self.n_matches) + 1, dtype=int)
-            no_ref = x != self.process.ref_idx + 1
-            x = x[no_ref]
-            y = self.n_matches[no_ref]
-            y_max = y[1] \
-                if self.process.ref_idx == 0 \
-                else y[-1] if self.process.ref_idx == len(y) - 1 \
-                else (y[self.process.ref_idx - 1] + y[self.process.ref_idx]) / 2
-
-            plt.plot([self.process.ref_idx + 1, self.process.ref_idx + 1],
-                     [0, y_max], color='cornflowerblue', linestyle='--', label='reference frame')
-            plt.plot([x[0], x[-1]], [self.min_matches, self.min_matches], color='lightgray',
-                     linestyle='--', label='min. matches')
-            plt.plot(x, y, color='navy', label='matches')
-            plt.xlabel('frame')
-            plt.ylabel('# of matches')
-            plt.legend()
-            plt.ylim(0)
-            plt.xlim(x[0], x[-1])
-            plot_path = f"{self.process.working_path}/{self.process.plot_path}/" \
-                        f"{self.process.name}-matches.pdf"
-            save_plot(plot_path)
-            plt.close('all')
-            self.process.callback('save_plot', self.process.id,
-                                  f"{self.process.name}: matches", plot_path)
+        if not self.plot_summary:
+            return
+        translation = self.alignment_config['transform'] == constants.ALIGN_TRANSLATION \
+            and self.transforms is None
+        if translation:
+            self.plot_frames(self.phase_responses, self.alignment_config['min_phase_response'],
+                             'correlation peak', 'min. peak', 'phase correlation peak',
+                             'phase-correlation')
+        # with phase correlation, matches are only searched when the peak is too weak
+        if not translation or np.any(self.n_matches > 0):
+            self.plot_frames(self.n_matches, self.min_matches, 'matches', 'min. matches',
+                             '# of matches', 'matches')
@@ -1,14 +1,15 @@
-# pylint: disable=C0114, C0115, C0116, E1101, R0902, E1128, E0606, W0640, R0913, R0917
+# pylint: disable=C0114, C0115, C0116, E1101, R0902, E1128, E0606, W0640, R0913, R0917, R0903
 import numpy as np
 import cv2
-import matplotlib.pyplot as plt
-from scipy.optimize import bisect
-from scipy.interpolate import interp1d
 from .. config.constants import constants
 from .. core.exceptions import InvalidOptionError
 from .. core.colors import color_str
-from .utils import read_img, save_plot, img_subsample
-from .stack_framework import SubAction
+from .. core.core_utils import lazy_import
+from .utils import read_img, save_plot, img_subsample, img_proxy, plt
+from .stack_framework import SubAction, PixelOp
+
+optimize = lazy_import('scipy.optimize')
+interpolate = lazy_import('scipy.interpolate')
 
 
 class CorrectionMapBase:
@@ -27,25 +28,24 @@ class CorrectionMapBase:
     def lut(self, _correction, _reference):
         return None
 
-    def apply_lut(self, correction, reference, img):
-        lut = self.lut(correction, reference)
-        return cv2.LUT(img, lut) if self.dtype == np.uint8 else np.take(lut, img)
+    def luts(self, correction):
+        luts = [self.lut(c, r) for c, r in zip(correction, self.reference)]
+        if self.channels == 2:
+            luts = [self.id_lut.astype(self.dtype)] + luts
+        return luts
+
+    def apply_luts(self, image, luts):
+        if len(luts) == 1:
+            return cv2.LUT(image, luts[0]) if self.dtype == np.uint8 else np.take(luts[0], image)
+        if self.dtype == np.uint8:
+            return cv2.LUT(image, np.dstack(luts))
+        adjusted = np.empty_like(image)
+        for c, lut in enumerate(luts):
+            np.take(lut, image[..., c], out=adjusted[..., c])
+        return adjusted
 
     def adjust(self, image, correction):
-        if self.channels == 1:
-            return self.apply_lut(correction[0], self.reference[0], image)
-        chans = cv2.split(image)
-        if self.channels == 2:
-            ch_out = [chans[0]] + [self.apply_lut(
-                correction[c - 1],
-                self.reference[c - 1], chans[c]
-            ) for c in range(1, 3)]
-        elif self.channels == 3:
-            ch_out = [self.apply_lut(
-                correction[c],
-                self.reference[c], chans[c]
-            ) for c in range(3)]
-        return cv2.merge(ch_out)
+        return self.apply_luts(image, self.luts(correction))
 
     def correction_size(self, correction):
         return correction
@@ -62,7 +62,7 @@ class MatchHist(CorrectionMapBase):
         return [np.cumsum(h) / h.sum() * self.max_pixel_value for h in hist]
 
     def lut(self, correction, reference):
-        interp = interp1d(reference, self.values)
+        interp = interpolate.interp1d(reference, self.values)
         lut = np.array([interp(v) for v in np.clip(correction, reference.min(), reference.max())])
         l0, l1 = lut[0], lut[-1]
         ll = lut[(lut != l0) & (lut != l1)]
@@ -98,7 +98,7 @@ class GammaMap(CorrectionMap):
         CorrectionMap.__init__(self, dtype, ref_hist, intensity_interval)
 
     def correction(self, hist):
-        return [bisect(lambda x: self.mid_val(self.lut(x), h) - r, 0.1, 5)
+        return [optimize.bisect(lambda x: self.mid_val(self.lut(x), h) - r, 0.1, 5)
                 for h, r in zip(hist, self.reference)]
 
     def lut(self, correction, _reference=None):
@@ -144,7 +144,8 @@ class Correction:
         self.num_pixel_values = constants.NUM_UINT8 if ref_image.dtype == np.uint8 \
             else constants.NUM_UINT16
         self.max_pixel_value = self.num_pixel_values - 1
-        hist = self.get_hist(self.preprocess(ref_image), ref_idx)
+        hist = self.get_hist(self.preprocess(
+            img_proxy(ref_image, self.subsample, self.fast_subsampling)), ref_idx, 1)
         if self.corr_map == constants.BALANCE_LINEAR:
             self.corr_map = LinearMap(self.dtype, hist, self.intensity_interval)
         elif self.corr_map == constants.BALANCE_GAMMA:
@@ -155,9 +156,10 @@ class Correction:
             raise InvalidOptionError("corr_map", self.corr_map)
         self.corrections = np.ones((size, self.channels))
 
-    def calc_hist_1ch(self, image):
-        img_sub = image if self.subsample == 1 \
-            else img_subsample(image, self.subsample, self.fast_subsampling)
+    def calc_hist_1ch(self, image, subsample=None):
+        subsample = self.subsample if subsample is None else subsample
+        img_sub = image if subsample == 1 \
+            else img_subsample(image, subsample, self.fast_subsampling)
         if self.mask_size == 0:
             image_sel = img_sub
         else:
@@ -181,18 +183,25 @@ class Correction:
         correction = self.corr_map.correction(self.get_hist(image, idx))
         return correction, self.corr_map.adjust(image, correction)
 
-    def get_hist(self, _image, _idx):
+    def get_hist(self, _image, _idx, _subsample=None):
         return None
 
     def end(self, _ref_idx):
         pass
 
+    def estimate(self, idx, image, subsample=None):
+        correction = self.corr_map.correction(self.get_hist(image, idx, subsample))
+        self.corrections[idx] = self.corr_map.correction_size(correction)
+        return correction
+
+    def apply_luts(self, image, luts):
+        return self.postprocess(self.corr_map.apply_luts(self.preprocess(image), luts))
+
     def apply_correction(self, idx, image):
         image = self.preprocess(image)
-        correction, image = self.balance(image, idx)
-        image = self.postprocess(image)
-        self.corrections[idx] = self.corr_map.correction_size(correction)
-        return image
+        correction = self.estimate(
+            idx, img_proxy(image, self.subsample, self.fast_subsampling), 1)
+        return self.postprocess(self.corr_map.adjust(image, correction))
 
     def preprocess(self, image):
         return image
@@ -234,15 +243,15 @@ class LumiCorrection(Correction):
     def __init__(self, **kwargs):
         Correction.__init__(self, 1, **kwargs)
 
-    def get_hist(self, image, idx):
-        hist = self.calc_hist_1ch(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    def get_hist(self, image, idx, subsample=None):
+        hist = self.calc_hist_1ch(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), subsample)
         chans = cv2.split(image)
         colors = ("r", "g", "b")
         if self.plot_histograms:
             _fig, axs = plt.subplots(1, 2, figsize=(10, 5), sharey=True)
             self.histo_plot(axs[0], hist, "pixel luminosity", 'black')
             for (chan, color) in zip(chans, colors):
-                hist_col = self.calc_hist_1ch(chan)
+                hist_col = self.calc_hist_1ch(chan, subsample)
                 self.histo_plot(axs[1], hist_col, "r,g,b luminosity", color, alpha=0.5)
             plt.xlim(0, self.max_pixel_value)
             self.save_plot(idx)
@@ -270,8 +279,8 @@ class RGBCorrection(Correction):
     def __init__(self, **kwargs):
         Correction.__init__(self, 3, **kwargs)
 
-    def get_hist(self, image, idx):
-        hist = [self.calc_hist_1ch(chan) for chan in cv2.split(image)]
+    def get_hist(self, image, idx, subsample=None):
+        hist = [self.calc_hist_1ch(chan, subsample) for chan in cv2.split(image)]
         colors = ("r", "g", "b")
         if self.plot_histograms:
             _fig, axs = plt.subplots(1, 3, figsize=(10, 5), sharey=True)
@@ -308,8 +317,8 @@ class Ch2Correction(Correction):
     def preprocess(self, image):
         assert False, 'abstract method'
 
-    def get_hist(self, image, idx):
-        hist = [self.calc_hist_1ch(chan) for chan in cv2.split(image)]
+    def get_hist(self, image, idx, subsample=None):
+        hist = [self.calc_hist_1ch(chan, subsample) for chan in cv2.split(image)]
         if self.plot_histograms:
             _fig, axs = plt.subplots(1, 3, figsize=(10, 5), sharey=True)
             for c in range(3):
@@ -363,6 +372,15 @@ class LSCorrection(Ch2Correction):
         return cv2.cvtColor(image, cv2.COLOR_HLS2BGR)
 
 
+class BalanceOp(PixelOp):
+    def __init__(self, correction, luts):
+        self.correction = correction
+        self.luts = luts
+
+    def apply(self, tile, _coords):
+        return self.correction.apply_luts(tile, self.luts)
+
+
 class BalanceFrames(SubAction):
     def __init__(self, enabled=True, **kwargs):
         super().__init__(enabled=enabled)
@@ -409,8 +427,25 @@ class BalanceFrames(SubAction):
             plt.imshow(img, 'gray')
             self.correction.save_summary_plot("mask")
 
-    def run_frame(self, idx, _ref_idx, image):
+    def working_resolution(self):
+        return self.correction.subsample, self.correction.fast_subsampling
+
+    def run_frame(self, idx, _ref_idx, img_0):
         if idx != self.process.ref_idx:
             self.process.sub_message_r(color_str(': balance image', constants.LOG_COLOR_LEVEL_3))
-            image = self.correction.apply_correction(idx, image)
-        return image
+            img_0 = self.correction.apply_correction(idx, img_0)
+        return img_0
+
+    def process_frame(self, idx, _ref_idx, frame):
+        if idx == self.process.ref_idx:
+            return
+        self.process.sub_message_r(color_str(': balance image', constants.LOG_COLOR_LEVEL_3))
+        correction = self.correction
+        if correction.subsample > 1:
+            # histograms are taken on the shared subsampled proxy, with the pending
+            # corrections applied
+            image = frame.proxy(*self.working_resolution())
+        else:
+            image = frame.pixels()
+        values = correction.estimate(idx, correction.preprocess(image), 1)
+        frame.add_op(BalanceOp(correction, correction.corr_map.luts(values)))
@@ -1,9 +1,9 @@
 # pylint: disable=C0114, C0115, C0116, E0602, R0903
 import numpy as np
-from .. core.exceptions import InvalidOptionError, ImageLoadError
+from .. core.exceptions import InvalidOptionError, ImageLoadError, ShapeError, BitDepthError
 from .. config.constants import constants
 from .. core.colors import color_str
-from .utils import read_img, get_img_metadata, validate_image
+from .utils import read_img, get_img_metadata, validate_image, validate_image_files
 
 
 class BaseStackAlgo:
@@ -11,6 +11,8 @@ class BaseStackAlgo:
         self._name = name
         self._steps_per_frame = steps_per_frame
         self.process = None
+        self.frame_cache = {}
+        self.retained_frames = set()
         if float_type == constants.FLOAT_32:
             self.float_type = np.float32
         elif float_type == constants.FLOAT_64:
@@ -30,8 +32,9 @@ class BaseStackAlgo:
     def print_message(self, msg):
         self.process.sub_message_r(color_str(msg, constants.LOG_COLOR_LEVEL_3))
 
-    def read_image_and_update_metadata(self, img_path, metadata):
-        img = read_img(img_path)
+    def read_image_and_update_metadata(self, img_path, metadata, img=None):
+        if img is None:
+            img = read_img(img_path)
         if img is None:
             raise ImageLoadError(img_path)
         updated = metadata is None
@@ -40,3 +43,32 @@ class BaseStackAlgo:
         else:
             validate_image(img, *metadata)
         return img, metadata, updated
+
+    def probe_image_and_update_metadata(self, img_path, metadata):
+        updated = metadata is None
+        metadata = validate_image_files([img_path], *(metadata or ()))
+        return metadata, updated
+
+    def set_frame_cache(self, active, retained):
+        self.frame_cache = {path: frame for path, frame in self.frame_cache.items()
+                            if path in active}
+        self.retained_frames = set(retained)
+
+    def cached_frame(self, img_path):
+        return self.frame_cache.get(img_path, None)
+
+    def cache_frame(self, img_path, frame):
+        if img_path in self.retained_frames:
+            self.frame_cache[img_path] = frame
+        return frame
+
+    def update_metadata_from_cache(self, frame, metadata):
+        updated = metadata is None
+        if updated:
+            return frame['metadata'], updated
+        shape, dtype = frame['metadata']
+        if shape[:2] != metadata[0][:2]:
+            raise ShapeError(metadata[0], shape)
+        if dtype != metadata[1]:
+            raise BitDepthError(metadata[1], dtype)
+        return metadata, updated
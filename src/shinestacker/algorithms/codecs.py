@@ -0,0 +1,110 @@
+# pylint: disable=C0114, C0115, C0116, E1101, R0903
+import os
+import cv2
+import numpy as np
+from .. config.constants import constants
+from .. core.exceptions import InvalidOptionError
+from .. core.core_utils import lazy_import
+
+tifffile = lazy_import('tifffile')
+
+TIFF_COMPRESSIONS = {
+    constants.TIFF_COMPRESSION_NONE: None,
+    constants.TIFF_COMPRESSION_DEFLATE: 'zlib',
+    constants.TIFF_COMPRESSION_ZSTD: 'zstd',
+    constants.TIFF_COMPRESSION_LZW: 'lzw'
+}
+TIFF_DTYPES = (np.uint8, np.uint16, np.float32)
+TIFF_PHOTOMETRIC_MINISBLACK = 1
+TIFF_PHOTOMETRIC_RGB = 2
+TIFF_PLANARCONFIG_CONTIG = 1
+
+
+def codec_workers():
+    return max(1, min(constants.MAX_CODEC_WORKERS, os.cpu_count() or 1))
+
+
+def swap_red_blue(img):
+    if img.ndim == 3 and img.shape[2] == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    if img.ndim == 3 and img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+    return img
+
+
+class OpenCVCodec:
+    def __init__(self, read_flags=cv2.IMREAD_UNCHANGED):
+        self.read_flags = read_flags
+
+    def read(self, file_path):
+        return cv2.imread(file_path, self.read_flags)
+
+    def write_params(self, **_options):
+        return []
+
+    def write(self, file_path, img, **options):
+        cv2.imwrite(file_path, img, self.write_params(**options))
+
+    def encode(self, img, ext, **options):
+        ok, buffer = cv2.imencode('.' + ext, img, self.write_params(**options))
+        if not ok:
+            raise RuntimeError(f"Can't encode image as {ext}.")
+        return buffer.tobytes()
+
+
+class JpegCodec(OpenCVCodec):
+    def __init__(self):
+        super().__init__(cv2.IMREAD_COLOR)
+
+    def write_params(self, quality=constants.DEFAULT_JPEG_QUALITY, **_options):
+        return [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+
+
+class TiffCodec:
+    def decodable(self, page):
+        if page.photometric not in (TIFF_PHOTOMETRIC_MINISBLACK, TIFF_PHOTOMETRIC_RGB):
+            return False
+        if page.planarconfig != TIFF_PLANARCONFIG_CONTIG or page.dtype not in TIFF_DTYPES:
+            return False
+        return len(page.shape) == 2 or (len(page.shape) == 3 and page.shape[2] in (1, 3, 4))
+
+    def read(self, file_path):
+        # other layouts are left to OpenCV, which converts them to BGR
+        with tifffile.TiffFile(file_path) as tif:
+            page = tif.pages[0]
+            if self.decodable(page):
+                img = page.asarray(maxworkers=codec_workers())
+                if img.ndim == 3 and img.shape[2] == 1:
+                    img = img[:, :, 0]
+                return swap_red_blue(img)
+        return cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+
+    def write(self, file_path, img, compression=constants.DEFAULT_TIFF_COMPRESSION,
+              tags=None, **_options):
+        if compression not in TIFF_COMPRESSIONS:
+            raise InvalidOptionError("compression", compression,
+                                     details=f" valid values are: "
+                                     f"{', '.join(constants.VALID_TIFF_COMPRESSIONS)}")
+        codec = TIFF_COMPRESSIONS[compression]
+        tifffile.imwrite(
+            file_path, swap_red_blue(img),
+            photometric='rgb' if img.ndim == 3 and img.shape[2] in (3, 4) else 'minisblack',
+            compression=codec, predictor=codec is not None,
+            maxworkers=codec_workers(), metadata=None, **(tags or {}))
+
+
+CODECS = {}
+
+
+def register_codec(codec, extensions):
+    for ext in extensions:
+        CODECS[ext] = codec
+
+
+def get_codec(file_path):
+    return CODECS.get(file_path.split(".")[-1], None)
+
+
+register_codec(JpegCodec(), ['jpeg', 'jpg'])
+register_codec(OpenCVCodec(), ['png'])
+register_codec(TiffCodec(), ['tiff', 'tif'])
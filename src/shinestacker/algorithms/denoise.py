@@ -1,12 +1,22 @@
-# pylint: disable=C0114, C0116, E1101
+# pylint: disable=C0114, C0116, E1101, R0913, R0917
 import cv2
 import numpy as np
+from .. config.constants import constants
+from .tiling import process_tiled
 
 
-def denoise(image, h_luminance, template_window_size=7, search_window_size=21):
-    norm_type = cv2.NORM_L2 if image.dtype == np.uint8 else cv2.NORM_L1
-    if image.dtype == np.uint16:
-        h_luminance = h_luminance * 256
+def denoise_tile(image, h_luminance, template_window_size, search_window_size, norm_type):
     return cv2.fastNlMeansDenoising(
         image, [h_luminance], None, template_window_size, search_window_size, norm_type
     )
+
+
+def denoise(image, h_luminance, template_window_size=7, search_window_size=21,
+            tile_size=constants.DEFAULT_TILE_SIZE, max_workers=None):
+    norm_type = cv2.NORM_L2 if image.dtype == np.uint8 else cv2.NORM_L1
+    if image.dtype == np.uint16:
+        h_luminance = h_luminance * 256
+    margin = int(search_window_size // 2 + template_window_size // 2)
+    return process_tiled(
+        image, denoise_tile, h_luminance, template_window_size, search_window_size, norm_type,
+        margin=margin, tile_size=tile_size, max_workers=max_workers)
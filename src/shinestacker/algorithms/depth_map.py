@@ -3,7 +3,7 @@ import numpy as np
 import cv2
 from .. config.constants import constants
 from .. core.exceptions import InvalidOptionError, RunStopException
-from .utils import read_img, img_bw
+from .utils import read_img, img_bw, prefetch
 from .base_stack_algo import BaseStackAlgo
 
 
@@ -24,92 +24,141 @@ class DepthMapStack(BaseStackAlgo):
         self.smooth_size = smooth_size
         self.temperature = temperature
         self.levels = levels
+        self.ddepth = cv2.CV_32F if self.float_type == np.float32 else cv2.CV_64F
+        self.smooth_kernel = self.get_smooth_kernel()
 
-    def get_sobel_map(self, gray_images):
-        energies = np.zeros(gray_images.shape, dtype=self.float_type)
-        for i in range(gray_images.shape[0]):
-            img = gray_images[i]
-            energies[i] = np.abs(cv2.Sobel(img, cv2.CV_64F, 1, 0, ksize=3)) + \
-                np.abs(cv2.Sobel(img, cv2.CV_64F, 0, 1, ksize=3))
-        return energies
+    def get_smooth_kernel(self):
+        # on energies normalized to [0, 1] the range weights of a bilateral filter with
+        # sigma 25 are above 0.999, so the filter reduces to its spatial disk kernel
+        if self.smooth_size <= 0:
+            return None
+        radius = self.smooth_size // 2
+        y, x = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        r2 = x * x + y * y
+        kernel = np.where(r2 <= radius * radius, np.exp(-r2 / (2. * 25. ** 2)), 0)
+        return (kernel / kernel.sum()).astype(self.float_type)
 
-    def get_laplacian_map(self, gray_images):
-        laplacian = np.zeros(gray_images.shape, dtype=self.float_type)
-        for i in range(gray_images.shape[0]):
-            blurred = cv2.GaussianBlur(gray_images[i], (self.blur_size, self.blur_size), 0)
-            laplacian[i] = np.abs(cv2.Laplacian(blurred, cv2.CV_64F, ksize=self.kernel_size))
-        return laplacian
+    def get_sobel_energy(self, gray):
+        return np.abs(cv2.Sobel(gray, self.ddepth, 1, 0, ksize=3)) + \
+            np.abs(cv2.Sobel(gray, self.ddepth, 0, 1, ksize=3))
 
-    def smooth_energy(self, energy_map):
-        if self.smooth_size <= 0:
-            return energy_map
-        smoothed = np.zeros(energy_map.shape, dtype=np.float32)
-        for i in range(energy_map.shape[0]):
-            energy_32f = energy_map[i].astype(np.float32)
-            smoothed_32f = cv2.bilateralFilter(energy_32f, self.smooth_size, 25, 25)
-            smoothed[i] = smoothed_32f.astype(energy_map.dtype)
-        return smoothed
+    def get_laplacian_energy(self, gray):
+        blurred = cv2.GaussianBlur(gray, (self.blur_size, self.blur_size), 0)
+        return np.abs(cv2.Laplacian(blurred, self.ddepth, ksize=self.kernel_size))
 
-    def get_focus_map(self, energies):
-        if self.map_type == constants.DM_MAP_AVERAGE:
-            sum_energies = np.sum(energies, axis=0)
-            return np.divide(energies, sum_energies, where=sum_energies != 0)
-        if self.map_type == constants.DM_MAP_MAX:
-            max_energy = np.max(energies, axis=0)
-            relative = np.exp((energies - max_energy) / self.temperature)
-            return relative / np.sum(relative, axis=0)
-        raise InvalidOptionError("map_type", self.map_type, details=f" valid values are "
-                                 f"{constants.DM_MAP_AVERAGE} and {constants.DM_MAP_MAX}.")
+    def get_sobel_map(self, gray_images):
+        return np.array([self.get_sobel_energy(gray) for gray in gray_images])
 
-    def focus_stack(self, filenames):
-        gray_images = []
-        metadata = None
-        for i, img_path in enumerate(filenames):
-            self.print_message(f": reading file (1/2) {img_path.split('/')[-1]}")
+    def get_laplacian_map(self, gray_images):
+        return np.array([self.get_laplacian_energy(gray) for gray in gray_images])
 
-            img, metadata, _updated = self.read_image_and_update_metadata(img_path, metadata)
+    def smooth_energy(self, energy):
+        if self.smooth_kernel is None:
+            return energy
+        return cv2.filter2D(energy, -1, self.smooth_kernel, borderType=cv2.BORDER_REFLECT101)
 
-            gray = img_bw(img)
-            gray_images.append(gray)
-            self.process.callback('after_step', self.process.id, self.process.name, i)
-            if self.process.callback('check_running', self.process.id, self.process.name) is False:
-                raise RunStopException(self.name)
-        dtype = metadata[1]
-        gray_images = np.array(gray_images, dtype=self.float_type)
+    def get_energy(self, img):
+        gray = img_bw(img).astype(self.float_type)
         if self.energy == constants.DM_ENERGY_SOBEL:
-            energies = self.get_sobel_map(gray_images)
+            energy = self.get_sobel_energy(gray)
         elif self.energy == constants.DM_ENERGY_LAPLACIAN:
-            energies = self.get_laplacian_map(gray_images)
+            energy = self.get_laplacian_energy(gray)
         else:
             raise InvalidOptionError(
                 'energy', self.energy, details=f" valid values are "
                 f"{constants.DM_ENERGY_SOBEL} and {constants.DM_ENERGY_LAPLACIAN}."
             )
-        max_energy = np.max(energies)
-        if max_energy > 0:
-            energies = energies / max_energy
-        if self.smooth_size > 0:
-            energies = self.smooth_energy(energies)
-        weights = self.get_focus_map(energies)
-        blended_pyramid = None
-        for i, img_path in enumerate(filenames):
+        return energy, self.smooth_energy(energy)
+
+    def get_max_focus_map(self, energies):
+        max_energy = np.max(energies, axis=0)
+        relative = np.exp((energies - max_energy) / self.temperature)
+        return relative / np.sum(relative, axis=0)
+
+    def get_laplacian_pyramid(self, img):
+        gp_img = [img]
+        for _ in range(self.levels - 1):
+            gp_img.append(cv2.pyrDown(gp_img[-1]))
+        lp_img = [gp_img[-1]]
+        for j in range(self.levels - 1, 0, -1):
+            size = (gp_img[j - 1].shape[1], gp_img[j - 1].shape[0])
+            expanded = cv2.pyrUp(gp_img[j], dstsize=size)
+            lp_img.append(gp_img[j - 1] - expanded)
+        return lp_img
+
+    def read_uncached(self, img_path, key):
+        frame = self.cached_frame(img_path)
+        return read_img(img_path) if frame is None or key not in frame else None
+
+    def focus_stack(self, filenames):
+        if self.map_type not in constants.VALID_DM_MAP:
+            raise InvalidOptionError("map_type", self.map_type, details=f" valid values are "
+                                     f"{constants.DM_MAP_AVERAGE} and {constants.DM_MAP_MAX}.")
+        average = self.map_type == constants.DM_MAP_AVERAGE
+        energies = []
+        sum_energies = None
+        max_energy = 0
+        weights = None
+        metadata = None
+        images = prefetch(lambda path: self.read_uncached(path, 'energy'), filenames)
+        for i, (img_path, img) in enumerate(zip(filenames, images)):
+            self.print_message(f": reading file (1/2) {img_path.split('/')[-1]}")
+            frame = self.cached_frame(img_path)
+            if frame is None:
+                img, metadata, _updated = self.read_image_and_update_metadata(
+                    img_path, metadata, img)
+                raw_energy, energy = self.get_energy(img)
+                frame = self.cache_frame(img_path, {
+                    'metadata': metadata, 'energy': energy, 'max_energy': np.max(raw_energy)})
+            else:
+                metadata, _updated = self.update_metadata_from_cache(frame, metadata)
+            if average:
+                if sum_energies is None:
+                    sum_energies = frame['energy'].copy()
+                else:
+                    sum_energies += frame['energy']
+            else:
+                energies.append(frame['energy'])
+                max_energy = max(max_energy, frame['max_energy'])
+            self.process.callback('after_step', self.process.id, self.process.name, i)
+            if self.process.callback('check_running', self.process.id, self.process.name) is False:
+                raise RunStopException(self.name)
+        dtype = metadata[1]
+        if not average:
+            energies = np.array(energies, dtype=self.float_type)
+            if max_energy > 0:
+                energies /= max_energy
+            weights = self.get_max_focus_map(energies)
+            del energies
+        blended_pyramid, products, gp_weight, weight = None, None, None, None
+        images = prefetch(lambda path: self.read_uncached(path, 'laplacians'), filenames)
+        for i, (img_path, img) in enumerate(zip(filenames, images)):
             self.print_message(f": reading file (2/2) {img_path.split('/')[-1]}")
-            img = read_img(img_path).astype(self.float_type)
-            weight = weights[i]
-            gp_img = [img]
-            gp_weight = [weight]
-            for _ in range(self.levels - 1):
-                gp_img.append(cv2.pyrDown(gp_img[-1]))
-                gp_weight.append(cv2.pyrDown(gp_weight[-1]))
-            lp_img = [gp_img[-1]]
-            for j in range(self.levels - 1, 0, -1):
-                size = (gp_img[j - 1].shape[1], gp_img[j - 1].shape[0])
-                expanded = cv2.pyrUp(gp_img[j], dstsize=size)
-                lp_img.append(gp_img[j - 1] - expanded)
-            current_blend = [lp_img[j] * gp_weight[self.levels - 1 - j][..., np.newaxis]
-                             for j in range(self.levels)]
-            blended_pyramid = current_blend if blended_pyramid is None \
-                else [np.add(bp, cb) for bp, cb in zip(blended_pyramid, current_blend)]
+            frame = self.cached_frame(img_path)
+            if img is None:
+                lp_img = frame['laplacians']
+            else:
+                lp_img = self.get_laplacian_pyramid(img.astype(self.float_type))
+                if frame is not None:
+                    frame['laplacians'] = lp_img
+            if blended_pyramid is None:
+                blended_pyramid = [np.zeros_like(lp) for lp in lp_img]
+                products = [np.empty_like(lp) for lp in lp_img]
+                gp_weight = [None] * self.levels
+            if average:
+                energy = self.get_energy(img)[1] if frame is None else frame['energy']
+                if weight is None:
+                    weight = np.zeros_like(energy)
+                gp_weight[0] = np.divide(energy, sum_energies, out=weight,
+                                         where=sum_energies != 0)
+            else:
+                gp_weight[0] = weights[i]
+            for j in range(1, self.levels):
+                gp_weight[j] = cv2.pyrDown(gp_weight[j - 1], dst=gp_weight[j])
+            for j in range(self.levels):
+                np.multiply(lp_img[j], gp_weight[self.levels - 1 - j][..., np.newaxis],
+                            out=products[j])
+                blended_pyramid[j] += products[j]
             self.process.callback('after_step', self.process.id,
                                   self.process.name, i + len(filenames))
             if self.process.callback('check_running', self.process.id, self.process.name) is False:
@@ -1,16 +1,19 @@
 # pylint: disable=C0114, C0116, W0718, R0911, R0912, E1101
 import os
 import re
-import io
+import zlib
 import logging
-import cv2
 import numpy as np
-from PIL import Image
-from PIL.TiffImagePlugin import IFDRational
-from PIL.ExifTags import TAGS
-import tifffile
 from .. config.constants import constants
-from .utils import write_img
+from .. core.core_utils import lazy_import
+from .. core.metrics import add_file_bytes_written
+from .utils import read_img, write_img
+from .codecs import get_codec, swap_red_blue
+
+pil_image = lazy_import('PIL.Image')
+pil_tiff = lazy_import('PIL.TiffImagePlugin')
+pil_exif_tags = lazy_import('PIL.ExifTags')
+tifffile = lazy_import('tifffile')
 
 IMAGEWIDTH = 256
 IMAGELENGTH = 257
@@ -22,16 +25,29 @@ PHOTOMETRICINTERPRETATION = 262
 SAMPLESPERPIXEL = 277
 PLANARCONFIGURATION = 284
 SOFTWARE = 305
+IMAGEDESCRIPTION = 270
 IMAGERESOURCES = 34377
 INTERCOLORPROFILE = 34675
 EXIFTAG = 34665
 XMLPACKET = 700
 STRIPOFFSETS = 273
 STRIPBYTECOUNTS = 279
+ROWSPERSTRIP = 278
 NO_COPY_TIFF_TAGS_ID = [IMAGEWIDTH, IMAGELENGTH, RESOLUTIONX, RESOLUTIONY, BITSPERSAMPLE,
                         PHOTOMETRICINTERPRETATION, SAMPLESPERPIXEL, PLANARCONFIGURATION, SOFTWARE,
                         RESOLUTIONUNIT, EXIFTAG, INTERCOLORPROFILE, IMAGERESOURCES]
-NO_COPY_TIFF_TAGS = ["Compression", "StripOffsets", "RowsPerStrip", "StripByteCounts"]
+NO_COPY_TIFF_TAGS = ["Compression", "StripOffsets", "RowsPerStrip", "StripByteCounts",
+                     "Predictor"]
+NO_EMBED_EXIF_TAGS_ID = [XMLPACKET, INTERCOLORPROFILE, IMAGERESOURCES,
+                         STRIPOFFSETS, STRIPBYTECOUNTS, ROWSPERSTRIP]
+JPG_EXIF_HEADER = b'Exif\x00\x00'
+JPG_XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+JPG_ICC_HEADER = b'ICC_PROFILE\x00'
+JPG_MAX_SEGMENT = 65533
+JPG_ICC_CHUNK = JPG_MAX_SEGMENT - len(JPG_ICC_HEADER) - 2
+JPG_APP0, JPG_APP1, JPG_APP2, JPG_SOS = 0xE0, 0xE1, 0xE2, 0xDA
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_XMP_KEYWORD = b'XML:com.adobe.xmp'
 
 
 def extract_enclosed_data_for_jpg(data, head, foot):
@@ -49,7 +65,7 @@ def get_exif(exif_filename):
     if not os.path.isfile(exif_filename):
         raise RuntimeError(f"File does not exist: {exif_filename}")
     ext = exif_filename.split(".")[-1]
-    image = Image.open(exif_filename)
+    image = pil_image.open(exif_filename)
     if ext in ('tif', 'tiff'):
         return image.tag_v2 if hasattr(image, 'tag_v2') else image.getexif()
     if ext in ('jpeg', 'jpg'):
@@ -77,17 +93,18 @@ def exif_extra_tags_for_tif(exif):
     photometric = phint if phint is not None else None
     extra = []
     for tag_id in exif:
-        tag, data = TAGS.get(tag_id, tag_id), exif.get(tag_id)
+        tag, data = pil_exif_tags.TAGS.get(tag_id, tag_id), exif.get(tag_id)
         if isinstance(data, bytes):
             try:
-                if tag_id not in (IMAGERESOURCES, INTERCOLORPROFILE):
-                    if tag_id == XMLPACKET:
-                        data = re.sub(b'[^\x20-\x7E]', b'', data)
+                if tag_id == XMLPACKET:
+                    # XMP is stored as bytes, as readers expect
+                    data = re.sub(b'[^\x20-\x7E]', b'', data)
+                elif tag_id not in (IMAGERESOURCES, INTERCOLORPROFILE):
                     data = data.decode()
             except Exception:
                 logger.warning(msg=f"Copy: can't decode EXIF tag {tag:25} [#{tag_id}]")
                 data = '<<< decode error >>>'
-        if isinstance(data, IFDRational):
+        if isinstance(data, pil_tiff.IFDRational):
             data = (data.numerator, data.denominator)
         if tag not in NO_COPY_TIFF_TAGS and tag_id not in NO_COPY_TIFF_TAGS_ID:
             extra.append((tag_id, *get_tiff_dtype_count(data), data, False))
@@ -127,75 +144,187 @@ def get_tiff_dtype_count(value):
 
 
 def add_exif_data_to_jpg_file(exif, in_filenama, out_filename, verbose=False):
-    logger = logging.getLogger(__name__)
     if exif is None:
         raise RuntimeError('No exif data provided.')
     if verbose:
         print_exif(exif)
-    xmp_data = extract_enclosed_data_for_jpg(exif[XMLPACKET], b'<x:xmpmeta', b'</x:xmpmeta>')
-    with Image.open(in_filenama) as image:
-        with io.BytesIO() as buffer:
-            image.save(buffer, format="JPEG", exif=exif.tobytes(), quality=100)
-            jpeg_data = buffer.getvalue()
-            if xmp_data is not None:
-                app1_marker_pos = jpeg_data.find(b'\xFF\xE1')
-                if app1_marker_pos == -1:
-                    app1_marker_pos = len(jpeg_data) - 2
-                updated_data = (
-                    jpeg_data[:app1_marker_pos] +
-                    b'\xFF\xE1' + len(xmp_data).to_bytes(2, 'big') +
-                    xmp_data + jpeg_data[app1_marker_pos:]
-                )
-            else:
-                logger.warning("Copy: can't find XMLPacket in JPG EXIF data")
-                updated_data = jpeg_data
-            with open(out_filename, 'wb') as f:
-                f.write(updated_data)
+    with open(in_filenama, 'rb') as f:
+        data = f.read()
+    with open(out_filename, 'wb') as f:
+        f.write(embed_jpg_metadata(data, build_metadata(exif)))
     return exif
 
 
-def write_image_with_exif_data(exif, image, out_filename, verbose=False):
+def exif_block(exif):
+    block = pil_image.Exif()
+    if isinstance(exif, pil_image.Exif):
+        block.load(exif.tobytes())
+    else:
+        for tag_id in exif:
+            if tag_id not in (EXIFTAG, *NO_EMBED_EXIF_TAGS_ID):
+                block[tag_id] = exif[tag_id]
+    for tag_id in NO_EMBED_EXIF_TAGS_ID:
+        if tag_id in block:
+            del block[tag_id]
+    data = block.tobytes()
+    return data if data.startswith(JPG_EXIF_HEADER) else JPG_EXIF_HEADER + data
+
+
+def build_metadata(exif, icc_profile=None, ifd=None):
     if exif is None:
-        write_img(out_filename, image)
         return None
+    xmp = exif.get(XMLPACKET)
+    if isinstance(xmp, str):
+        xmp = xmp.encode()
+    if icc_profile is None:
+        icc_profile = exif.get(INTERCOLORPROFILE)
+    return {'exif': exif, 'exif_block': exif_block(exif if ifd is None else ifd),
+            'xmp': xmp or None, 'icc': icc_profile or None}
+
+
+def get_metadata(exif_filename):
+    exif = get_exif(exif_filename)
+    with pil_image.open(exif_filename) as image:
+        return build_metadata(exif, image.info.get('icc_profile'), image.getexif())
+
+
+def jpg_segment(marker, payload):
+    return bytes((0xFF, marker)) + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+def jpg_metadata_segments(metadata):
+    segments = []
+    for header, payload in ((b'', metadata['exif_block']), (JPG_XMP_HEADER, metadata['xmp'])):
+        if payload is None:
+            continue
+        if len(header) + len(payload) > JPG_MAX_SEGMENT:
+            logging.getLogger(__name__).warning("Copy: metadata too large for a JPG segment")
+        else:
+            segments.append(jpg_segment(JPG_APP1, header + payload))
+    icc = metadata['icc']
+    if icc is not None:
+        chunks = [icc[i:i + JPG_ICC_CHUNK] for i in range(0, len(icc), JPG_ICC_CHUNK)]
+        segments += [jpg_segment(JPG_APP2, JPG_ICC_HEADER + bytes((i + 1, len(chunks))) + chunk)
+                     for i, chunk in enumerate(chunks)]
+    return segments
+
+
+def embed_jpg_metadata(data, metadata):
+    if data[:2] != b'\xFF\xD8':
+        raise RuntimeError("Invalid JPG data.")
+    kept, pos = [data[:2]], 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF and data[pos + 1] != JPG_SOS:
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+        segment = data[pos:end]
+        if not (data[pos + 1] in (JPG_APP1, JPG_APP2) and segment[4:].startswith(
+                (JPG_EXIF_HEADER, JPG_XMP_HEADER, JPG_ICC_HEADER))):
+            kept.append(segment)
+        pos = end
+    idx = 2 if len(kept) > 1 and kept[1][1] == JPG_APP0 else 1
+    return b''.join(kept[:idx] + jpg_metadata_segments(metadata) + kept[idx:]) + data[pos:]
+
+
+def png_chunk(kind, payload):
+    return len(payload).to_bytes(4, 'big') + kind + payload + \
+        zlib.crc32(kind + payload).to_bytes(4, 'big')
+
+
+def png_metadata_chunks(metadata):
+    chunks = []
+    if metadata['icc'] is not None:
+        chunks.append(png_chunk(b'iCCP', b'ICC Profile\x00\x00' + zlib.compress(metadata['icc'])))
+    if metadata['exif_block'] is not None:
+        chunks.append(png_chunk(b'eXIf', metadata['exif_block'][len(JPG_EXIF_HEADER):]))
+    if metadata['xmp'] is not None:
+        chunks.append(png_chunk(b'iTXt', PNG_XMP_KEYWORD + b'\x00' * 5 + metadata['xmp']))
+    return chunks
+
+
+def embed_png_metadata(data, metadata):
+    if not data.startswith(PNG_SIGNATURE):
+        raise RuntimeError("Invalid PNG data.")
+    chunks, pos = [], len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        end = pos + 12 + int.from_bytes(data[pos:pos + 4], 'big')
+        kind, chunk = data[pos + 4:pos + 8], data[pos:end]
+        if kind in (b'iCCP', b'sRGB') and metadata['icc'] is not None:
+            pass
+        elif kind == b'eXIf' or (kind == b'iTXt' and chunk[8:].startswith(PNG_XMP_KEYWORD)):
+            pass
+        else:
+            chunks.append(chunk)
+        pos = end
+    return PNG_SIGNATURE + b''.join(chunks[:1] + png_metadata_chunks(metadata) + chunks[1:])
+
+
+def embed_metadata(data, ext, metadata):
+    if ext in ('jpeg', 'jpg'):
+        return embed_jpg_metadata(data, metadata)
+    if ext == 'png':
+        return embed_png_metadata(data, metadata)
+    raise RuntimeError(f"Can't embed metadata in {ext} files.")
+
+
+def tiff_tags(metadata):
+    extra_tags, tags = exif_extra_tags_for_tif(metadata['exif'])
+    tags.pop('photometric')
+    tags.update(extratags=[tag for tag in extra_tags if tag[0] != IMAGEDESCRIPTION],
+                description=f"image generated with {constants.APP_STRING} package")
+    if metadata['icc'] is not None:
+        tags['iccprofile'] = metadata['icc']
+    return tags
+
+
+def write_image_with_metadata(metadata, image, out_filename, **options):
+    if metadata is None:
+        write_img(out_filename, image, **options)
+        return
     ext = out_filename.split(".")[-1]
-    if verbose:
+    codec = get_codec(out_filename)
+    if ext in ('tiff', 'tif'):
+        options.setdefault('compression', constants.TIFF_COMPRESSION_DEFLATE)
+        codec.write(out_filename, image, tags=tiff_tags(metadata), **options)
+    elif ext in ('jpeg', 'jpg', 'png'):
+        # metadata is spliced into the encoded stream, so pixels are encoded only once
+        data = embed_metadata(codec.encode(image, ext, **options), ext, metadata)
+        with open(out_filename, 'wb') as f:
+            f.write(data)
+    else:
+        write_img(out_filename, image, **options)
+        return
+    add_file_bytes_written(out_filename)
+
+
+def write_image_with_exif_data(exif, image, out_filename, verbose=False):
+    if exif is not None and verbose:
         print_exif(exif)
-    if ext in ('jpeg', 'jpg'):
-        cv2.imwrite(out_filename, image, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
-        add_exif_data_to_jpg_file(exif, out_filename, out_filename, verbose)
-    elif ext in ('tiff', 'tif'):
-        metadata = {"description": f"image generated with {constants.APP_STRING} package"}
-        extra_tags, exif_tags = exif_extra_tags_for_tif(exif)
-        tifffile.imwrite(out_filename, image, metadata=metadata, compression='adobe_deflate',
-                         extratags=extra_tags, **exif_tags)
-    elif ext == 'png':
-        image.save(out_filename, 'PNG', exif=exif, quality=100)
+    if exif is not None and out_filename.split(".")[-1] in ('tiff', 'tif'):
+        # TIFF images with EXIF data are passed in stored (RGB) channel order
+        image = swap_red_blue(image)
+    write_image_with_metadata(build_metadata(exif), image, out_filename)
     return exif
 
 
-def save_exif_data(exif, in_filename, out_filename=None, verbose=False):
-    ext = in_filename.split(".")[-1]
+def save_metadata(metadata, in_filename, out_filename=None):
     if out_filename is None:
         out_filename = in_filename
+    ext = in_filename.split(".")[-1]
+    if ext in ('jpeg', 'jpg', 'png'):
+        with open(in_filename, 'rb') as f:
+            data = f.read()
+        with open(out_filename, 'wb') as f:
+            f.write(embed_metadata(data, ext, metadata))
+    else:
+        write_image_with_metadata(metadata, read_img(in_filename), out_filename)
+    return metadata['exif']
+
+
+def save_exif_data(exif, in_filename, out_filename=None, verbose=False):
     if exif is None:
         raise RuntimeError('No exif data provided.')
     if verbose:
         print_exif(exif)
-    if ext in ('tiff', 'tif'):
-        image_new = tifffile.imread(in_filename)
-    else:
-        image_new = Image.open(in_filename)
-    if ext in ('jpeg', 'jpg'):
-        add_exif_data_to_jpg_file(exif, in_filename, out_filename, verbose)
-    elif ext in ('tiff', 'tif'):
-        metadata = {"description": f"image generated with {constants.APP_STRING} package"}
-        extra_tags, exif_tags = exif_extra_tags_for_tif(exif)
-        tifffile.imwrite(out_filename, image_new, metadata=metadata, compression='adobe_deflate',
-                         extratags=extra_tags, **exif_tags)
-    elif ext == 'png':
-        image_new.save(out_filename, 'PNG', exif=exif, quality=100)
-    return exif
+    return save_metadata(build_metadata(exif), in_filename, out_filename)
 
 
 def copy_exif_from_file_to_file(exif_filename, in_filename, out_filename=None, verbose=False):
@@ -203,8 +332,10 @@ def copy_exif_from_file_to_file(exif_filename, in_filename, out_filename=None, v
         raise RuntimeError(f"File does not exist: {exif_filename}")
     if not os.path.isfile(in_filename):
         raise RuntimeError(f"File does not exist: {in_filename}")
-    exif = get_exif(exif_filename)
-    return save_exif_data(exif, in_filename, out_filename, verbose)
+    metadata = get_metadata(exif_filename)
+    if verbose:
+        print_exif(metadata['exif'])
+    return save_metadata(metadata, in_filename, out_filename)
 
 
 def exif_dict(exif, hide_xml=True):
@@ -212,7 +343,7 @@ def exif_dict(exif, hide_xml=True):
         return None
     exif_data = {}
     for tag_id in exif:
-        tag = TAGS.get(tag_id, tag_id)
+        tag = pil_exif_tags.TAGS.get(tag_id, tag_id)
         if tag_id == XMLPACKET and hide_xml:
             data = "<<< XML data >>>"
         elif tag_id in (IMAGERESOURCES, INTERCOLORPROFILE):
@@ -238,6 +369,6 @@ def print_exif(exif, hide_xml=True):
         raise RuntimeError('Image has no exif data.')
     logger = logging.getLogger(__name__)
     for tag, (tag_id, data) in exif_data.items():
-        if isinstance(data, IFDRational):
+        if isinstance(data, pil_tiff.IFDRational):
             data = f"{data.numerator}/{data.denominator}"
         logger.info(msg=f"{tag:25} [#{tag_id:5d}]: {data}")
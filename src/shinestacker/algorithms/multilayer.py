@@ -2,23 +2,23 @@
 import os
 import logging
 import cv2
-import tifffile
-import imagecodecs
 import numpy as np
-from psdtags import (PsdBlendMode, PsdChannel, PsdChannelId, PsdClippingType, PsdColorSpaceType,
-                     PsdCompressionType, PsdEmpty, PsdFilterMask, PsdFormat, PsdKey, PsdLayer,
-                     PsdLayerFlag, PsdLayerMask, PsdLayers, PsdRectangle, PsdString, PsdUserMask,
-                     TiffImageSourceData, overlay)
 from .. config.constants import constants
 from .. config.config import config
 from .. core.colors import color_str
 from .. core.framework import JobBase
+from .. core.core_utils import lazy_import
+from .. core.metrics import add_file_bytes_read, add_file_bytes_written
 from .stack_framework import FrameMultiDirectory
 from .exif import exif_extra_tags_for_tif, get_exif
 
+tifffile = lazy_import('tifffile')
+imagecodecs = lazy_import('imagecodecs')
+psdtags = lazy_import('psdtags')
+
 
 def read_multilayer_tiff(input_file):
-    return TiffImageSourceData.fromtiff(input_file)
+    return psdtags.TiffImageSourceData.fromtiff(input_file)
 
 
 def write_multilayer_tiff(input_files, output_file, labels=None, exif_path='', callbacks=None):
@@ -36,6 +36,8 @@ def write_multilayer_tiff(input_files, output_file, labels=None, exif_path='', c
     elif extension == 'png':
         images = [cv2.imread(p, cv2.IMREAD_UNCHANGED) for p in input_files]
         images = [cv2.cvtColor(i, cv2.COLOR_BGR2RGB) for i in images]
+    for p in input_files:
+        add_file_bytes_read(p)
     if labels is None:
         image_dict = {file.split('/')[-1].split('.')[0]: image
                       for file, image in zip(input_files, images)}
@@ -62,56 +64,56 @@ def write_multilayer_tiff_from_images(image_dict, output_file, exif_path='', cal
     dtype = dtypes[0]
     max_pixel_value = constants.MAX_UINT16 if dtype == np.uint16 else constants.MAX_UINT8
     transp = np.full_like(list(image_dict.values())[0][..., 0], max_pixel_value)
-    compression_type = PsdCompressionType.ZIP_PREDICTED
-    psdformat = PsdFormat.LE32BIT
-    key = PsdKey.LAYER_16 if dtype == np.uint16 else PsdKey.LAYER
-    layers = [PsdLayer(
+    compression_type = psdtags.PsdCompressionType.ZIP_PREDICTED
+    psdformat = psdtags.PsdFormat.LE32BIT
+    key = psdtags.PsdKey.LAYER_16 if dtype == np.uint16 else psdtags.PsdKey.LAYER
+    layers = [psdtags.PsdLayer(
         name=label,
-        rectangle=PsdRectangle(0, 0, *shape),
+        rectangle=psdtags.PsdRectangle(0, 0, *shape),
         channels=[
-            PsdChannel(
-                channelid=PsdChannelId.TRANSPARENCY_MASK,
+            psdtags.PsdChannel(
+                channelid=psdtags.PsdChannelId.TRANSPARENCY_MASK,
                 compression=compression_type,
                 data=transp,
             ),
-            PsdChannel(
-                channelid=PsdChannelId.CHANNEL0,
+            psdtags.PsdChannel(
+                channelid=psdtags.PsdChannelId.CHANNEL0,
                 compression=compression_type,
                 data=image[..., 0],
             ),
-            PsdChannel(
-                channelid=PsdChannelId.CHANNEL1,
+            psdtags.PsdChannel(
+                channelid=psdtags.PsdChannelId.CHANNEL1,
                 compression=compression_type,
                 data=image[..., 1],
             ),
-            PsdChannel(
-                channelid=PsdChannelId.CHANNEL2,
+            psdtags.PsdChannel(
+                channelid=psdtags.PsdChannelId.CHANNEL2,
                 compression=compression_type,
                 data=image[..., 2],
             ),
         ],
-        mask=PsdLayerMask(), opacity=255,
-        blendmode=PsdBlendMode.NORMAL, blending_ranges=(),
-        clipping=PsdClippingType.BASE, flags=PsdLayerFlag.PHOTOSHOP5,
-        info=[PsdString(PsdKey.UNICODE_LAYER_NAME, label)],
+        mask=psdtags.PsdLayerMask(), opacity=255,
+        blendmode=psdtags.PsdBlendMode.NORMAL, blending_ranges=(),
+        clipping=psdtags.PsdClippingType.BASE, flags=psdtags.PsdLayerFlag.PHOTOSHOP5,
+        info=[psdtags.PsdString(psdtags.PsdKey.UNICODE_LAYER_NAME, label)],
     ) for label, image in reversed(list(image_dict.items()))]
-    image_source_data = TiffImageSourceData(
+    image_source_data = psdtags.TiffImageSourceData(
         name='Layered TIFF',
         psdformat=psdformat,
-        layers=PsdLayers(
+        layers=psdtags.PsdLayers(
             key=key,
             has_transparency=False,
             layers=layers,
         ),
-        usermask=PsdUserMask(
-            colorspace=PsdColorSpaceType.RGB,
+        usermask=psdtags.PsdUserMask(
+            colorspace=psdtags.PsdColorSpaceType.RGB,
             components=(65535, 0, 0, 0),
             opacity=50,
         ),
         info=[
-            PsdEmpty(PsdKey.PATTERNS),
-            PsdFilterMask(
-                colorspace=PsdColorSpaceType.RGB,
+            psdtags.PsdEmpty(psdtags.PsdKey.PATTERNS),
+            psdtags.PsdFilterMask(
+                colorspace=psdtags.PsdColorSpaceType.RGB,
                 components=(65535, 0, 0, 0),
                 opacity=50,
             ),
@@ -143,12 +145,13 @@ def write_multilayer_tiff_from_images(image_dict, output_file, exif_path='', cal
         if callback:
             callback(output_file.split('/')[-1])
     compression = 'adobe_deflate'
-    overlayed_images = overlay(
+    overlayed_images = psdtags.overlay(
         *((np.concatenate((image, np.expand_dims(transp, axis=-1)),
           axis=-1), (0, 0)) for image in image_dict.values()), shape=shape
     )
     tifffile.imwrite(output_file, overlayed_images,
                      compression=compression, metadata=None, **tiff_tags)
+    add_file_bytes_written(output_file)
 
 
 class MultiLayer(JobBase, FrameMultiDirectory):
@@ -4,7 +4,6 @@ import errno
 import logging
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 from .. config.config import config
 from .. config.constants import constants
 from .. core.colors import color_str
@@ -13,7 +12,7 @@ from .. core.framework import JobBase
 from .. core.core_utils import make_tqdm_bar
 from .. core.exceptions import RunStopException
 from .stack_framework import FrameMultiDirectory, SubAction
-from .utils import read_img, save_plot, get_img_metadata, validate_image
+from .utils import read_img, save_plot, get_img_metadata, validate_image, plt
 
 MAX_NOISY_PIXELS = 1000
 
@@ -168,14 +167,14 @@ class MaskNoise(SubAction):
         else:
             raise ImageLoadError(path, "file not found.")
 
-    def run_frame(self, _idx, _ref_idx, image):
+    def run_frame(self, _idx, _ref_idx, img_0):
         self.process.sub_message_r(color_str(': mask noisy pixels', constants.LOG_COLOR_LEVEL_3))
-        if len(image.shape) == 3:
-            corrected = image.copy()
+        if len(img_0.shape) == 3:
+            corrected = img_0.copy()
             for c in range(3):
-                corrected[:, :, c] = self.correct_channel(image[:, :, c])
+                corrected[:, :, c] = self.correct_channel(img_0[:, :, c])
         else:
-            corrected = self.correct_channel(image)
+            corrected = self.correct_channel(img_0)
         return corrected
 
     def correct_channel(self, channel):
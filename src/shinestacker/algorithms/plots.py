@@ -0,0 +1,240 @@
+# pylint: disable=C0114, C0115, C0116, C0415, E1101, W0212, W0718, R0903
+import os
+import atexit
+import itertools
+import pickle
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from .. config.config import config
+from .. config.constants import constants
+from .. core.core_utils import lazy_import
+
+pyplot = lazy_import('matplotlib.pyplot')
+
+
+class RecordedObject:
+    def __init__(self, figure, ref, shape=None):
+        self._figure = figure
+        self._ref = ref
+        # shape of the recorded array of axes, None for other objects
+        self._shape = shape
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._figure.record(self._ref, name, args, kwargs)
+        return call
+
+    def __getitem__(self, index):
+        shape = None
+        if self._shape:
+            shape = self._shape[len(index):] if isinstance(index, tuple) else self._shape[1:]
+        return RecordedObject(self._figure, ('item', self._ref, index), shape)
+
+    def __len__(self):
+        if not self._shape:
+            raise TypeError("recorded plot object has no length")
+        return self._shape[0]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def subplots_shape(args, kwargs):
+    """Shape of the axes returned by pyplot.subplots, following its squeeze rules."""
+    nrows = args[0] if len(args) > 0 else kwargs.get('nrows', 1)
+    ncols = args[1] if len(args) > 1 else kwargs.get('ncols', 1)
+    if not kwargs.get('squeeze', True):
+        return (nrows, ncols)
+    return tuple(n for n in (nrows, ncols) if n > 1)
+
+
+class RecordedFigure:
+    def __init__(self):
+        self.commands = []
+
+    def record(self, ref, name, args, kwargs):
+        self.commands.append((ref, name, args, kwargs))
+        result = ('result', len(self.commands) - 1)
+        if ref is None and name == 'subplots':
+            return (RecordedObject(self, ('item', result, 0)),
+                    RecordedObject(self, ('item', result, 1), subplots_shape(args, kwargs)))
+        return RecordedObject(self, result)
+
+
+def resolve(ref, results):
+    if ref[0] == 'result':
+        return results[ref[1]]
+    return resolve(ref[1], results)[ref[2]]
+
+
+def render_commands(commands, filename, dpi):
+    import matplotlib
+    matplotlib.use('agg')
+    try:
+        results = []
+        for ref, name, args, kwargs in commands:
+            target = pyplot if ref is None else resolve(ref, results)
+            results.append(getattr(target, name)(*args, **kwargs))
+        pyplot.savefig(filename, dpi=dpi)
+    finally:
+        pyplot.close('all')
+    return filename
+
+
+def render_recorded_plot(commands, data_path, png_path, dpi):
+    with open(data_path, 'wb') as f:
+        pickle.dump(commands, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return render_commands(commands, png_path, dpi)
+
+
+def render_plot_file(data_path, filename, dpi):
+    with open(data_path, 'rb') as f:
+        commands = pickle.load(f)
+    return render_commands(commands, filename, dpi)
+
+
+def render_image_thumbnail(path, png_path, width):
+    import cv2
+    import numpy as np
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise RuntimeError(f"Can't load file: {path}.")
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    h, w = img.shape[:2]
+    if w > width:
+        img = cv2.resize(img, (width, max(1, h * width // w)), interpolation=cv2.INTER_AREA)
+    cv2.imwrite(png_path, img)
+    return png_path
+
+
+class PyplotProxy:
+    def __getattr__(self, name):
+        figure = plot_renderer.recording()
+        if figure is None:
+            return getattr(pyplot, name)
+        if name == 'close':
+            return lambda *args, **kwargs: plot_renderer.discard()
+        return getattr(RecordedObject(figure, None), name)
+
+
+class PlotRenderer:
+    def __init__(self):
+        self._deferred = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._tmp_dir = None
+        self._counter = itertools.count()
+        self._plots = {}
+
+    @property
+    def deferred(self):
+        return config.DEFERRED_PLOTS if self._deferred is None else self._deferred
+
+    def set_deferred(self, deferred):
+        self._deferred = deferred
+
+    def recording(self):
+        if not self.deferred:
+            return None
+        figure = getattr(self._local, 'figure', None)
+        if figure is None:
+            figure = RecordedFigure()
+            self._local.figure = figure
+        return figure
+
+    def discard(self):
+        self._local.figure = None
+
+    def tmp_path(self, filename, ext):
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix='shinestacker-plots-')
+        name = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(self._tmp_dir, f"{next(self._counter):05d}-{name}.{ext}")
+
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(self.shutdown)
+        return self._executor
+
+    def submit(self, func, *args):
+        try:
+            return self.executor().submit(func, *args)
+        except (BrokenProcessPool, RuntimeError, OSError) as e:
+            logging.getLogger(__name__).warning(msg=f"plot worker not available: {e}")
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+
+    def save(self, filename):
+        figure = getattr(self._local, 'figure', None)
+        self._local.figure = None
+        if figure is None:
+            return None
+        with self._lock:
+            data_path = self.tmp_path(filename, 'pkl')
+            png_path = self.tmp_path(filename, 'png')
+            future = self.submit(render_recorded_plot, figure.commands, data_path, png_path,
+                                 constants.PLOT_THUMBNAIL_DPI)
+            self._plots[filename] = {'data': data_path, 'thumbnail': future, 'file': None}
+        return future
+
+    def is_recorded(self, filename):
+        return filename in self._plots
+
+    def thumbnail(self, filename):
+        with self._lock:
+            if filename in self._plots:
+                return self._plots[filename]['thumbnail']
+            png_path = self.tmp_path(filename, 'png')
+        return self.submit(render_image_thumbnail, filename, png_path,
+                           constants.PLOT_THUMBNAIL_WIDTH)
+
+    def render_file(self, filename):
+        with self._lock:
+            plot = self._plots.get(filename, None)
+            if plot is None:
+                future = Future()
+                future.set_result(filename)
+                return future
+            if plot['file'] is None:
+                os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+                plot['file'] = self.submit(render_plot_file, plot['data'], filename,
+                                           constants.PLOT_DPI)
+            return plot['file']
+
+    def render_pending(self):
+        """Render to their target files, in the background, the recorded plots
+        that were not requested yet, so that they outlive the recorded data."""
+        with self._lock:
+            filenames = [filename for filename, plot in self._plots.items()
+                         if plot['file'] is None]
+        return [self.render_file(filename) for filename in filenames]
+
+    def shutdown(self):
+        self.render_pending()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self._plots = {}
+
+
+plot_renderer = PlotRenderer()
+plt = PyplotProxy()
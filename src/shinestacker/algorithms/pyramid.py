@@ -3,10 +3,13 @@ import numpy as np
 import cv2
 from .. config.constants import constants
 from .. core.exceptions import RunStopException
-from .utils import read_img
 from .base_stack_algo import BaseStackAlgo
 
 
+def take_best(images, best):
+    return np.take_along_axis(np.asarray(images), best[np.newaxis, :, :, np.newaxis], axis=0)[0]
+
+
 class PyramidBase(BaseStackAlgo):
     def __init__(self, min_size=constants.DEFAULT_PY_MIN_SIZE,
                  kernel_size=constants.DEFAULT_PY_KERNEL_SIZE,
@@ -20,39 +23,41 @@ class PyramidBase(BaseStackAlgo):
         kernel = np.array([0.25 - gen_kernel / 2.0, 0.25,
                            gen_kernel, 0.25, 0.25 - gen_kernel / 2.0])
         self.gen_kernel = np.outer(kernel, kernel)
+        self.kernel = kernel.reshape(1, -1)
+        # zero-stuffing followed by the 5-tap kernel (scaled by 2 per axis) is
+        # equivalent to pixel replication followed by this shifted kernel
+        a, b, c = 2.0 * kernel[:3]
+        self.expand_kernel = np.array([[0.0, a, c - b + a, b - a, a]])
 
     def convolve(self, image):
-        return cv2.filter2D(image, -1, self.gen_kernel, borderType=cv2.BORDER_REFLECT101)
+        return cv2.sepFilter2D(image, -1, self.kernel, self.kernel,
+                               borderType=cv2.BORDER_REFLECT101)
 
     def reduce_layer(self, layer):
-        if len(layer.shape) == 2:
-            return self.convolve(layer)[::2, ::2]
-        reduced_channels = [self.reduce_layer(layer[:, :, channel])
-                            for channel in range(layer.shape[2])]
-        return np.stack(reduced_channels, axis=-1)
+        return np.ascontiguousarray(self.convolve(layer)[::2, ::2])
 
     def expand_layer(self, layer):
-        if len(layer.shape) == 2:
-            expand = np.empty((2 * layer.shape[0], 2 * layer.shape[1]), dtype=layer.dtype)
-            expand[::2, ::2] = layer
-            expand[1::2, :] = 0
-            expand[:, 1::2] = 0
-            return 4. * self.convolve(expand)
-        ch_layer = self.expand_layer(layer[:, :, 0])
-        next_layer = np.zeros(list(ch_layer.shape) + [layer.shape[2]], dtype=layer.dtype)
-        next_layer[:, :, 0] = ch_layer
-        for channel in range(1, layer.shape[2]):
-            next_layer[:, :, channel] = self.expand_layer(layer[:, :, channel])
-        return next_layer
+        # reflect-101 borders of the stuffed image map to a reflect-101
+        # leading edge and a replicated trailing edge of the source layer
+        padded = cv2.copyMakeBorder(layer, 1, 0, 1, 0, cv2.BORDER_REFLECT101)
+        padded = cv2.copyMakeBorder(padded, 0, 1, 0, 1, cv2.BORDER_REPLICATE)
+        h, w = padded.shape[:2]
+        upsampled = cv2.resize(padded, (2 * w, 2 * h), interpolation=cv2.INTER_NEAREST)
+        return cv2.sepFilter2D(upsampled, -1, self.expand_kernel, self.expand_kernel,
+                               borderType=cv2.BORDER_REFLECT101)[2:-2, 2:-2]
 
     def fuse_laplacian(self, laplacians):
-        gray_laps = [cv2.cvtColor(lap.astype(np.float32), cv2.COLOR_BGR2GRAY) for lap in laplacians]
-        energies = [self.convolve(np.square(gray_lap)) for gray_lap in gray_laps]
-        best = np.argmax(energies, axis=0)
-        fused = np.zeros_like(laplacians[0])
+        best, best_energy = None, None
         for i, lap in enumerate(laplacians):
-            fused += np.where(best[:, :, np.newaxis] == i, lap, 0)
-        return fused
+            gray_lap = cv2.cvtColor(lap.astype(np.float32), cv2.COLOR_BGR2GRAY)
+            energy = self.convolve(np.square(gray_lap))
+            if best is None:
+                best, best_energy = np.zeros(energy.shape, dtype=np.intp), energy
+            else:
+                higher = energy > best_energy
+                best[higher] = i
+                np.copyto(best_energy, energy, where=higher)
+        return take_best(laplacians, best)
 
     def collapse(self, pyramid):
         img = pyramid[-1]
@@ -103,11 +108,8 @@ class PyramidBase(BaseStackAlgo):
         deviations = np.array([self.deviation(img) for img in gray_images])
         best_e = np.argmax(entropies, axis=0)
         best_d = np.argmax(deviations, axis=0)
-        fused = np.zeros(images.shape[1:], dtype=self.float_type)
-        for layer in range(layers):
-            img = images[layer]
-            fused += np.where(best_e[:, :, np.newaxis] == layer, img, 0)
-            fused += np.where(best_d[:, :, np.newaxis] == layer, img, 0)
+        fused = take_best(images, best_e).astype(self.float_type) + \
+            take_best(images, best_d).astype(self.float_type)
         return (fused / 2).astype(images.dtype)
 
 
@@ -154,23 +156,31 @@ class PyramidStack(PyramidBase):
         n = len(filenames)
         for i, img_path in enumerate(filenames):
             self.print_message(f": validating file {img_path.split('/')[-1]}")
-
-            img, metadata, updated = self.read_image_and_update_metadata(img_path, metadata)
+            frame = self.cached_frame(img_path)
+            if frame is None:
+                metadata, updated = self.probe_image_and_update_metadata(img_path, metadata)
+            else:
+                metadata, updated = self.update_metadata_from_cache(frame, metadata)
             if updated:
                 self.dtype = metadata[1]
                 self.num_pixel_values = constants.NUM_UINT8 \
                     if self.dtype == np.uint8 else constants.NUM_UINT16
                 self.max_pixel_value = constants.MAX_UINT8 \
                     if self.dtype == np.uint8 else constants.MAX_UINT16
-                levels = int(np.log2(min(img.shape[:2]) / self.min_size))
+                levels = int(np.log2(min(metadata[0][:2]) / self.min_size))
             if self.do_step_callback:
                 self.process.callback('after_step', self.process.id, self.process.name, i)
             if self.process.callback('check_running', self.process.id, self.process.name) is False:
                 raise RunStopException(self.name)
         for i, img_path in enumerate(filenames):
             self.print_message(f": processing file {img_path.split('/')[-1]}")
-            img = read_img(img_path)
-            all_laplacians.append(self.process_single_image(img, levels))
+            frame = self.cached_frame(img_path)
+            if frame is None:
+                img, _metadata, _updated = self.read_image_and_update_metadata(img_path, metadata)
+                frame = self.cache_frame(img_path, {
+                    'metadata': metadata,
+                    'laplacians': self.process_single_image(img, levels)})
+            all_laplacians.append(frame['laplacians'])
             if self.do_step_callback:
                 self.process.callback('after_step', self.process.id, self.process.name, i + n)
             if self.process.callback('check_running', self.process.id, self.process.name) is False:
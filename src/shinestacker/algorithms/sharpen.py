@@ -1,23 +1,27 @@
-# pylint: disable=C0114, C0116, E1101
+# pylint: disable=C0114, C0116, E1101, R0913, R0917
+import math
 import cv2
 import numpy as np
+from .. config.constants import constants
+from .tiling import process_tiled
 
 
-def unsharp_mask(image, radius=1.0, amount=1.0, threshold=0.0):
-    if image.dtype == np.uint16:
-        threshold = threshold * 256
+def unsharp_mask_tile(image, radius, amount, threshold):
     blurred = cv2.GaussianBlur(image, (0, 0), radius)
-    if threshold == 0:
-        sharpened = cv2.addWeighted(image, 1.0 + amount, blurred, -amount, 0)
-    else:
-        image_float = image.astype(np.float32)
-        blurred_float = blurred.astype(np.float32)
-        diff = image_float - blurred_float
-        mask = np.abs(diff) > threshold
-        sharpened_float = np.where(mask, image_float + amount * diff, image_float)
+    sharpened = cv2.addWeighted(image, 1.0 + amount, blurred, -amount, 0)
+    if threshold > 0:
+        diff = cv2.absdiff(image, blurred, dst=blurred)
         if np.issubdtype(image.dtype, np.integer):
-            min_val, max_val = np.iinfo(image.dtype).min, np.iinfo(image.dtype).max
-            sharpened = np.clip(sharpened_float, min_val, max_val).astype(image.dtype)
-        else:
-            sharpened = sharpened_float.astype(image.dtype)
+            threshold = math.floor(threshold)
+        keep = cv2.compare(diff, threshold, cv2.CMP_LE)
+        cv2.copyTo(image, keep, sharpened)
     return sharpened
+
+
+def unsharp_mask(image, radius=1.0, amount=1.0, threshold=0.0,
+                 tile_size=constants.DEFAULT_TILE_SIZE, max_workers=None):
+    if image.dtype == np.uint16:
+        threshold = threshold * 256
+    margin = math.ceil(4 * radius) + 1
+    return process_tiled(image, unsharp_mask_tile, radius, amount, threshold,
+                         margin=margin, tile_size=tile_size, max_workers=max_workers)
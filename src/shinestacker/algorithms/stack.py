@@ -1,13 +1,14 @@
-# pylint: disable=C0114, C0115, C0116, R0913, R0917
+# pylint: disable=C0114, C0115, C0116, R0902, R0913, R0917
 import os
+import logging
 import numpy as np
 from .. config.constants import constants
 from .. core.framework import JobBase
 from .. core.colors import color_str
 from .. core.exceptions import InvalidOptionError
-from .utils import write_img
+from .utils import validate_image_files, WriteQueue
 from .stack_framework import FrameDirectory, ActionList
-from .exif import copy_exif_from_file_to_file
+from .exif import get_metadata, write_image_with_metadata
 from .denoise import denoise
 
 
@@ -21,36 +22,68 @@ class FocusStackBase(JobBase, FrameDirectory):
         self.denoise_amount = kwargs.pop('denoise_amount', 0)
         self.plot_stack = kwargs.pop('plot_stack', constants.DEFAULT_PLOT_STACK)
         self.stack_algo.process = self
+        self.write_queue = WriteQueue()
+        self.metadata = None
         self.frame_count = -1
 
     def focus_stack(self, filenames):
         self.sub_message_r(color_str(': reading input files', constants.LOG_COLOR_LEVEL_3))
         img_files = sorted([os.path.join(self.input_full_path, name) for name in filenames])
-        stacked_img = self.stack_algo.focus_stack(img_files)
+        with self.measure('fusion', self.stack_algo.name()):
+            stacked_img = self.stack_algo.focus_stack(img_files)
         in_filename = filenames[0].split(".")
         out_filename = f"{self.output_dir}/{self.prefix}{in_filename[0]}." + \
             '.'.join(in_filename[1:])
         if self.denoise_amount > 0:
             self.sub_message_r(': denoise image')
-            stacked_img = denoise(stacked_img, self.denoise_amount, self.denoise_amount)
-        write_img(out_filename, stacked_img)
-        if self.exif_path != '' and stacked_img.dtype == np.uint8:
-            self.sub_message_r(': copy exif data')
-            _dirpath, _, fnames = next(os.walk(self.exif_path))
-            fnames = [name for name in fnames
-                      if os.path.splitext(name)[-1][1:].lower() in constants.EXTENSIONS]
-            exif_filename = f"{self.exif_path}/{fnames[0]}"
-            copy_exif_from_file_to_file(exif_filename, out_filename)
-            self.sub_message_r(' ' * 60)
+            with self.measure('denoise', 'denoise'):
+                stacked_img = denoise(stacked_img, self.denoise_amount, self.denoise_amount)
+        plot_name = None
         if self.plot_stack:
             idx_str = f"{self.frame_count + 1:04d}" if self.frame_count >= 0 else ''
-            name = f"{self.name}: {self.stack_algo.name()}"
+            plot_name = f"{self.name}: {self.stack_algo.name()}"
             if idx_str != '':
-                name += f"\nbunch: {idx_str}"
-            self.callback('save_plot', self.id, name, out_filename)
+                plot_name += f"\nbunch: {idx_str}"
+        metadata = self.output_metadata() if stacked_img.dtype == np.uint8 else None
+        # the next bunch is fused while this one is written
+        with self.measure('write', 'write_queue'):
+            self.write_queue.submit(self.save_output, out_filename, stacked_img, metadata,
+                                    plot_name, key=out_filename)
         if self.frame_count >= 0:
             self.frame_count += 1
 
+    def output_metadata(self):
+        if self.exif_path == '':
+            return None
+        if self.metadata is None:
+            self.sub_message_r(': read exif data')
+            _dirpath, _, fnames = next(os.walk(self.exif_path))
+            fnames = [name for name in fnames
+                      if os.path.splitext(name)[-1][1:].lower() in constants.EXTENSIONS]
+            with self.measure('read', 'get_metadata'):
+                self.metadata = get_metadata(f"{self.exif_path}/{fnames[0]}")
+        return self.metadata
+
+    def save_output(self, out_filename, stacked_img, metadata, plot_name):
+        with self.measure('write', 'write_img'):
+            write_image_with_metadata(metadata, stacked_img, out_filename)
+        if plot_name is not None:
+            self.callback('save_plot', self.id, plot_name, out_filename)
+
+    def flush_output(self):
+        with self.measure('write', 'write_queue_flush'):
+            self.write_queue.close()
+
+    def cancel_output(self):
+        error = self.write_queue.cancel()
+        if error is not None:
+            self.print_message(color_str(f"output write failed: {error}",
+                                         constants.LOG_COLOR_ALERT), level=logging.ERROR)
+
+    def validate_frames(self, filenames):
+        with self.measure('validate', 'validate_image_files'):
+            validate_image_files([os.path.join(self.input_full_path, name) for name in filenames])
+
     def init(self, job, working_path=''):
         if self.exif_path is None:
             self.exif_path = job.paths[0]
@@ -85,16 +118,30 @@ class FocusStackBunch(ActionList, FocusStackBase):
     def begin(self):
         ActionList.begin(self)
         fnames = self.folder_filelist()
+        self.validate_frames(fnames)
         self._chunks = get_bunches(fnames, self.frames, self.overlap)
         self.set_counts(len(self._chunks))
 
     def end(self):
+        self.stack_algo.set_frame_cache((), ())
+        self.flush_output()
         ActionList.end(self)
 
+    def abort(self):
+        self.stack_algo.set_frame_cache((), ())
+        self.cancel_output()
+
     def run_step(self):
         self.print_message_r(color_str(f"fusing bunch: {self.count + 1}/{self.counts}",
                                        constants.LOG_COLOR_LEVEL_2))
-        self.focus_stack(self._chunks[self.count - 1])
+        chunk = self._chunks[self.count]
+        next_chunk = self._chunks[self.count + 1] if self.count + 1 < len(self._chunks) else []
+        # frames shared with the next bunch keep their decomposition in the algorithm's cache
+        self.stack_algo.set_frame_cache(self.full_paths(chunk), self.full_paths(next_chunk))
+        self.focus_stack(chunk)
+
+    def full_paths(self, filenames):
+        return [os.path.join(self.input_full_path, name) for name in filenames]
 
 
 class FocusStack(FocusStackBase):
@@ -104,9 +151,15 @@ class FocusStack(FocusStackBase):
 
     def run_core(self):
         self.set_filelist()
+        self.validate_frames(self.filenames)
         self.callback('step_counts', self.id, self.name,
                       self.stack_algo.steps_per_frame() * len(self.filenames))
-        self.focus_stack(self.filenames)
+        try:
+            self.focus_stack(self.filenames)
+        except BaseException:
+            self.cancel_output()
+            raise
+        self.flush_output()
 
     def init(self, job, _working_path=''):
         FrameDirectory.init(self, job)
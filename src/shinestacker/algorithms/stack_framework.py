@@ -2,12 +2,14 @@
 # pylint: disable=R0917, R0913, R1702, R0912, E1111, E1121, W0613
 import logging
 import os
+import numpy as np
 from .. config.constants import constants
 from .. core.colors import color_str
 from .. core.framework import Job, ActionList
 from .. core.core_utils import check_path_exists
 from .. core.exceptions import ShapeError, BitDepthError, RunStopException
-from .utils import read_img, write_img
+from .utils import read_img, write_img, validate_image_files, img_proxy, WriteQueue
+from .tiling import process_tiled
 
 
 class StackJob(Job):
@@ -232,6 +234,100 @@ class FramesRefActions(ActionList, FrameDirectory):
             self._idx_step = -1
 
 
+class PixelOp:
+    """A per-pixel correction that can be deferred and fused with others into one pass.
+
+    Operators that depend on the pixel position set uses_coordinates and receive the
+    (x, y) coordinates of the tile pixels in the frame where the operator was defined.
+    """
+    uses_coordinates = False
+
+    def apply(self, tile, _coords):
+        return tile
+
+
+def transform_coords(transform, xs, ys):
+    x = transform[0, 0] * xs + transform[0, 1] * ys + transform[0, 2]
+    y = transform[1, 0] * xs + transform[1, 1] * ys + transform[1, 2]
+    if np.any(transform[2] != (0, 0, 1)):
+        d = transform[2, 0] * xs + transform[2, 1] * ys + transform[2, 2]
+        x, y = x / d, y / d
+    return x, y
+
+
+def apply_pixel_ops(tile, origin, ops, shape):
+    y0, x0 = origin
+    h, w = tile.shape[:2]
+    ys, xs = np.ogrid[y0:y0 + h, x0:x0 + w]
+    for op, transform in ops:
+        coords = None
+        if op.uses_coordinates:
+            if transform is None:
+                coords = (xs, ys)
+            else:
+                # pixels filled from outside the frame by the warp border take the
+                # correction of the nearest frame pixel, as if corrected before the warp
+                x, y = transform_coords(transform, xs, ys)
+                coords = (np.clip(x, 0, shape[1] - 1), np.clip(y, 0, shape[0] - 1))
+        tile = op.apply(tile, coords)
+    return tile
+
+
+class DeferredFrame:
+    """Frame pixels with the per-pixel operators still to be applied to them.
+
+    Geometric warps are applied to the pixels right away, and pending operators
+    are remapped so that they run after the warp. All pending operators are then
+    applied tile by tile in a single pass when the pixels are needed.
+
+    Subsampled proxies of the pixels are cached, so that sub-actions working at
+    the same resolution share them until the pixels change.
+    """
+    def __init__(self, img):
+        self.base = img
+        self.ops = []
+        self._reduced = {}
+
+    def add_op(self, op):
+        self.ops.append((op, None))
+
+    def set_pixels(self, img):
+        self.base = img
+        self.ops = []
+        self._reduced = {}
+
+    def warp(self, img, m):
+        m = np.asarray(m, dtype=np.float64)
+        if m.shape == (2, 3):
+            m = np.vstack([m, (0, 0, 1)])
+        inverse = np.linalg.inv(m)
+        self.ops = [(op, inverse if t is None else t @ inverse) for op, t in self.ops]
+        self.base = img
+        self._reduced = {}
+
+    def pixels(self):
+        if self.ops and self.base is not None:
+            self.base = process_tiled(self.base, apply_pixel_ops, self.ops, self.base.shape,
+                                      with_origin=True)
+            self.ops = []
+            self._reduced = {}
+        return self.base
+
+    def proxy(self, subsample, fast_subsampling):
+        """Subsampled frame with the pending operators applied, for statistics.
+        The returned pixels may be shared and must not be modified."""
+        key = (subsample, fast_subsampling)
+        if key not in self._reduced:
+            self._reduced[key] = img_proxy(self.base, subsample, fast_subsampling)
+        img = self._reduced[key]
+        if not self.ops:
+            return img
+        offset = 0 if fast_subsampling else (subsample - 1) / 2
+        scale = np.array([[subsample, 0, offset], [0, subsample, offset], [0, 0, 1]])
+        return apply_pixel_ops(img, (0, 0), [(op, scale if t is None else t @ scale)
+                                             for op, t in self.ops], self.base.shape)
+
+
 class SubAction:
     def __init__(self, enabled=True):
         self.enabled = enabled
@@ -242,24 +338,45 @@ class SubAction:
     def end(self):
         pass
 
+    def working_resolution(self):
+        """Subsampling and fast subsampling flag of the frame proxy that the sub-action
+        takes its statistics from, or None if it doesn't use one."""
+        return None
+
+    def run_frame(self, _idx, _ref_idx, img_0):
+        return img_0
+
+    def process_frame(self, idx, ref_idx, frame):
+        frame.set_pixels(self.run_frame(idx, ref_idx, frame.pixels()))
+
 
 class CombinedActions(FramesRefActions):
     def __init__(self, name, actions=[], enabled=True, **kwargs):
         FramesRefActions.__init__(self, name, enabled, **kwargs)
         self._actions = actions
+        self.tiff_compression = kwargs.get('tiff_compression',
+                                           constants.DEFAULT_TIFF_COMPRESSION)
+        self.write_queue = WriteQueue()
         self.dtype = None
         self.shape = None
 
     def begin(self):
         FramesRefActions.begin(self)
+        with self.measure('validate', 'validate_image_files'):
+            validate_image_files([f"{self.input_full_path}/{filename}"
+                                  for filename in self.filenames])
         for a in self._actions:
             if a.enabled:
                 a.begin(self)
 
     def img_ref(self, idx):
         filename = self.filenames[idx]
-        img = read_img((self.output_dir
-                        if self.step_process else self.input_full_path) + f"/{filename}")
+        if self.step_process:
+            path = f"{self.output_dir}/{filename}"
+            self.write_queue.wait(path)
+        else:
+            path = f"{self.input_full_path}/{filename}"
+        img = read_img(path)
         if img is None:
             raise RuntimeError(f"Invalid file: {self.input_full_path}/{filename}")
         self.dtype = img.dtype
@@ -269,7 +386,8 @@ class CombinedActions(FramesRefActions):
     def run_frame(self, idx, ref_idx):
         filename = self.filenames[idx]
         self.sub_message_r(color_str(': read input image', constants.LOG_COLOR_LEVEL_3))
-        img = read_img(f"{self.input_full_path}/{filename}")
+        with self.measure('read', 'read_img', step=self.count):
+            img = read_img(f"{self.input_full_path}/{filename}")
         if self.dtype is not None and img.dtype != self.dtype:
             raise BitDepthError(self.dtype, img.dtype, )
         if self.shape is not None and img.shape != self.shape:
@@ -279,6 +397,8 @@ class CombinedActions(FramesRefActions):
         if len(self._actions) == 0:
             self.sub_message(color_str(": no actions specified.", constants.LOG_COLOR_ALERT),
                              level=logging.WARNING)
+        # per-pixel corrections are deferred and applied together in one tiled pass
+        frame = DeferredFrame(img)
         for a in self._actions:
             if not a.enabled:
                 self.get_logger().warning(color_str(f"{self.base_message}: sub-action disabled",
@@ -286,17 +406,35 @@ class CombinedActions(FramesRefActions):
             else:
                 if self.callback('check_running', self.id, self.name) is False:
                     raise RunStopException(self.name)
-                img = a.run_frame(idx, ref_idx, img)
+                with self.measure('sub_action', a.__class__.__name__, step=self.count):
+                    a.process_frame(idx, ref_idx, frame)
+        with self.measure('pixel_ops', 'apply_pixel_ops', step=self.count):
+            img = frame.pixels()
         self.sub_message_r(color_str(': write output image', constants.LOG_COLOR_LEVEL_3))
         if img is not None:
-            write_img(self.output_dir + "/" + filename, img)
+            # encoding overlaps with the next frame; submit blocks when the queue is full
+            path = f"{self.output_dir}/{filename}"
+            with self.measure('write', 'write_queue', step=self.count):
+                self.write_queue.submit(self.write_frame, path, img, self.count, key=path)
         else:
             self.print_message(color_str(
                 "No output file resulted from processing input file: "
                 f"{self.input_full_path}/{filename}",
                 constants.LOG_COLOR_ALERT), level=logging.WARNING)
 
+    def write_frame(self, path, img, step):
+        with self.measure('write', 'write_img', step=step):
+            write_img(path, img, compression=self.tiff_compression)
+
+    def abort(self):
+        error = self.write_queue.cancel()
+        if error is not None:
+            self.print_message(color_str(f"output write failed: {error}",
+                                         constants.LOG_COLOR_ALERT), level=logging.ERROR)
+
     def end(self):
+        with self.measure('write', 'write_queue_flush'):
+            self.write_queue.close()
         for a in self._actions:
             if a.enabled:
                 a.end()
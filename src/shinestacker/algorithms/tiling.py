@@ -0,0 +1,49 @@
+# pylint: disable=C0114, C0116, R0913
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .. config.constants import constants
+
+
+def tile_grid(shape, tile_size=constants.DEFAULT_TILE_SIZE, margin=0):
+    h, w = shape[:2]
+    for y0 in range(0, h, tile_size):
+        y1 = min(y0 + tile_size, h)
+        for x0 in range(0, w, tile_size):
+            x1 = min(x0 + tile_size, w)
+            yield ((y0, y1, x0, x1),
+                   (max(0, y0 - margin), min(h, y1 + margin),
+                    max(0, x0 - margin), min(w, x1 + margin)))
+
+
+def default_tile_workers():
+    return max(1, min(constants.MAX_TILE_WORKERS, os.cpu_count() or 1))
+
+
+def process_tiled(image, func, *args, margin=0, tile_size=constants.DEFAULT_TILE_SIZE,
+                  max_workers=None, with_origin=False, **kwargs):
+    """Apply func to image tile by tile on a thread pool.
+
+    Each tile is processed together with a context margin on every side, and
+    only its core is written back. If margin covers the support of a local
+    filter, the result is the same as processing the whole image at once,
+    without visible seams. With with_origin, func also receives the (y, x)
+    position of the tile in the image as its second argument.
+    """
+    h, w = image.shape[:2]
+    if h <= tile_size and w <= tile_size:
+        return func(image, *(((0, 0),) if with_origin else ()), *args, **kwargs)
+    result = np.empty_like(image)
+
+    def run_tile(tile):
+        (y0, y1, x0, x1), (py0, py1, px0, px1) = tile
+        origin = ((py0, px0),) if with_origin else ()
+        out = func(image[py0:py1, px0:px1], *origin, *args, **kwargs)
+        result[y0:y1, x0:x1] = out[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+
+    with ThreadPoolExecutor(max_workers=max_workers or default_tile_workers()) as executor:
+        futures = [executor.submit(run_tile, tile)
+                   for tile in tile_grid(image.shape, tile_size, margin)]
+        for future in futures:
+            future.result()
+    return result
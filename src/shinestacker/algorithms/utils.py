@@ -1,33 +1,273 @@
-# pylint: disable=C0114, C0116, E1101
+# pylint: disable=C0114, C0116, E1101, R0914, R1732
 import os
+import io
+import struct
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
-import matplotlib.pyplot as plt
 from .. config.config import config
-from .. core.exceptions import ShapeError, BitDepthError
+from .. core.exceptions import ShapeError, BitDepthError, ImageLoadError
+from .. config.constants import constants
+from .. core.metrics import (
+    add_file_bytes_read, add_file_bytes_written, add_bytes_read, add_bytes_written, io_bytes)
+from .plots import plt, plot_renderer
+from .codecs import get_codec
 
 
 def read_img(file_path):
     if not os.path.isfile(file_path):
         raise RuntimeError("File does not exist: " + file_path)
-    ext = file_path.split(".")[-1]
-    img = None
-    if ext in ['jpeg', 'jpg']:
-        img = cv2.imread(file_path)
-    elif ext in ['tiff', 'tif', 'png']:
-        img = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+    codec = get_codec(file_path)
+    img = None if codec is None else codec.read(file_path)
+    if img is not None:
+        add_file_bytes_read(file_path)
     return img
 
 
-def write_img(file_path, img):
+TIFF_TYPES = {1: ('B', 1), 3: ('H', 2), 4: ('I', 4), 6: ('b', 1), 8: ('h', 2), 9: ('i', 4),
+              16: ('Q', 8), 17: ('q', 8)}
+TIFF_DTYPES = {(1, 8): np.uint8, (1, 16): np.uint16, (3, 32): np.float32}
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 4, 6: 4}
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_tiff_tags(f, tags, base=0):
+    f.seek(base)
+    header = f.read(16)
+    order = {b'II': '<', b'MM': '>'}.get(header[:2], None)
+    if order is None:
+        return None
+    version = struct.unpack(order + 'H', header[2:4])[0]
+    if version == 42:
+        offset = struct.unpack(order + 'I', header[4:8])[0]
+        count_fmt, entry_size, field_size, offset_fmt = 'H', 12, 4, 'I'
+    elif version == 43:
+        offset = struct.unpack(order + 'Q', header[8:16])[0]
+        count_fmt, entry_size, field_size, offset_fmt = 'Q', 20, 8, 'Q'
+    else:
+        return None
+    f.seek(base + offset)
+    count_size = struct.calcsize(count_fmt)
+    n_entries = struct.unpack(order + count_fmt, f.read(count_size))[0]
+    entries = f.read(n_entries * entry_size)
+    values = {}
+    for i in range(n_entries):
+        entry = entries[i * entry_size:(i + 1) * entry_size]
+        tag, value_type = struct.unpack(order + 'HH', entry[:4])
+        if tag not in tags or value_type not in TIFF_TYPES:
+            continue
+        n_values = struct.unpack(order + offset_fmt, entry[4:4 + field_size])[0]
+        fmt, size = TIFF_TYPES[value_type]
+        field = entry[4 + field_size:]
+        if n_values * size > field_size:
+            f.seek(base + struct.unpack(order + offset_fmt, field)[0])
+            field = f.read(n_values * size)
+        values[tag] = struct.unpack(order + fmt * n_values, field[:n_values * size])
+    return values
+
+
+def probe_tiff(f):
+    tags = read_tiff_tags(f, {256, 257, 258, 262, 277, 339})
+    if tags is None or 256 not in tags or 257 not in tags:
+        return None
+    bits = tags.get(258, (1,))[0]
+    dtype = TIFF_DTYPES.get((tags.get(339, (1,))[0], bits), None)
+    if dtype is None:
+        return None
+    channels = 3 if tags.get(262, (None,))[0] == 3 else tags.get(277, (1,))[0]
+    return (tags[257][0], tags[256][0]), dtype, channels
+
+
+def probe_png(f):
+    header = f.read(29)
+    if header[:8] != b'\x89PNG\r\n\x1a\n' or header[12:16] != b'IHDR':
+        return None
+    width, height, bits, color_type = struct.unpack('>IIBB', header[16:26])
+    if color_type not in PNG_CHANNELS:
+        return None
+    return (height, width), np.uint16 if bits == 16 else np.uint8, PNG_CHANNELS[color_type]
+
+
+def probe_jpeg(f):
+    if f.read(2) != b'\xff\xd8':
+        return None
+    orientation = 1
+    while True:
+        byte = f.read(1)
+        if byte == b'':
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if marker == b'' or marker[0] == 0xDA:
+            return None
+        if marker[0] in (0x01, 0x00) or 0xD0 <= marker[0] <= 0xD8:
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if marker[0] in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', f.read(5))
+            # cv2.imread applies the EXIF orientation to JPEG files
+            shape = (width, height) if orientation in (5, 6, 7, 8) else (height, width)
+            return shape, np.uint8, 3
+        payload = f.read(length - 2)
+        if marker[0] == 0xE1 and payload[:6] == b'Exif\x00\x00':
+            tags = read_tiff_tags(io.BytesIO(payload[6:]), {0x0112})
+            if tags and 0x0112 in tags:
+                orientation = tags[0x0112][0]
+
+
+def probe_img(file_path):
+    """Return (shape, dtype, channels) of the image that read_img would return.
+
+    Only the file headers are read. Files that cannot be probed from the headers
+    are fully decoded. Returns None if the file format is not supported.
+    """
+    if not os.path.isfile(file_path):
+        raise RuntimeError("File does not exist: " + file_path)
     ext = file_path.split(".")[-1]
-    if ext in ['jpeg', 'jpg']:
-        cv2.imwrite(file_path, img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
-    elif ext in ['tiff', 'tif']:
-        cv2.imwrite(file_path, img, [int(cv2.IMWRITE_TIFF_COMPRESSION), 1])
-    elif ext == 'png':
-        cv2.imwrite(file_path, img)
+    probe = {'jpeg': probe_jpeg, 'jpg': probe_jpeg,
+             'tiff': probe_tiff, 'tif': probe_tiff, 'png': probe_png}.get(ext, None)
+    if probe is None:
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            info = probe(f)
+    except (struct.error, OSError):
+        info = None
+    if info is None:
+        img = read_img(file_path)
+        if img is None:
+            return None
+        info = img.shape[:2], img.dtype, 1 if img.ndim == 2 else img.shape[2]
+    shape, dtype, channels = info
+    return shape, np.dtype(dtype), channels
+
+
+def validate_image_files(file_paths, expected_shape=None, expected_dtype=None):
+    """Check from the headers that all files have the same size and bit depth.
+
+    Returns the metadata (shape, dtype) of the files, and raises at the
+    first file that can't be loaded or doesn't match.
+    """
+    for path in file_paths:
+        info = probe_img(path)
+        if info is None:
+            raise ImageLoadError(path)
+        shape, dtype, _channels = info
+        if expected_shape is None:
+            expected_shape = shape
+        elif shape[:2] != expected_shape[:2]:
+            raise ShapeError(expected_shape, shape)
+        if expected_dtype is None:
+            expected_dtype = dtype
+        elif dtype != expected_dtype:
+            raise BitDepthError(expected_dtype, dtype)
+    return expected_shape, expected_dtype
+
+
+def _counting_io(func, item):
+    read_0, written_0 = io_bytes()
+    result = func(item)
+    read, written = io_bytes()
+    return result, read - read_0, written - written_0
+
+
+def _consume(future):
+    result, read, written = future.result()
+    # the I/O done ahead is credited to the thread that consumes the results
+    add_bytes_read(read)
+    add_bytes_written(written)
+    return result
+
+
+def prefetch(func, items):
+    """Yield func(item) for each item, computing the next result on a background thread."""
+    items = list(items)
+    if len(items) == 0:
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(_counting_io, func, items[0])
+        for item in items[1:]:
+            result = _consume(future)
+            future = executor.submit(_counting_io, func, item)
+            yield result
+        yield _consume(future)
+
+
+def write_img(file_path, img, **options):
+    codec = get_codec(file_path)
+    if codec is None:
+        return
+    codec.write(file_path, img, **options)
+    add_file_bytes_written(file_path)
+
+
+class WriteQueue:
+    """Run writes on background threads. submit() blocks while max_pending writes are
+    in flight, and the first failure is raised by wait() or close()."""
+    def __init__(self, max_workers=constants.MAX_WRITE_WORKERS,
+                 max_pending=constants.MAX_PENDING_WRITES):
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pending = []
+
+    def _run(self, func, args, kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._slots.release()
+
+    def submit(self, func, *args, key=None, **kwargs):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='write')
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._run, func, args, kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._pending = [(k, f) for k, f in self._pending
+                         if not f.done() or f.exception() is not None]
+        self._pending.append((key, future))
+        return future
+
+    def wait(self, key=None):
+        done = [(k, f) for k, f in self._pending if key is None or k == key]
+        self._pending = [(k, f) for k, f in self._pending if key is not None and k != key]
+        errors = [f.exception() for _k, f in done]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def cancel(self):
+        """Drop the writes not started yet, wait for the running ones and shut down.
+        Returns the first failure among the writes that ran, if any."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        error = None
+        for _k, f in self._pending:
+            if f.cancelled():
+                self._slots.release()
+            elif error is None:
+                error = f.exception()
+        self._pending = []
+        return error
 
 
 def img_8bit(img):
@@ -65,12 +305,15 @@ def validate_image(img, expected_shape=None, expected_dtype=None):
 
 def save_plot(filename):
     logging.getLogger(__name__).debug(msg=f"save plot file: {filename}")
+    if plot_renderer.deferred:
+        plot_renderer.save(filename)
+        return
     dir_path = os.path.dirname(filename)
     if not dir_path:
         dir_path = '.'
     if not os.path.isdir(dir_path):
         os.makedirs(dir_path)
-    plt.savefig(filename, dpi=150)
+    plt.savefig(filename, dpi=constants.PLOT_DPI)
     if config.JUPYTER_NOTEBOOK:
         plt.show()
     plt.close('all')
@@ -84,3 +327,11 @@ def img_subsample(img, subsample, fast=True):
                              fx=1 / subsample, fy=1 / subsample,
                              interpolation=cv2.INTER_AREA)
     return img_sub
+
+
+def img_proxy(img, subsample=1, fast=True, convert=None):
+    """Reduced image for statistics: subsampled first, with a strided view or INTER_AREA,
+    so that bit depth and color conversions only run on the reduced image."""
+    if subsample > 1:
+        img = img_subsample(img, subsample, fast)
+    return img if convert is None else convert(img)
@@ -1,14 +1,14 @@
-# pylint: disable=C0114, C0115, C0116, R0902, E1101, W0718, W0640, R0913, R0917, R0914
+# pylint: disable=C0114, C0115, C0116, R0902, E1101, W0718, W0640, R0913, R0917, R0914, R0903
 import traceback
 import logging
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit, fsolve
-import cv2
 from .. core.colors import color_str
 from .. config.constants import constants
-from .utils import img_8bit, save_plot, img_subsample
-from .stack_framework import SubAction
+from .. core.core_utils import lazy_import
+from .utils import img_bw_8bit, save_plot, img_proxy, plt
+from .stack_framework import SubAction, PixelOp, DeferredFrame
+
+optimize = lazy_import('scipy.optimize')
 
 CLIP_EXP = 10
 
@@ -43,31 +43,65 @@ def fit_sigmoid(radii, intensities):
     valid_mask = ~np.isnan(intensities)
     i_valid, r_valid = intensities[valid_mask], radii[valid_mask]
     r_max = radii.max()
-    res = curve_fit(sigmoid_model, r_valid, i_valid,
-                    p0=[2 * np.max(i_valid), 10 / r_max, 0.8 * r_max],
-                    bounds=([0, 0, 0], ['inf', 'inf', 'inf']))[0]
+    res = optimize.curve_fit(sigmoid_model, r_valid, i_valid,
+                             p0=[2 * np.max(i_valid), 10 / r_max, 0.8 * r_max],
+                             bounds=([0, 0, 0], ['inf', 'inf', 'inf']))[0]
     return res
 
 
 def img_subsampled(image, subsample=constants.DEFAULT_VIGN_SUBSAMPLE,
                    fast_subsampling=constants.DEFAULT_VIGN_FAST_SUBSAMPLING):
-    image_bw = cv2.cvtColor(img_8bit(image), cv2.COLOR_BGR2GRAY)
-    return image_bw if subsample == 1 else img_subsample(image_bw, subsample, fast_subsampling)
+    return img_proxy(image, subsample, fast_subsampling, img_bw_8bit)
 
 
 def compute_fit_parameters(
         image, r_steps, radii=None, intensities=None,
         subsample=constants.DEFAULT_VIGN_SUBSAMPLE,
         fast_subsampling=constants.DEFAULT_VIGN_FAST_SUBSAMPLING):
-    image_sub = img_subsampled(image, subsample, fast_subsampling)
     if radii is None and intensities is None:
-        radii, intensities = radial_mean_intensity(image_sub, r_steps)
+        radii, intensities = radial_mean_intensity(
+            img_subsampled(image, subsample, fast_subsampling), r_steps)
     params = fit_sigmoid(radii, intensities)
     params[1] /= subsample  # k
     params[2] *= subsample  # r0
     return params
 
 
+def vignetting_map(r, params, v0, max_correction=constants.DEFAULT_MAX_CORRECTION):
+    vignette = np.clip(sigmoid_model(r, *params) / v0, 1e-6, 1)
+    if max_correction < 1:
+        vignette = (1.0 - max_correction) + vignette * max_correction
+    return vignette
+
+
+def divide_vignetting(image, vignette, black_threshold=constants.DEFAULT_BLACK_THRESHOLD):
+    threshold = black_threshold if image.dtype == np.uint8 else black_threshold * 256
+    if len(image.shape) == 3:
+        vignette = vignette[:, :, np.newaxis]
+        vignette[np.min(image, axis=2) < threshold, :] = 1
+    else:
+        vignette[image < black_threshold] = 1
+    return np.clip(image / vignette, 0, 255
+                   if image.dtype == np.uint8 else 65535).astype(image.dtype)
+
+
+class VignettingOp(PixelOp):
+    uses_coordinates = True
+
+    def __init__(self, shape, params, v0, max_correction, black_threshold):
+        self.h_2, self.w_2 = shape[0] / 2, shape[1] / 2
+        self.params = params
+        self.v0 = v0
+        self.max_correction = max_correction
+        self.black_threshold = black_threshold
+
+    def apply(self, tile, coords):
+        xs, ys = coords
+        r = np.sqrt((xs - self.w_2)**2 + (ys - self.h_2)**2)
+        vignette = vignetting_map(r, self.params, self.v0, self.max_correction)
+        return divide_vignetting(tile, vignette, self.black_threshold)
+
+
 def correct_vignetting(
         image, max_correction=constants.DEFAULT_MAX_CORRECTION,
         black_threshold=constants.DEFAULT_BLACK_THRESHOLD,
@@ -81,20 +115,9 @@ def correct_vignetting(
             image, r_steps, subsample=subsample, fast_subsampling=fast_subsampling)
     if v0 is None:
         v0 = sigmoid_model(0, *params)
-    h, w = image.shape[:2]
-    y, x = np.ogrid[:h, :w]
-    r = np.sqrt((x - w / 2)**2 + (y - h / 2)**2)
-    vignette = np.clip(sigmoid_model(r, *params) / v0, 1e-6, 1)
-    if max_correction < 1:
-        vignette = (1.0 - max_correction) + vignette * max_correction
-    threshold = black_threshold if image.dtype == np.uint8 else black_threshold * 256
-    if len(image.shape) == 3:
-        vignette = vignette[:, :, np.newaxis]
-        vignette[np.min(image, axis=2) < threshold, :] = 1
-    else:
-        vignette[image < black_threshold] = 1
-    return np.clip(image / vignette, 0, 255
-                   if image.dtype == np.uint8 else 65535).astype(image.dtype)
+    frame = DeferredFrame(image)
+    frame.add_op(VignettingOp(image.shape, params, v0, max_correction, black_threshold))
+    return frame.pixels()
 
 
 class Vignetting(SubAction):
@@ -116,12 +139,13 @@ class Vignetting(SubAction):
         self.process = None
         self.corrections = None
 
-    def run_frame(self, idx, _ref_idx, img_0):
+    def fit(self, idx, img_0, image_sub=None):
         self.process.sub_message_r(color_str(": compute vignetting", "cyan"))
         h, w = img_0.shape[:2]
         self.w_2, self.h_2 = w / 2, h / 2
         self.r_max = np.sqrt((w / 2)**2 + (h / 2)**2)
-        image_sub = img_subsampled(img_0, self.subsample, self.fast_subsampling)
+        if image_sub is None:
+            image_sub = img_subsampled(img_0, self.subsample, self.fast_subsampling)
         radii, intensities = radial_mean_intensity(image_sub, self.r_steps)
         try:
             params = compute_fit_parameters(
@@ -132,7 +156,7 @@ class Vignetting(SubAction):
                 color_str(": could not find vignetting model", "red"), level=logging.WARNING)
             params = None
         if params is None:
-            return img_0
+            return None
         self.v0 = sigmoid_model(0, *params)
         i0_fit, k_fit, r0_fit = params
         self.process.sub_message(color_str(": vignetting model parameters: ", "cyan") +
@@ -160,12 +184,27 @@ class Vignetting(SubAction):
                 'save_plot', self.process.id,
                 f"{self.process.name}: intensity\nframe {idx_str}", plot_path)
         for i, p in enumerate(self.percentiles):
-            self.corrections[i][idx] = fsolve(lambda x: sigmoid_model(x, *params) /
-                                              self.v0 - p, r0_fit)[0]
-        self.process.sub_message_r(color_str(": correct vignetting", "cyan"))
-        return correct_vignetting(
-            img_0, self.max_correction, self.black_threshold, None, params, self.v0,
-            self.subsample, self.fast_subsampling)
+            self.corrections[i][idx] = optimize.fsolve(lambda x: sigmoid_model(x, *params) /
+                                                       self.v0 - p, r0_fit)[0]
+        return VignettingOp(img_0.shape, params, self.v0, self.max_correction,
+                            self.black_threshold)
+
+    def run_frame(self, idx, ref_idx, img_0):
+        frame = DeferredFrame(img_0)
+        self.process_frame(idx, ref_idx, frame)
+        if frame.ops:
+            self.process.sub_message_r(color_str(": correct vignetting", "cyan"))
+        return frame.pixels()
+
+    def working_resolution(self):
+        return self.subsample, self.fast_subsampling
+
+    def process_frame(self, idx, _ref_idx, frame):
+        image = frame.proxy(*self.working_resolution()) if self.subsample > 1 \
+            else frame.pixels()
+        op = self.fit(idx, frame.base, img_bw_8bit(image))
+        if op is not None:
+            frame.add_op(op)
 
     def begin(self, process):
         self.process = process
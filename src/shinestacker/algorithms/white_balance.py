@@ -1,14 +1,30 @@
-# pylint: disable=C0114, C0116
+# pylint: disable=C0114, C0116, E1101
+import cv2
 import numpy as np
+from .. config.constants import constants
+from .tiling import process_tiled
 
 
-def white_balance_from_rgb(img, target_rgb):
-    img_float = img.astype(np.float64)
+def white_balance_luts(dtype, scales):
+    max_val = np.iinfo(dtype).max
+    levels = np.arange(max_val + 1, dtype=np.float64)
+    return [np.clip(levels * scale, 0, max_val).astype(dtype) for scale in scales]
+
+
+def white_balance_tile(img, luts):
+    if img.dtype == np.uint8:
+        return cv2.LUT(img, np.dstack(luts))
+    balanced = np.empty_like(img)
+    for c, lut in enumerate(luts):
+        np.take(lut, img[..., c], out=balanced[..., c], mode='clip')
+    return balanced
+
+
+def white_balance_from_rgb(img, target_rgb, tile_size=constants.DEFAULT_TILE_SIZE,
+                           max_workers=None):
     target_bgr = (target_rgb[2], target_rgb[1], target_rgb[0])
     target_gray = sum(target_bgr) / 3.0
     scales = [target_gray / val if val != 0 else 1.0 for val in target_bgr]
-    for c in range(3):
-        img_float[..., c] *= scales[c]
-    max_val = np.iinfo(img.dtype).max
-    img_float = np.clip(img_float, 0, max_val)
-    return img_float.astype(img.dtype)
+    luts = white_balance_luts(img.dtype, scales)
+    return process_tiled(img, white_balance_tile, luts,
+                         tile_size=tile_size, max_workers=max_workers)
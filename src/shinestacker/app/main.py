@@ -3,14 +3,13 @@ import sys
 import os
 import logging
 import argparse
-import matplotlib
-import matplotlib.backends.backend_pdf
-matplotlib.use('agg')
+import multiprocessing
+os.environ['MPLBACKEND'] = 'agg'
 from PySide6.QtWidgets import QApplication, QMainWindow, QStackedWidget, QMenu
 from PySide6.QtGui import QAction, QIcon, QGuiApplication
 from PySide6.QtCore import Qt, QEvent, QTimer
 from shinestacker.config.config import config
-config.init(DISABLE_TQDM=True, COMBINED_APP=True, DONT_USE_NATIVE_MENU=True)
+config.init(DISABLE_TQDM=True, COMBINED_APP=True, DONT_USE_NATIVE_MENU=True, DEFERRED_PLOTS=True)
 from shinestacker.config.constants import constants
 from shinestacker.core.logging import setup_logging
 from shinestacker.gui.main_window import MainWindow
@@ -100,6 +99,7 @@ class Application(QApplication):
 
 
 def main():
+    multiprocessing.freeze_support()
     parser = argparse.ArgumentParser(
         prog=f'{constants.APP_STRING.lower()}-retouch',
         description='Focus stacking App.',
@@ -3,14 +3,13 @@ import os
 import sys
 import logging
 import argparse
-import matplotlib
-import matplotlib.backends.backend_pdf
-matplotlib.use('agg')
+import multiprocessing
+os.environ['MPLBACKEND'] = 'agg'
 from PySide6.QtWidgets import QApplication, QMenu
 from PySide6.QtGui import QIcon
 from PySide6.QtCore import Qt, QTimer, QEvent
 from shinestacker.config.config import config
-config.init(DISABLE_TQDM=True, DONT_USE_NATIVE_MENU=True)
+config.init(DISABLE_TQDM=True, DONT_USE_NATIVE_MENU=True, DEFERRED_PLOTS=True)
 from shinestacker.config.constants import constants
 from shinestacker.core.logging import setup_logging
 from shinestacker.gui.main_window import MainWindow
@@ -44,6 +43,7 @@ class Application(QApplication):
 
 
 def main():
+    multiprocessing.freeze_support()
     parser = argparse.ArgumentParser(
         prog=f'{constants.APP_STRING.lower()}-project',
         description='Manage and run focus stack jobs.',
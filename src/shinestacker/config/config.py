@@ -34,6 +34,7 @@ class _Config(_ConfigBase):
         self._DISABLE_TQDM = False
         self._COMBINED_APP = False
         self._DONT_USE_NATIVE_MENU = True
+        self._DEFERRED_PLOTS = False
         try:
             __IPYTHON__ # noqa
             self._JUPYTER_NOTEBOOK = True
@@ -56,5 +57,9 @@ class _Config(_ConfigBase):
     def COMBINED_APP(self):
         return self._COMBINED_APP
 
+    @property
+    def DEFERRED_PLOTS(self):
+        return self._DEFERRED_PLOTS
+
 
 config = _Config()
@@ -38,6 +38,26 @@ class _Constants:
     STACK_ALGO_OPTIONS = [STACK_ALGO_PYRAMID, STACK_ALGO_DEPTH_MAP]
     STACK_ALGO_DEFAULT = STACK_ALGO_PYRAMID
     DEFAULT_PLOTS_PATH = 'plots'
+    PLOT_DPI = 150
+    PLOT_THUMBNAIL_DPI = 50
+    PLOT_THUMBNAIL_WIDTH = 500  # px
+
+    DEFAULT_TILE_SIZE = 1024  # px
+    MAX_TILE_WORKERS = 8
+    MAX_IMPORT_WORKERS = 4
+    MAX_CODEC_WORKERS = 4
+    MAX_WRITE_WORKERS = 2
+    MAX_PENDING_WRITES = 2
+    MAX_ALIGN_WORKERS = 4
+
+    TIFF_COMPRESSION_NONE = 'none'
+    TIFF_COMPRESSION_DEFLATE = 'deflate'
+    TIFF_COMPRESSION_ZSTD = 'zstd'
+    TIFF_COMPRESSION_LZW = 'lzw'
+    VALID_TIFF_COMPRESSIONS = [TIFF_COMPRESSION_NONE, TIFF_COMPRESSION_DEFLATE,
+                               TIFF_COMPRESSION_ZSTD, TIFF_COMPRESSION_LZW]
+    DEFAULT_TIFF_COMPRESSION = TIFF_COMPRESSION_NONE
+    DEFAULT_JPEG_QUALITY = 100
 
     PATH_SEPARATOR = ';'
 
@@ -63,6 +83,7 @@ class _Constants:
 
     ALIGN_HOMOGRAPHY = "ALIGN_HOMOGRAPHY"
     ALIGN_RIGID = "ALIGN_RIGID"
+    ALIGN_TRANSLATION = "ALIGN_TRANSLATION"
     BORDER_CONSTANT = "BORDER_CONSTANT"
     BORDER_REPLICATE = "BORDER_REPLICATE"
     BORDER_REPLICATE_BLUR = "BORDER_REPLICATE_BLUR"
@@ -79,13 +100,16 @@ class _Constants:
     MATCHING_NORM_HAMMING = "NORM_HAMMING"
     ALIGN_RANSAC = "RANSAC"
     ALIGN_LMEDS = "LMEDS"
+    ALIGN_SOLVER_LOCAL = "LOCAL"
+    ALIGN_SOLVER_GLOBAL = "GLOBAL"
 
     VALID_DETECTORS = [DETECTOR_SIFT, DETECTOR_ORB, DETECTOR_SURF, DETECTOR_AKAZE, DETECTOR_BRISK]
     VALID_DESCRIPTORS = [DESCRIPTOR_SIFT, DESCRIPTOR_ORB, DESCRIPTOR_AKAZE, DESCRIPTOR_BRISK]
     VALID_MATCHING_METHODS = [MATCHING_KNN, MATCHING_NORM_HAMMING]
-    VALID_TRANSFORMS = [ALIGN_RIGID, ALIGN_HOMOGRAPHY]
+    VALID_TRANSFORMS = [ALIGN_RIGID, ALIGN_HOMOGRAPHY, ALIGN_TRANSLATION]
     VALID_BORDER_MODES = [BORDER_CONSTANT, BORDER_REPLICATE, BORDER_REPLICATE_BLUR]
     VALID_ALIGN_METHODS = [ALIGN_RANSAC, ALIGN_LMEDS]
+    VALID_ALIGN_SOLVERS = [ALIGN_SOLVER_LOCAL, ALIGN_SOLVER_GLOBAL]
     NOKNN_METHODS = {'detectors': [DETECTOR_ORB, DETECTOR_SURF, DETECTOR_AKAZE, DETECTOR_BRISK],
                      'descriptors': [DESCRIPTOR_ORB, DESCRIPTOR_AKAZE, DESCRIPTOR_BRISK]}
 
@@ -108,6 +132,12 @@ class _Constants:
     DEFAULT_ALIGN_SUBSAMPLE = 2
     DEFAULT_ALIGN_FAST_SUBSAMPLING = False
     DEFAULT_ALIGN_MIN_GOOD_MATCHES = 100
+    DEFAULT_ALIGN_SOLVER = ALIGN_SOLVER_LOCAL
+    DEFAULT_PHASE_SCALE = False
+    DEFAULT_MIN_PHASE_RESPONSE = 0.2
+    PHASE_REFINE_SIZE = 1024  # px, full resolution window refining subsampled estimates
+    ALIGN_GLOBAL_MAX_POINTS = 200  # inlier matches per frame pair used by the global solver
+    BORDER_BLUR_KERNEL = 21  # px, size of the blur filling borders with BORDER_REPLICATE_BLUR
 
     BALANCE_LINEAR = "LINEAR"
     BALANCE_GAMMA = "GAMMA"
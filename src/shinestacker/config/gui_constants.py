@@ -32,6 +32,11 @@ class _GuiConstants:
         'preview_inner': (255, 255, 255, 150)
     }
 
+    FILTER_PREVIEW_PROXY_SIZE = 800  # px
+
+    LOG_FLUSH_INTERVAL = 100  # milliseconds
+    LOG_MAX_LINES = 5000
+
     MIN_MOUSE_STEP_BRUSH_FRACTION = 0.25
     PAINT_REFRESH_TIMER = 50  # milliseconds
 
@@ -4,9 +4,10 @@ from .logging import setup_logging
 from .exceptions import (FocusStackError, InvalidOptionError, ImageLoadError, ImageSaveError,
                          AlignmentError, BitDepthError, ShapeError, RunStopException)
 from .framework import Job
+from .metrics import MetricsCollector
 
 __all__ = [
     'setup_logging',
     'FocusStackError', 'InvalidOptionError', 'ImageLoadError', 'ImageSaveError',
     'AlignmentError','BitDepthError', 'ShapeError', 'RunStopException',
-    'Job']
+    'Job', 'MetricsCollector']
@@ -1,12 +1,34 @@
-# pylint: disable=C0114, C0116
+# pylint: disable=C0114, C0115, C0116, C0415, R0903
 import os
 import sys
 import platform
+import importlib
 from .. config.config import config
 
-if not config.DISABLE_TQDM:
-    from tqdm import tqdm
-    from tqdm.notebook import tqdm_notebook
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def tqdm(*args, **kwargs):
+    from tqdm import tqdm as tqdm_bar
+    return tqdm_bar(*args, **kwargs)
+
+
+def tqdm_notebook(*args, **kwargs):
+    from tqdm.notebook import tqdm_notebook as tqdm_notebook_bar
+    return tqdm_notebook_bar(*args, **kwargs)
 
 
 def check_path_exists(path):
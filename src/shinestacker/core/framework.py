@@ -1,12 +1,14 @@
 # pylint: disable=C0114, C0115, C0116, R0917, R0913, R0902
 import time
 import logging
+from contextlib import contextmanager
 from .. config.constants import constants
 from .. config.config import config
 from .colors import color_str
 from .logging import setup_logging
 from .core_utils import make_tqdm_bar
 from .exceptions import RunStopException
+from .metrics import Measurement
 
 LINE_UP = "\r\033[A"
 TRAILING_SPACES = " " * 30
@@ -63,6 +65,8 @@ def elapsed_time_str(start):
 
 
 class JobBase:
+    metrics_kind = 'action'
+
     def __init__(self, name, enabled=True):
         self.id = -1
         self.name = name
@@ -84,6 +88,22 @@ class JobBase:
                 return callback(*args)
         return None
 
+    def metrics_enabled(self):
+        return getattr(self, 'callbacks', None) is not None and \
+            self.callbacks.get('metrics', None) is not None
+
+    @contextmanager
+    def measure(self, kind, name=None, **info):
+        if not self.metrics_enabled():
+            yield
+            return
+        measurement = Measurement()
+        try:
+            yield
+        finally:
+            self.callback('metrics', self.id, self.name,
+                          measurement.record(kind, self.name if name is None else name, **info))
+
     def run_core(self):
         pass
 
@@ -93,7 +113,8 @@ class JobBase:
             self.get_logger().warning(color_str(self.name + ": entire job disabled",
                                                 constants.LOG_COLOR_ALERT))
         self.callback('before_action', self.id, self.name)
-        self.run_core()
+        with self.measure(self.metrics_kind):
+            self.run_core()
         self.callback('after_action', self.id, self.name)
         msg_name = color_str(self.name + ":", constants.LOG_COLOR_LEVEL_JOB, "bold")
         msg_time = color_str(f"elapsed time: {elapsed_time_str(self._t0)}",
@@ -147,7 +168,10 @@ class JobBase:
 
 
 class Job(JobBase):
-    def __init__(self, name, logger_name=None, log_file='', callbacks=None, **kwargs):
+    metrics_kind = 'job'
+
+    def __init__(self, name, logger_name=None, log_file='', callbacks=None, metrics=None,
+                 **kwargs):
         JobBase.__init__(self, name, **kwargs)
         self.action_counter = 0
         self.__actions = []
@@ -156,6 +180,8 @@ class Job(JobBase):
         if logger_name is not None:
             self.logger = logging.getLogger(logger_name)
         self.callbacks = TqdmCallbacks.callbacks if callbacks == 'tqdm' else callbacks
+        if metrics is not None:
+            self.callbacks = {**(self.callbacks or {}), 'metrics': metrics}
 
     def time(self):
         return time.time() - self._t0
@@ -204,6 +230,9 @@ class ActionList(JobBase):
     def end(self):
         self.callback('end_steps', self.id, self.name)
 
+    def abort(self):
+        """Release what begin() acquired when the run stops before end()."""
+
     def __iter__(self):
         self.count = 0
         return self
@@ -213,7 +242,8 @@ class ActionList(JobBase):
 
     def __next__(self):
         if self.count < self.counts:
-            self.run_step()
+            with self.measure('step', step=self.count):
+                self.run_step()
             x = self.count
             self.count += 1
             return x
@@ -222,8 +252,12 @@ class ActionList(JobBase):
     def run_core(self):
         self.print_message(color_str('begin run', constants.LOG_COLOR_LEVEL_2), end='\n')
         self.begin()
-        for _ in iter(self):
-            self.callback('after_step', self.id, self.name, self.count)
-            if self.callback('check_running', self.id, self.name) is False:
-                raise RunStopException(self.name)
+        try:
+            for _ in iter(self):
+                self.callback('after_step', self.id, self.name, self.count)
+                if self.callback('check_running', self.id, self.name) is False:
+                    raise RunStopException(self.name)
+        except BaseException:
+            self.abort()
+            raise
         self.end()
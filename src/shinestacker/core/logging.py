@@ -5,9 +5,9 @@ from pathlib import Path
 import datetime
 from .. config.config import config
 from .. config.constants import constants
-from .core_utils import get_app_base_path
-if not config.DISABLE_TQDM:
-    from tqdm import tqdm
+from .core_utils import get_app_base_path, lazy_import
+
+tqdm = lazy_import('tqdm')
 
 
 class ConsoleFormatter(logging.Formatter):
@@ -37,7 +37,7 @@ class FileFormatter(logging.Formatter):
 class TqdmLoggingHandler(logging.StreamHandler):
     def emit(self, record):
         if not config.DISABLE_TQDM:
-            tqdm.write(self.format(record), end=self.terminator)
+            tqdm.tqdm.write(self.format(record), end=self.terminator)
         else:
             logging.StreamHandler.emit(self, record)
 
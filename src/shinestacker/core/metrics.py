@@ -0,0 +1,126 @@
+# pylint: disable=C0114, C0115, C0116, R0903
+import os
+import sys
+import json
+import time
+import threading
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# bytes are counted per thread, so that a measurement is not credited with the
+# I/O of background readers and writers, which record their own measurements
+_io_local = threading.local()
+
+
+def _thread_io():
+    counters = getattr(_io_local, 'counters', None)
+    if counters is None:
+        counters = [0, 0]
+        _io_local.counters = counters
+    return counters
+
+
+def add_bytes_read(n_bytes):
+    _thread_io()[0] += n_bytes
+
+
+def add_bytes_written(n_bytes):
+    _thread_io()[1] += n_bytes
+
+
+def add_file_bytes_read(path):
+    try:
+        add_bytes_read(os.path.getsize(path))
+    except OSError:
+        pass
+
+
+def add_file_bytes_written(path):
+    try:
+        add_bytes_written(os.path.getsize(path))
+    except OSError:
+        pass
+
+
+def io_bytes():
+    """Bytes read and written so far by the calling thread."""
+    counters = _thread_io()
+    return counters[0], counters[1]
+
+
+def max_rss():
+    """High-water mark of the process resident memory since it started."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Measurement:
+    def __init__(self):
+        self.start = time.time()
+        self.wall_0 = time.perf_counter()
+        self.cpu_0 = time.thread_time()
+        self.read_0, self.written_0 = io_bytes()
+
+    def record(self, kind, name, **info):
+        wall_time = time.perf_counter() - self.wall_0
+        cpu_time = time.thread_time() - self.cpu_0
+        read, written = io_bytes()
+        return {
+            'kind': kind, 'name': name, 'start': self.start,
+            'wall_time': wall_time, 'cpu_time': cpu_time,
+            'bytes_read': read - self.read_0, 'bytes_written': written - self.written_0,
+            'process_max_rss': max_rss(), 'pid': os.getpid(), 'thread': threading.get_ident(),
+            **info
+        }
+
+
+class MetricsCollector:
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __call__(self, action_id, action_name, record):
+        with self._lock:
+            self.records.append({'action_id': action_id, 'action': action_name, **record})
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+    def summary(self):
+        totals = {}
+        for r in self.records:
+            key = f"{r['kind']}:{r['name']}"
+            t = totals.setdefault(key, {'kind': r['kind'], 'name': r['name'], 'count': 0,
+                                        'wall_time': 0.0, 'cpu_time': 0.0,
+                                        'bytes_read': 0, 'bytes_written': 0,
+                                        'process_max_rss': None})
+            t['count'] += 1
+            for k in ('wall_time', 'cpu_time', 'bytes_read', 'bytes_written'):
+                t[k] += r[k]
+            if r['process_max_rss'] is not None:
+                t['process_max_rss'] = max(t['process_max_rss'] or 0, r['process_max_rss'])
+        return list(totals.values())
+
+    def write_json(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({'records': self.records, 'summary': self.summary()}, f, indent=2)
+
+    def chrome_trace(self):
+        t0 = min((r['start'] for r in self.records), default=0)
+        events = []
+        for r in self.records:
+            args = {k: v for k, v in r.items()
+                    if k not in ('kind', 'name', 'start', 'wall_time', 'pid', 'thread')}
+            events.append({'name': r['name'], 'cat': r['kind'], 'ph': 'X',
+                           'ts': (r['start'] - t0) * 1e6, 'dur': r['wall_time'] * 1e6,
+                           'pid': r['pid'], 'tid': r['thread'], 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
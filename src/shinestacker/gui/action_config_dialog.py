@@ -276,6 +276,8 @@ class MultiLayerConfigurator(DefaultActionConfigurator):
 
 
 class CombinedActionsConfigurator(DefaultActionConfigurator):
+    TIFF_COMPRESSION_OPTIONS = ['None', 'Deflate', 'Zstandard', 'LZW']
+
     def create_form(self, layout, action):
         super().create_form(layout, action)
         if self.expert:
@@ -295,6 +297,12 @@ class CombinedActionsConfigurator(DefaultActionConfigurator):
                                    default=-1, min_val=-1, max_val=1000)
             self.builder.add_field('step_process', FIELD_BOOL, 'Step process', required=False,
                                    default=True)
+            self.builder.add_field('tiff_compression', FIELD_COMBO, 'TIFF compression',
+                                   required=False, options=self.TIFF_COMPRESSION_OPTIONS,
+                                   values=constants.VALID_TIFF_COMPRESSIONS,
+                                   default=dict(zip(constants.VALID_TIFF_COMPRESSIONS,
+                                                    self.TIFF_COMPRESSION_OPTIONS))[
+                                       constants.DEFAULT_TIFF_COMPRESSION])
 
 
 class MaskNoiseConfigurator(DefaultActionConfigurator):
@@ -336,9 +344,10 @@ class VignettingConfigurator(DefaultActionConfigurator):
 
 class AlignFramesConfigurator(DefaultActionConfigurator):
     BORDER_MODE_OPTIONS = ['Constant', 'Replicate', 'Replicate and blur']
-    TRANSFORM_OPTIONS = ['Rigid', 'Homography']
+    TRANSFORM_OPTIONS = ['Rigid', 'Homography', 'Translation (phase correlation)']
     METHOD_OPTIONS = ['Random Sample Consensus (RANSAC)', 'Least Median (LMEDS)']
     MATCHING_METHOD_OPTIONS = ['K-nearest neighbors', 'Hamming distance']
+    SOLVER_OPTIONS = ['Each frame to reference', 'Global, all frames together']
 
     def __init__(self, expert, current_wd):
         super().__init__(expert, current_wd)
@@ -444,6 +453,10 @@ class AlignFramesConfigurator(DefaultActionConfigurator):
                 'transform', FIELD_COMBO, 'Transform', required=False,
                 options=self.TRANSFORM_OPTIONS, values=constants.VALID_TRANSFORMS,
                 default=constants.DEFAULT_TRANSFORM)
+            self.builder.add_field(
+                'solver', FIELD_COMBO, 'Solver', required=False,
+                options=self.SOLVER_OPTIONS, values=constants.VALID_ALIGN_SOLVERS,
+                default=constants.DEFAULT_ALIGN_SOLVER)
             method = self.builder.add_field(
                 'align_method', FIELD_COMBO, 'Align method', required=False,
                 options=self.METHOD_OPTIONS, values=constants.VALID_ALIGN_METHODS,
@@ -474,15 +487,28 @@ class AlignFramesConfigurator(DefaultActionConfigurator):
             max_iters = self.builder.add_field(
                 'max_iters', FIELD_INT, 'Max. iterations (Homography)', required=False,
                 default=constants.DEFAULT_ALIGN_MAX_ITERS, min_val=0, max_val=5000)
+            phase_scale = self.builder.add_field(
+                'phase_scale', FIELD_BOOL, 'Estimate scale (Translation)', required=False,
+                default=constants.DEFAULT_PHASE_SCALE)
+            min_phase_response = self.builder.add_field(
+                'min_phase_response', FIELD_FLOAT, 'Min. correlation peak (Translation)',
+                required=False, default=constants.DEFAULT_MIN_PHASE_RESPONSE,
+                min_val=0, max_val=1, step=0.05)
 
             def change_transform():
                 text = transform.currentText()
+                phase_scale.setEnabled(text == self.TRANSFORM_OPTIONS[2])
+                min_phase_response.setEnabled(text == self.TRANSFORM_OPTIONS[2])
                 if text == self.TRANSFORM_OPTIONS[0]:
                     refine_iters.setEnabled(True)
                     max_iters.setEnabled(False)
                 elif text == self.TRANSFORM_OPTIONS[1]:
                     refine_iters.setEnabled(False)
                     max_iters.setEnabled(True)
+                elif text == self.TRANSFORM_OPTIONS[2]:
+                    # rigid transform when falling back to feature matching
+                    refine_iters.setEnabled(True)
+                    max_iters.setEnabled(False)
             transform.currentIndexChanged.connect(change_transform)
             change_transform()
             subsample = self.builder.add_field(
@@ -5,10 +5,11 @@ import os
 from PySide6.QtWidgets import QSizePolicy, QVBoxLayout, QWidget, QLabel, QStackedWidget
 from PySide6.QtPdf import QPdfDocument
 from PySide6.QtPdfWidgets import QPdfView
-from PySide6.QtCore import Qt, QMargins
+from PySide6.QtCore import Qt, QMargins, Signal
 from PySide6.QtGui import QPixmap
 from .. config.gui_constants import gui_constants
 from .. core.core_utils import running_under_windows, running_under_macos
+from .. algorithms.plots import plot_renderer
 
 
 def open_file(file_path):
@@ -99,6 +100,61 @@ class GuiImageView(QWidget):
         super().mouseReleaseEvent(event)
 
 
+class GuiPlotView(QWidget):
+    thumbnail_ready = Signal(str)
+    file_ready = Signal(str)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.setFixedWidth(gui_constants.GUI_IMG_WIDTH)
+        self.layout = QVBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.setSpacing(0)
+        self.image_label = QLabel("rendering...")
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_label.setFixedHeight(gui_constants.GUI_IMG_WIDTH // 2)
+        self.layout.addWidget(self.image_label)
+        self.setLayout(self.layout)
+        self.thumbnail_ready.connect(self.set_thumbnail)
+        self.file_ready.connect(open_file)
+        self.setStyleSheet('''
+        QWidget {
+            border: 2px solid #0000a0;
+        }
+        QWidget:hover {
+            border: 2px solid #a0a0ff;
+        }
+        ''')
+        plot_renderer.thumbnail(file_path).add_done_callback(
+            lambda future: self.emit_result(self.thumbnail_ready, future))
+
+    def emit_result(self, signal, future):
+        try:
+            signal.emit("" if future.exception() else future.result())
+        except RuntimeError:
+            pass
+
+    def set_thumbnail(self, png_path):
+        pixmap = QPixmap(png_path) if png_path else QPixmap()
+        if pixmap.isNull():
+            self.image_label.setText("can't render plot")
+            return
+        scaled_pixmap = pixmap.scaledToWidth(
+            gui_constants.GUI_IMG_WIDTH, Qt.SmoothTransformation)
+        self.image_label.setFixedHeight(scaled_pixmap.height())
+        self.image_label.setPixmap(scaled_pixmap)
+
+    def sizeHint(self):
+        return self.size()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            plot_renderer.render_file(self.file_path).add_done_callback(
+                lambda future: self.emit_result(self.file_ready, future))
+        super().mouseReleaseEvent(event)
+
+
 class GuiOpenApp(QWidget):
     def __init__(self, app, file_path, parent=None):
         super().__init__(parent)
@@ -1,9 +1,12 @@
 # pylint: disable=C0114, C0115, C0116, E0611, W0212, R0903
+import html
 import logging
+import threading
 from PySide6.QtWidgets import QWidget, QTextEdit, QMessageBox, QStatusBar
 from PySide6.QtGui import QTextCursor, QTextOption, QFont
-from PySide6.QtCore import QThread, QObject, Signal, Slot, Qt
+from PySide6.QtCore import QThread, QObject, QTimer, Signal, Slot, Qt
 from .. config.constants import constants
+from .. config.gui_constants import gui_constants
 
 
 class SimpleHtmlFormatter(logging.Formatter):
@@ -59,13 +62,15 @@ class SimpleHtmlFormatter(logging.Formatter):
         super().__init__()
         self.datefmt = datefmt or "%H:%M:%S"
 
+    def ansi_to_html(self, message):
+        message = html.escape(message, quote=False)
+        message = constants.ANSI_ESCAPE.sub(lambda m: self.ANSI_COLORS.get(m.group(0), ''),
+                                            message)
+        return message.replace("\r", "").rstrip()
+
     def format(self, record):
         levelname = record.levelname
-        message = super().format(record)
-        message = message.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-        for ansi_code, html_tag in self.ANSI_COLORS.items():
-            message = message.replace(ansi_code, html_tag)
-        message = constants.ANSI_ESCAPE.sub('', message).replace("\r", "").rstrip()
+        message = self.ansi_to_html(super().format(record))
         color = self.COLOR_MAP.get(levelname, '#000000')
         return f'''
         <div style="margin: 2px 0; font-family: {constants.LOG_FONTS_STR};">
@@ -78,19 +83,60 @@ class SimpleHtmlFormatter(logging.Formatter):
 class SimpleHtmlHandler(QObject, logging.Handler):
     log_signal = Signal(str)
     html_signal = Signal(str)
+    overwrite_signal = Signal(str)
 
-    def __init__(self):
+    def __init__(self, flush_interval=gui_constants.LOG_FLUSH_INTERVAL,
+                 max_lines=gui_constants.LOG_MAX_LINES):
         QObject.__init__(self)
         logging.Handler.__init__(self)
         self.setFormatter(SimpleHtmlFormatter())
+        self.max_lines = max_lines
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(flush_interval)
+        self.flush_timer.timeout.connect(self.flush_pending)
+        self.flush_timer.start()
 
     def emit(self, record):
         try:
             msg = self.format(record)
-            self.html_signal.emit(msg)
+            self.add_html(msg, record.message.startswith('\r'))
         except RuntimeError as e:
             logging.error(msg=f"Logging error: {e}")
 
+    @Slot(str)
+    def add_html(self, msg, overwrite=False):
+        with self.pending_lock:
+            if overwrite and self.pending and self.pending[-1][1]:
+                self.pending[-1] = (msg, True)
+            else:
+                self.pending.append((msg, overwrite))
+
+    @Slot()
+    def flush_pending(self):
+        with self.pending_lock:
+            pending, self.pending = self.pending[-self.max_lines:], []
+        lines = []
+        for msg, overwrite in pending:
+            if overwrite:
+                if lines:
+                    self.html_signal.emit(''.join(lines))
+                    lines = []
+                self.overwrite_signal.emit(msg)
+            else:
+                lines.append(msg)
+        if lines:
+            self.html_signal.emit(''.join(lines))
+
+    def close(self):
+        try:
+            self.flush_timer.stop()
+            self.flush_pending()
+        except RuntimeError:
+            pass
+        logging.Handler.close(self)
+
 
 class GuiLogger(QWidget):
     __id_counter = 0
@@ -125,16 +171,29 @@ class QTextEditLogger(GuiLogger):
         text_edit.setReadOnly(True)
         font = QFont(constants.LOG_FONTS, 12)
         text_edit.setFont(font)
+        text_edit.document().setMaximumBlockCount(gui_constants.LOG_MAX_LINES)
         self.text_edit = text_edit
         self.status_bar = QStatusBar()
+        self.last_line_overwritable = False
+
+    @Slot(str)
+    def handle_html_message(self, html_msg):
+        self.append_html(html_msg)
 
     @Slot(str)
-    def handle_html_message(self, html):
-        self.append_html(html)
+    def handle_overwrite_message(self, html_msg):
+        if self.last_line_overwritable:
+            cursor = self.text_edit.textCursor()
+            cursor.movePosition(QTextCursor.End)
+            cursor.select(QTextCursor.BlockUnderCursor)
+            cursor.removeSelectedText()
+        self.append_html(html_msg)
+        self.last_line_overwritable = True
 
     @Slot(str)
-    def append_html(self, html):
-        self.text_edit.append(html)
+    def append_html(self, html_msg):
+        self.text_edit.append(html_msg)
+        self.last_line_overwritable = False
         cursor = self.text_edit.textCursor()
         cursor.movePosition(QTextCursor.End)
         self.text_edit.setTextCursor(cursor)
@@ -190,14 +249,20 @@ class LogManager:
         logger = logging.getLogger(self.last_id_str())
         logger.setLevel(logging.DEBUG)
         gui_logger = self.gui_loggers[self.id]
+        for handler in logger.handlers[:]:
+            if isinstance(handler, SimpleHtmlHandler):
+                logger.removeHandler(handler)
+                handler.close()
         self.handler = SimpleHtmlHandler()
         self.handler.setLevel(logging.DEBUG)
         logger.addHandler(self.handler)
         self.handler.log_signal.connect(gui_logger.append_html, Qt.QueuedConnection)
         self.handler.html_signal.connect(gui_logger.handle_html_message, Qt.QueuedConnection)
+        self.handler.overwrite_signal.connect(gui_logger.handle_overwrite_message,
+                                              Qt.QueuedConnection)
         self.log_worker = worker
         self.log_worker.log_signal.connect(gui_logger.handle_log_message, Qt.QueuedConnection)
-        self.log_worker.html_signal.connect(gui_logger.handle_html_message, Qt.QueuedConnection)
+        self.log_worker.html_signal.connect(self.handler.add_html, Qt.DirectConnection)
         self.log_worker.status_signal.connect(gui_logger.handle_status_message, Qt.QueuedConnection)
         self.log_worker.exception_signal.connect(gui_logger.handle_exception, Qt.QueuedConnection)
         self.log_worker.end_signal.connect(self.handle_end_message, Qt.QueuedConnection)
@@ -8,7 +8,8 @@ from .. config.constants import constants
 from .. config.gui_constants import gui_constants
 from .colors import RED_BUTTON_STYLE, BLUE_BUTTON_STYLE, BLUE_COMBO_STYLE
 from .gui_logging import LogWorker, QTextEditLogger
-from .gui_images import GuiPdfView, GuiImageView, GuiOpenApp
+from .gui_images import GuiPdfView, GuiImageView, GuiPlotView, GuiOpenApp
+from .. algorithms.plots import plot_renderer
 from .colors import (
     ColorPalette,
     ACTION_RUNNING_COLOR, ACTION_COMPLETED_COLOR,
@@ -201,7 +202,9 @@ class RunWindow(QTextEditLogger):
         label.setStyleSheet("QLabel {margin-top: 5px; font-weight: bold;}")
         self.image_layout.addWidget(label)
         ext = path.split('.')[-1].lower()
-        if ext == 'pdf':
+        if plot_renderer.deferred and (ext == 'pdf' or ext in constants.EXTENSIONS):
+            image_view = GuiPlotView(path, self)
+        elif ext == 'pdf':
             image_view = GuiPdfView(path, self)
         elif ext in ['jpg', 'jpeg', 'tif', 'tiff', 'png']:
             image_view = GuiImageView(path, self)
@@ -326,6 +329,9 @@ class RunWorker(LogWorker):
         </div>
         ''') # noqa
         status, error_message = self.do_run()
+        if plot_renderer.deferred:
+            # plots not opened from the viewer are written to the project plot folder
+            plot_renderer.render_pending()
         run_id = int(self.id_str.split('_')[-1])
         if status == constants.RUN_COMPLETED:
             message = f"{self.tag} ended successfully"
@@ -1,18 +1,24 @@
 # pylint: disable=C0114, C0115, C0116, E0611, W0718, R0915, R0903, R0913, R0917, R0902, R0914
+# pylint: disable=E1101
 import traceback
+import threading
 from abc import ABC, abstractmethod
 import numpy as np
+import cv2
 from PySide6.QtWidgets import (
     QHBoxLayout, QLabel, QSlider, QDialog, QVBoxLayout, QCheckBox, QDialogButtonBox)
 from PySide6.QtCore import Qt, Signal, QThread, QTimer
+from .. config.gui_constants import gui_constants
 
 
 class BaseFilter(ABC):
     def __init__(self, name, editor, allow_partial_preview=True,
-                 partial_preview_threshold=0.75, preview_at_startup=False):
+                 partial_preview_threshold=0.75, preview_at_startup=False,
+                 allow_progressive_preview=True):
         self.editor = editor
         self.name = name
         self.allow_partial_preview = allow_partial_preview
+        self.allow_progressive_preview = allow_progressive_preview
         self.partial_preview_threshold = partial_preview_threshold
         self.preview_at_startup = preview_at_startup
         self.preview_check = None
@@ -38,92 +44,66 @@ class BaseFilter(ABC):
         self.editor.copy_master_layer()
         dlg = QDialog(self.editor)
         layout = QVBoxLayout(dlg)
-        active_worker = None
-        last_request_id = 0
+        worker = self.PreviewWorker(self.apply)
+        previewed_region = None
         initial_timer = QTimer(dlg)
         initial_timer.setSingleShot(True)
         dialog_closed = False
 
         def cleanup():
-            nonlocal active_worker, dialog_closed  # noqa
+            nonlocal dialog_closed, previewed_region
             dialog_closed = True
+            worker.stop()
+            previewed_region = None
             self.editor.restore_master_layer()
             self.editor.display_manager.display_master_layer()
-            if active_worker and active_worker.isRunning():
-                active_worker.wait()
             initial_timer.stop()
 
         dlg.finished.connect(cleanup)
 
-        def set_preview(img, request_id, expected_id, region=None):
-            if dialog_closed or request_id != expected_id:
+        def set_preview(img, request_id, region, _final):
+            nonlocal previewed_region
+            if dialog_closed or worker.is_cancelled(request_id):
                 return
             if region:
                 current_region = self.editor.image_viewer.get_visible_image_portion()[1]
-                if current_region == region:
-                    self.editor.set_master_layer(img)
-                    self.editor.display_manager.display_master_layer()
+                if current_region != region:
+                    return
+                master = self.editor.master_layer()
+                if previewed_region is not None and previewed_region != region:
+                    np.copyto(master, self.editor.master_layer_copy())
+                x, y, w, h = region
+                master[y:y + h, x:x + w] = img
             else:
                 self.editor.set_master_layer(img)
-                self.editor.display_manager.display_master_layer()
+            previewed_region = region
+            self.editor.display_manager.display_master_layer()
             try:
                 dlg.activateWindow()
             except Exception:
                 pass
 
+        worker.finished.connect(set_preview)
+        worker.start()
+
         def do_preview():
-            nonlocal active_worker, last_request_id
             if not dlg.isVisible():
                 return
-            if active_worker and active_worker.isRunning():
-                try:
-                    active_worker.quit()
-                    active_worker.wait()
-                except Exception:
-                    pass
-            last_request_id += 1
-            current_id = last_request_id
-            visible_region = None
+            master_img = self.editor.master_layer_copy()
+            region = ()
             if kwargs.get('partial_preview', self.allow_partial_preview):
                 visible_data = self.editor.image_viewer.get_visible_image_portion()
                 if visible_data:
                     visible_img, visible_region = visible_data
-                    master_img = self.editor.master_layer_copy()
                     if visible_img.size < master_img.size * self.partial_preview_threshold:
-                        params = tuple(self.get_params() or ())
-                        worker = self.PreviewWorker(
-                            self.apply,
-                            args=(master_img, *params),
-                            request_id=current_id,
-                            region=visible_region
-                        )
-                    else:
-                        params = tuple(self.get_params() or ())
-                        worker = self.PreviewWorker(
-                            self.apply,
-                            args=(master_img, *params),
-                            request_id=current_id
-                        )
-                else:
-                    params = tuple(self.get_params() or ())
-                    worker = self.PreviewWorker(
-                        self.apply,
-                        args=(self.editor.master_layer_copy(), *params),
-                        request_id=current_id
-                    )
-            else:
-                params = tuple(self.get_params() or ())
-                worker = self.PreviewWorker(
-                    self.apply,
-                    args=(self.editor.master_layer_copy(), *params),
-                    request_id=current_id
-                )
-            active_worker = worker
-            active_worker.finished.connect(
-                lambda img, rid, region: set_preview(img, rid, current_id, region))
-            active_worker.start()
+                        region = visible_region
+            params = tuple(self.get_params() or ())
+            worker.submit(master_img, params, region, self.allow_progressive_preview)
 
         def restore_original():
+            nonlocal previewed_region
+            worker.cancel()
+            previewed_region = None
             self.editor.restore_master_layer()
             self.editor.display_manager.display_master_layer()
             try:
@@ -172,32 +152,71 @@ class BaseFilter(ABC):
         self.preview_timer.setInterval(preview_latency)
 
     class PreviewWorker(QThread):
-        finished = Signal(np.ndarray, int, tuple)
+        finished = Signal(np.ndarray, int, tuple, bool)
 
-        def __init__(self, func, args=(), kwargs=None, request_id=0, region=None):
+        def __init__(self, func, proxy_size=gui_constants.FILTER_PREVIEW_PROXY_SIZE):
             super().__init__()
             self.func = func
-            self.args = args
-            self.kwargs = kwargs or {}
-            self.request_id = request_id
-            self.region = region
+            self.proxy_size = proxy_size
+            self._condition = threading.Condition()
+            self._pending = None
+            self._latest_id = 0
+            self._stopped = False
+
+        def submit(self, image, params=(), region=(), progressive=True):
+            with self._condition:
+                self._latest_id += 1
+                self._pending = (self._latest_id, image, params, region, progressive)
+                self._condition.notify()
+                return self._latest_id
+
+        def cancel(self):
+            with self._condition:
+                self._latest_id += 1
+                self._pending = None
+
+        def stop(self):
+            with self._condition:
+                self._stopped = True
+                self._pending = None
+                self._condition.notify()
+            self.wait()
+
+        def is_cancelled(self, request_id):
+            return self._stopped or request_id != self._latest_id
 
         def run(self):
-            try:
-                if self.region:
-                    x, y, w, h = self.region
-                    image = self.args[0]
-                    region_img = image[y:y + h, x:x + w]
-                    region_args = (region_img,) + self.args[1:]
-                    region_result = self.func(*region_args, **self.kwargs)
-                    result = image.copy()
-                    result[y:y + h, x:x + w] = region_result
-                else:
-                    result = self.func(*self.args, **self.kwargs)
-                self.finished.emit(result, self.request_id, self.region)
-            except Exception as e:
-                traceback.print_tb(e.__traceback__)
-                raise RuntimeError("Filter preview failed") from e
+            while True:
+                with self._condition:
+                    while self._pending is None and not self._stopped:
+                        self._condition.wait()
+                    if self._stopped:
+                        return
+                    request, self._pending = self._pending, None
+                try:
+                    self.process(*request)
+                except Exception as e:
+                    traceback.print_tb(e.__traceback__)
+
+        def process(self, request_id, image, params, region, progressive):
+            if region:
+                x, y, w, h = region
+                image = image[y:y + h, x:x + w]
+            h, w = image.shape[:2]
+            scale = self.proxy_size / max(h, w)
+            if progressive and scale < 1:
+                proxy = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                   interpolation=cv2.INTER_AREA)
+                result = self.func(proxy, *params)
+                if self.is_cancelled(request_id):
+                    return
+                result = cv2.resize(result, (w, h), interpolation=cv2.INTER_LINEAR)
+                self.finished.emit(result, request_id, region, False)
+            if self.is_cancelled(request_id):
+                return
+            result = self.func(image, *params)
+            if not self.is_cancelled(request_id):
+                self.finished.emit(result, request_id, region, True)
 
 
 class OneSliderBaseFilter(BaseFilter):
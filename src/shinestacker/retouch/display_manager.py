@@ -86,6 +86,10 @@ class DisplayManager(QObject, LayerCollectionHandler):
             thumbnails.append((thumbnail, label, i, i == self.current_layer_idx()))
         self._update_thumbnail_list(thumbnails)
 
+    def add_layer_thumbnail(self, i):
+        self.add_thumbnail_item(self.create_thumbnail(self.layer_stack()[i]),
+                                self.layer_labels()[i], i, i == self.current_layer_idx())
+
     def _update_thumbnail_list(self, thumbnails):
         self.thumbnail_list.clear()
         for thumb_data in thumbnails:
@@ -1,8 +1,7 @@
 # pylint: disable=C0114, C0115, C0116, E0611
-from PIL.TiffImagePlugin import IFDRational
 from PySide6.QtWidgets import QWidget, QHBoxLayout, QPushButton, QLabel
 from PySide6.QtCore import Qt
-from .. algorithms.exif import exif_dict
+from .. algorithms.exif import exif_dict, pil_tiff
 from .icon_container import icon_container
 from .. gui.base_form_dialog import BaseFormDialog
 
@@ -42,7 +41,7 @@ class ExifData(BaseFormDialog):
             data = exif_dict(self.exif)
         if len(data) > 0:
             for k, (_, d) in data.items():
-                if isinstance(d, IFDRational):
+                if isinstance(d, pil_tiff.IFDRational):
                     d = f"{d.numerator}/{d.denominator}"
                 else:
                     d = f"{d}"
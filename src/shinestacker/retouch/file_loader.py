@@ -3,10 +3,9 @@ import os
 import traceback
 import numpy as np
 import cv2
-from psdtags import PsdChannelId
 from PySide6.QtCore import QThread, Signal
 from .. algorithms.utils import read_img
-from .. algorithms.multilayer import read_multilayer_tiff
+from .. algorithms.multilayer import read_multilayer_tiff, psdtags
 
 
 class FileLoader(QThread):
@@ -34,9 +33,8 @@ class FileLoader(QThread):
             else:
                 current_labels.pop(master_index)
                 master_layer = current_stack[master_index].copy()
-                indices = list(range(len(current_stack)))
-                indices.remove(master_index)
-                current_stack = current_stack[indices]
+                current_stack = [layer for i, layer in enumerate(current_stack)
+                                 if i != master_index]
             master_layer.setflags(write=True)
             if current_labels is None:
                 current_labels = [f"Layer {i + 1}" for i in range(len(current_stack))]
@@ -53,7 +51,7 @@ class FileLoader(QThread):
         extension = path.split('.')[-1]
         if extension in ['jpg', 'jpeg']:
             try:
-                stack = np.array([cv2.cvtColor(read_img(path), cv2.COLOR_BGR2RGB)])
+                stack = [cv2.cvtColor(read_img(path), cv2.COLOR_BGR2RGB)]
                 return stack, [path.split('/')[-1].split('.')[0]]
             except Exception as e:
                 traceback.print_tb(e.__traceback__)
@@ -67,33 +65,28 @@ class FileLoader(QThread):
                     channels = {}
                     for channel in layer.channels:
                         channels[channel.channelid] = channel.data
-                    if PsdChannelId.CHANNEL0 in channels:
+                    if psdtags.PsdChannelId.CHANNEL0 in channels:
                         img = np.stack([
-                            channels[PsdChannelId.CHANNEL0],
-                            channels[PsdChannelId.CHANNEL1],
-                            channels[PsdChannelId.CHANNEL2]
+                            channels[psdtags.PsdChannelId.CHANNEL0],
+                            channels[psdtags.PsdChannelId.CHANNEL1],
+                            channels[psdtags.PsdChannelId.CHANNEL2]
                         ], axis=-1)
                         layers.append(img)
                         labels.append(layer.name)
                 if layers:
-                    stack = np.array(layers)
                     if labels:
                         master_indices = [i for i, label in enumerate(labels)
                                           if label.lower() == "master"]
                         if master_indices:
                             master_index = master_indices[0]
-                            master_label = labels.pop(master_index)
-                            master_layer = stack[master_index]
-                            stack = np.delete(stack, master_index, axis=0)
-                            labels.insert(0, master_label)
-                            stack = np.insert(stack, 0, master_layer, axis=0)
-                        return stack, labels
-                    return stack, labels
+                            labels.insert(0, labels.pop(master_index))
+                            layers.insert(0, layers.pop(master_index))
+                    return layers, labels
                 return None, None
             except ValueError as val_err:
                 if str(val_err) == "TIFF file contains no ImageSourceData tag":
                     try:
-                        stack = np.array([cv2.cvtColor(read_img(path), cv2.COLOR_BGR2RGB)])
+                        stack = [cv2.cvtColor(read_img(path), cv2.COLOR_BGR2RGB)]
                         return stack, [path.split('/')[-1].split('.')[0]]
                     except Exception as e:
                         traceback.print_tb(e.__traceback__)
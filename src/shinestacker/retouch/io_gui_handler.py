@@ -2,15 +2,91 @@
 import os
 import traceback
 import numpy as np
-from PySide6.QtWidgets import QFileDialog, QMessageBox, QVBoxLayout, QLabel, QDialog, QApplication
+from PySide6.QtWidgets import (QFileDialog, QMessageBox, QVBoxLayout, QLabel, QDialog,
+                               QApplication, QProgressDialog)
 from PySide6.QtGui import QGuiApplication, QCursor
 from PySide6.QtCore import Qt, QObject, QTimer, Signal
 from .file_loader import FileLoader
 from .exif_data import ExifData
-from .io_manager import IOManager, FileMultilayerSaver
+from .io_manager import IOManager, FileMultilayerSaver, FrameImporter
 from .layer_collection import LayerCollectionHandler
 
 
+class FrameImportHandler(QObject):
+    """Progress, cancellation and completion of a background frame import."""
+    def __init__(self, io_gui_handler):
+        QObject.__init__(self, io_gui_handler)
+        self.handler = io_gui_handler
+        self.thread = None
+        self.progress = None
+        self.imported_frames = 0
+
+    def start(self, file_paths):
+        self.cancel()
+        self.imported_frames = 0
+        self.progress = QProgressDialog(
+            "Importing frames...", "Cancel", 0, len(file_paths), self.handler.parent())
+        self.progress.setWindowTitle("Import")
+        self.progress.setWindowModality(Qt.WindowModal)
+        self.progress.setMinimumDuration(500)
+        self.progress.setValue(0)
+        self.thread = FrameImporter(self.handler.io_manager, file_paths)
+        self.thread.frame_loaded.connect(self.on_frame_imported)
+        self.thread.progress.connect(lambda count, _total: self.progress.setValue(count))
+        self.thread.finished.connect(self.on_frames_imported)
+        self.thread.error.connect(self.on_frames_import_error)
+        self.progress.canceled.connect(self.thread.cancel)
+        self.thread.start()
+
+    def cancel(self):
+        if self.thread and self.thread.isRunning():
+            self.thread.cancel()
+            self.thread.wait()
+        self.thread = None
+
+    def on_frame_imported(self, _idx, img, label):
+        if self.thread is None or self.thread.cancelled:
+            return
+        self.imported_frames += 1
+        handler = self.handler
+        if handler.layer_stack() is None:
+            handler.set_layer_stack([img])
+            handler.set_layer_labels([label])
+            handler.set_master_layer(img.copy())
+            handler.blank_layer = np.zeros(img.shape[:2])
+            handler.display_manager.update_thumbnails()
+            handler.change_layer_requested.emit(0)
+            handler.image_viewer.setup_brush_cursor()
+            handler.image_viewer.reset_zoom()
+        else:
+            handler.add_layer_label(label)
+            handler.add_layer(img)
+            handler.display_manager.add_layer_thumbnail(handler.number_of_layers() - 1)
+
+    def close_progress(self):
+        if self.progress is not None:
+            self.progress.reset()
+            self.progress.deleteLater()
+            self.progress = None
+        if self.imported_frames > 0:
+            self.handler.mark_as_modified_requested.emit(True)
+            self.handler.update_title_requested.emit()
+
+    def on_frames_imported(self, completed):
+        self.close_progress()
+        self.handler.status_message_requested.emit(
+            "Selected frames imported" if completed
+            else f"Import cancelled, {self.imported_frames} frames imported")
+
+    def on_frames_import_error(self, error_msg):
+        self.close_progress()
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Critical)
+        msg.setWindowTitle("Import error")
+        msg.setText(error_msg)
+        msg.exec()
+
+
 class IOGuiHandler(QObject, LayerCollectionHandler):
     status_message_requested = Signal(str)
     update_title_requested = Signal()
@@ -24,6 +100,7 @@ class IOGuiHandler(QObject, LayerCollectionHandler):
         self.undo_manager = undo_manager
         self.set_layer_collection(layer_collection)
         self.loader_thread = None
+        self.frame_import = FrameImportHandler(self)
         self.display_manager = None
         self.image_viewer = None
         self.blank_layer = None
@@ -125,35 +202,9 @@ class IOGuiHandler(QObject, LayerCollectionHandler):
             "Images Images (*.tif *.tiff *.jpg *.jpeg);;All Files (*)")
         if file_paths:
             self.import_frames_from_files(file_paths)
-        self.status_message_requested.emit("Imported selected frames")
 
     def import_frames_from_files(self, file_paths):
-        try:
-            stack, labels, master = self.io_manager.import_frames(file_paths)
-        except Exception as e:
-            msg = QMessageBox()
-            msg.setIcon(QMessageBox.Critical)
-            msg.setWindowTitle("Import error")
-            msg.setText(str(e))
-            msg.exec()
-            return
-        if self.layer_stack() is None and len(stack) > 0:
-            self.set_layer_stack(np.array(stack))
-            if labels is None:
-                labels = self.layer_labels()
-            else:
-                self.set_layer_labels(labels)
-            self.set_master_layer(master)
-            self.blank_layer = np.zeros(master.shape[:2])
-        else:
-            if labels is None:
-                labels = self.layer_labels()
-            for img, label in zip(stack, labels):
-                self.add_layer_label(label)
-                self.add_layer(img)
-        self.finish_loading_setup(
-            stack, labels, master,
-            "Selected frames imported")
+        self.frame_import.start(file_paths)
 
     def finish_loading_setup(self, stack, labels, master, message):
         self.display_manager.update_thumbnails()
@@ -264,6 +315,7 @@ class IOGuiHandler(QObject, LayerCollectionHandler):
         self.exif_dialog.exec()
 
     def close_file(self):
+        self.frame_import.cancel()
         self.mark_as_modified_requested.emit(False)
         self.blank_layer = None
         self.layer_collection.reset()
@@ -1,8 +1,11 @@
-# pylint: disable=E1101, C0114, C0115, C0116, E0611, W0718, R0903
+# pylint: disable=E1101, C0114, C0115, C0116, E0611, W0718, R0903, R0914
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 from PySide6.QtCore import QThread, Signal
-from .. algorithms.utils import read_img, validate_image, get_img_metadata
+from .. config.constants import constants
+from .. algorithms.utils import read_img, validate_image, get_img_metadata, validate_image_files
 from .. algorithms.exif import get_exif, write_image_with_exif_data
 from .. algorithms.multilayer import write_multilayer_tiff_from_images
 from .layer_collection import LayerCollectionHandler
@@ -28,36 +31,100 @@ class FileMultilayerSaver(QThread):
             self.error.emit(str(e))
 
 
+class FrameImporter(QThread):
+    frame_loaded = Signal(int, object, str)
+    progress = Signal(int, int)
+    finished = Signal(bool)
+    error = Signal(str)
+
+    def __init__(self, io_manager, file_paths):
+        super().__init__()
+        self.io_manager = io_manager
+        self.file_paths = file_paths
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        n_files = len(self.file_paths)
+        try:
+            for i, (img, label) in enumerate(self.io_manager.iter_frames(
+                    self.file_paths, is_cancelled=lambda: self.cancelled)):
+                self.frame_loaded.emit(i, img, label)
+                self.progress.emit(i + 1, n_files)
+            self.finished.emit(not self.cancelled)
+        except Exception as e:
+            traceback.print_tb(e.__traceback__)
+            self.error.emit(str(e))
+
+
 class IOManager(LayerCollectionHandler):
     def __init__(self, layer_collection):
         super().__init__(layer_collection)
         self.exif_path = ''
         self.exif_data = None
 
-    def import_frames(self, file_paths):
-        stack = []
+    def load_frame(self, path):
+        img = read_img(path)
+        if img is None:
+            raise RuntimeError("Invalid image file")
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+
+    def iter_frames(self, file_paths, max_workers=constants.MAX_IMPORT_WORKERS,
+                    is_cancelled=None):
         labels = []
-        master = None
         shape, dtype = get_img_metadata(self.master_layer())
+        file_paths = list(file_paths)
         for path in file_paths:
             try:
+                shape, dtype = validate_image_files([path], shape, dtype)
+            except Exception as e:
+                raise RuntimeError(f"Error loading file: {path}.\n{str(e)}") from e
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            paths = iter(file_paths)
+            pending = deque()
+
+            def submit_next():
+                path = next(paths, None)
+                if path is not None:
+                    pending.append((path, executor.submit(self.load_frame, path)))
+
+            for _ in range(2 * max_workers):
+                submit_next()
+            while pending:
+                if is_cancelled is not None and is_cancelled():
+                    for _path, future in pending:
+                        future.cancel()
+                    return
+                path, future = pending.popleft()
+                submit_next()
+                try:
+                    img = future.result()
+                    if shape is not None and dtype is not None:
+                        validate_image(img, shape, dtype)
+                    else:
+                        shape, dtype = get_img_metadata(img)
+                except Exception as e:
+                    for _path, f in pending:
+                        f.cancel()
+                    raise RuntimeError(f"Error loading file: {path}.\n{str(e)}") from e
                 label = path.split("/")[-1].split(".")[0]
-                img = cv2.cvtColor(read_img(path), cv2.COLOR_BGR2RGB)
-                if shape is not None and dtype is not None:
-                    validate_image(img, shape, dtype)
-                else:
-                    shape, dtype = get_img_metadata(img)
                 label_x = label
                 i = 0
                 while label_x in labels:
                     i += 1
                     label_x = f"{label} ({i})"
                 labels.append(label_x)
-                stack.append(img)
-                if master is None:
-                    master = img.copy()
-            except Exception as e:
-                raise RuntimeError(f"Error loading file: {path}.\n{str(e)}") from e
+                yield img, label_x
+
+    def import_frames(self, file_paths):
+        stack = []
+        labels = []
+        for img, label in self.iter_frames(file_paths):
+            stack.append(img)
+            labels.append(label)
+        master = stack[0].copy() if stack else None
         return stack, labels, master
 
     def save_master(self, path):
@@ -1,5 +1,4 @@
 # pylint: disable=C0114, C0115, C0116, R0904
-import numpy as np
 
 
 class LayerCollection:
@@ -46,7 +45,7 @@ class LayerCollection:
         self.layer_labels = labels
 
     def set_layer_stack(self, stk):
-        self.layer_stack = stk
+        self.layer_stack = None if stk is None else list(stk)
 
     def set_current_layer_idx(self, idx):
         self.current_layer_idx = idx
@@ -75,19 +74,23 @@ class LayerCollection:
             self.layer_labels.append(label)
 
     def add_layer(self, img):
-        self.layer_stack = np.append(self.layer_stack, [img], axis=0)
+        if self.layer_stack is None:
+            self.layer_stack = []
+        elif not isinstance(self.layer_stack, list):
+            self.layer_stack = list(self.layer_stack)
+        self.layer_stack.append(img)
 
     def sort_layers(self, order):
         master_index = -1
         master_label = None
         master_layer = None
+        layers = list(self.layer_stack)
         for i, label in enumerate(self.layer_labels):
             label_lower = label.lower()
             if "master" in label_lower or "stack" in label_lower:
                 master_index = i
                 master_label = self.layer_labels.pop(i)
-                master_layer = self.layer_stack[i]
-                self.layer_stack = np.delete(self.layer_stack, i, axis=0)
+                master_layer = layers.pop(i)
                 break
         if order == 'asc':
             self.sorted_indices = sorted(range(len(self.layer_labels)),
@@ -99,12 +102,13 @@ class LayerCollection:
         else:
             raise ValueError(f"Invalid sorting order: {order}")
         self.layer_labels = [self.layer_labels[i] for i in self.sorted_indices]
-        self.layer_stack = self.layer_stack[self.sorted_indices]
+        layers = [layers[i] for i in self.sorted_indices]
         if master_index != -1:
             self.layer_labels.insert(0, master_label)
-            self.layer_stack = np.insert(self.layer_stack, 0, master_layer, axis=0)
+            layers.insert(0, master_layer)
             self.master_layer = master_layer.copy()
             self.master_layer.setflags(write=True)
+        self.layer_stack = layers
         if self.current_layer_idx >= self.number_of_layers():
             self.current_layer_idx = self.number_of_layers() - 1
 
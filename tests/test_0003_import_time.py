@@ -0,0 +1,40 @@
+import os
+import sys
+import subprocess
+import pytest
+
+IMPORT_TIME_BUDGET = {
+    'shinestacker': 1.0,
+    'shinestacker.app.main': 2.0,
+    'shinestacker.app.project': 2.0,
+    'shinestacker.app.retouch': 2.0
+}
+LAZY_MODULES = ['matplotlib', 'scipy', 'tifffile', 'psdtags', 'PIL', 'tqdm']
+
+
+def import_time(module):
+    env = {**os.environ, 'QT_QPA_PLATFORM': 'offscreen'}
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                          f"import sys, {module}; print(','.join(sys.modules))"],
+                         env=env, capture_output=True, text=True, check=True)
+    timings = {}
+    for line in res.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            if cumulative_us.strip().isdigit():
+                timings[name.strip()] = int(cumulative_us) / 1e6
+    return timings[module], res.stdout.strip().split(',')
+
+
+@pytest.mark.parametrize('module', IMPORT_TIME_BUDGET.keys())
+def test_import_time(module):
+    seconds, _modules = import_time(module)
+    print(f"import {module}: {seconds:.3f}s")
+    assert seconds < IMPORT_TIME_BUDGET[module]
+
+
+@pytest.mark.parametrize('module', ['shinestacker', 'shinestacker.app.main'])
+def test_lazy_imports(module):
+    _seconds, modules = import_time(module)
+    loaded = [m for m in LAZY_MODULES if m in modules]
+    assert loaded == []
@@ -0,0 +1,62 @@
+import os
+import pytest
+import numpy as np
+import cv2
+from PIL import Image
+from shinestacker.core.exceptions import ShapeError, BitDepthError, ImageLoadError
+from shinestacker.algorithms.utils import read_img, probe_img, validate_image_files
+
+
+def decoded_info(path):
+    img = read_img(path)
+    return img.shape[:2], img.dtype, 1 if img.ndim == 2 else img.shape[2]
+
+
+@pytest.fixture
+def image_files(tmp_path):
+    files = []
+    for name, img in [('rgb8.png', np.zeros((30, 40, 3), np.uint8)),
+                      ('rgb16.png', np.zeros((30, 40, 3), np.uint16)),
+                      ('gray8.png', np.zeros((30, 40), np.uint8)),
+                      ('rgba8.png', np.zeros((30, 40, 4), np.uint8)),
+                      ('rgb8.tif', np.zeros((30, 40, 3), np.uint8)),
+                      ('rgb16.tif', np.zeros((30, 40, 3), np.uint16)),
+                      ('gray16.tiff', np.zeros((30, 40), np.uint16)),
+                      ('rgb8.jpg', np.zeros((30, 40, 3), np.uint8))]:
+        path = str(tmp_path / name)
+        cv2.imwrite(path, img)
+        files.append(path)
+    path = str(tmp_path / 'rotated.jpg')
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.fromarray(np.zeros((30, 40, 3), np.uint8)).save(path, exif=exif.tobytes())
+    files.append(path)
+    return files
+
+
+def test_probe_matches_decoder(image_files):
+    for path in image_files:
+        assert probe_img(path) == decoded_info(path), path
+    assert probe_img(image_files[-1])[0] == (40, 30)
+
+
+def test_probe_examples():
+    image_dir = "examples/input/img-jpg"
+    if not os.path.isdir(image_dir):
+        pytest.skip(f"Test images in {image_dir} not found")
+    for name in sorted(os.listdir(image_dir)):
+        path = os.path.join(image_dir, name)
+        assert probe_img(path) == decoded_info(path)
+
+
+def test_validate_image_files(tmp_path, image_files):
+    rgb8 = [f for f in image_files if os.path.basename(f).startswith('rgb8')]
+    assert validate_image_files(rgb8) == ((30, 40), np.uint8)
+    with pytest.raises(BitDepthError):
+        validate_image_files(rgb8 + [str(tmp_path / 'rgb16.png')])
+    with pytest.raises(ShapeError):
+        validate_image_files(rgb8 + [str(tmp_path / 'rotated.jpg')])
+    unsupported = tmp_path / 'image.bmp'
+    unsupported.write_bytes(b'BM')
+    with pytest.raises(ImageLoadError):
+        validate_image_files(rgb8 + [str(unsupported)])
@@ -0,0 +1,127 @@
+import os
+import threading
+import pytest
+import numpy as np
+import cv2
+from shinestacker.config.constants import constants
+from shinestacker.core.exceptions import InvalidOptionError
+from shinestacker.algorithms.codecs import (
+    CODECS, get_codec, register_codec, OpenCVCodec, TiffCodec)
+from shinestacker.algorithms.utils import read_img, write_img, WriteQueue
+from shinestacker.algorithms.stack_framework import StackJob, CombinedActions, SubAction
+
+
+@pytest.mark.parametrize("compression", constants.VALID_TIFF_COMPRESSIONS)
+@pytest.mark.parametrize("shape, dtype", [((30, 40, 3), np.uint8), ((30, 40, 3), np.uint16),
+                                          ((30, 40), np.uint16), ((30, 40, 4), np.uint16),
+                                          ((30, 40, 3), np.float32)])
+def test_tiff_roundtrip(tmp_path, compression, shape, dtype):
+    rng = np.random.default_rng(0)
+    img = (rng.random(shape) * (1 if dtype == np.float32 else np.iinfo(dtype).max)).astype(dtype)
+    path = str(tmp_path / "img.tif")
+    write_img(path, img, compression=compression)
+    assert np.array_equal(read_img(path), img)
+    if compression in (constants.TIFF_COMPRESSION_NONE, constants.TIFF_COMPRESSION_DEFLATE):
+        assert np.array_equal(cv2.imread(path, cv2.IMREAD_UNCHANGED), img)
+
+
+def test_tiff_reads_opencv_files(tmp_path):
+    img = np.zeros((30, 40, 3), dtype=np.uint16)
+    img[:, :, 0] = 1000
+    path = str(tmp_path / "img.tiff")
+    cv2.imwrite(path, img)
+    assert np.array_equal(read_img(path), img)
+
+
+def test_compression_reduces_size(tmp_path):
+    img = np.tile(np.arange(40, dtype=np.uint16)[np.newaxis, :, np.newaxis] * 100, (30, 1, 3))
+    sizes = {}
+    for compression in constants.VALID_TIFF_COMPRESSIONS:
+        path = tmp_path / f"img-{compression}.tif"
+        write_img(str(path), img, compression=compression)
+        sizes[compression] = path.stat().st_size
+    assert all(sizes[c] < sizes[constants.TIFF_COMPRESSION_NONE]
+               for c in constants.VALID_TIFF_COMPRESSIONS[1:])
+    with pytest.raises(InvalidOptionError):
+        write_img(str(tmp_path / "img.tif"), img, compression='jpeg2000')
+
+
+def test_codec_registry(tmp_path):
+    assert isinstance(get_codec("a/b.tif"), TiffCodec)
+    assert get_codec("a/b.bmp") is None
+    register_codec(OpenCVCodec(), ['bmp'])
+    try:
+        img = np.full((10, 20, 3), 128, dtype=np.uint8)
+        path = str(tmp_path / "img.bmp")
+        write_img(path, img)
+        assert np.array_equal(read_img(path), img)
+    finally:
+        del CODECS['bmp']
+
+
+def test_write_queue(tmp_path):
+    release = threading.Event()
+    started = []
+
+    def blocked_write(path, img):
+        started.append(path)
+        release.wait()
+        write_img(path, img)
+
+    queue = WriteQueue(max_workers=1, max_pending=1)
+    img = np.full((10, 20, 3), 7, dtype=np.uint8)
+    paths = [str(tmp_path / f"img-{i}.png") for i in range(2)]
+    queue.submit(blocked_write, paths[0], img, key=paths[0])
+    submitter = threading.Thread(target=queue.submit, args=(write_img, paths[1], img))
+    submitter.start()
+    submitter.join(0.2)
+    assert submitter.is_alive()
+    release.set()
+    submitter.join()
+    queue.wait(paths[0])
+    assert np.array_equal(read_img(paths[0]), img)
+    queue.submit(write_img, str(tmp_path / "missing" / "img.tif"), img)
+    with pytest.raises(OSError):
+        queue.close()
+    assert np.array_equal(read_img(paths[1]), img)
+
+
+def test_write_queue_cancel(tmp_path):
+    release = threading.Event()
+
+    def blocked_write(path, img):
+        release.wait()
+        write_img(path, img)
+
+    queue = WriteQueue(max_workers=1, max_pending=2)
+    img = np.full((10, 20, 3), 7, dtype=np.uint8)
+    paths = [str(tmp_path / f"img-{i}.png") for i in range(2)]
+    queue.submit(blocked_write, paths[0], img)
+    queue.submit(write_img, paths[1], img)
+    threading.Timer(0.2, release.set).start()
+    assert queue.cancel() is None
+    assert np.array_equal(read_img(paths[0]), img)
+    assert not os.path.exists(paths[1])
+    queue.submit(write_img, str(tmp_path / "missing" / "img.tif"), img)
+    queue.submit(write_img, paths[1], img)
+    assert isinstance(queue.cancel(), OSError)
+
+
+class FailingAction(SubAction):
+    def run_frame(self, idx, _ref_idx, img_0):
+        if idx == 2:
+            raise RuntimeError("frame failed")
+        return img_0
+
+
+def test_write_queue_stopped_job(tmp_path):
+    os.makedirs(tmp_path / "input")
+    for i in range(4):
+        write_img(str(tmp_path / "input" / f"img-{i}.png"),
+                  np.full((10, 20, 3), i, dtype=np.uint8))
+    job = StackJob("job", str(tmp_path), input_path="input")
+    action = CombinedActions("fail", [FailingAction()], output_path="output", ref_idx=0)
+    job.add_action(action)
+    with pytest.raises(RuntimeError):
+        job.run()
+    assert action.write_queue._executor is None  # pylint: disable=protected-access
@@ -1,6 +1,8 @@
 import time
+import json
 from shinestacker.core.colors import color_str
 from shinestacker.core.framework import Job, JobBase, ActionList
+from shinestacker.core.metrics import MetricsCollector
 
 
 class Action1(JobBase):
@@ -45,5 +47,28 @@ def test_run():
         assert False
 
 
+def test_metrics(tmp_path):
+    metrics = MetricsCollector()
+    job = Job("job", callbacks='tqdm', metrics=metrics)
+    job.add_action(MyActionList("my actions"))
+    job.run()
+    kinds = [r['kind'] for r in metrics.records]
+    assert kinds == ['step'] * 10 + ['action', 'job']
+    assert [r['step'] for r in metrics.records[:10]] == list(range(10))
+    action = metrics.records[-2]
+    assert action['name'] == "my actions"
+    assert action['wall_time'] >= 1.0
+    assert sum(r['wall_time'] for r in metrics.records[:10]) <= action['wall_time']
+    summary = {(s['kind'], s['name']): s for s in metrics.summary()}
+    assert summary[('step', "my actions")]['count'] == 10
+    assert summary[('action', "my actions")]['count'] == 1
+    metrics.write_json(tmp_path / "metrics.json")
+    metrics.write_chrome_trace(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json", encoding='utf-8') as f:
+        trace = json.load(f)
+    assert len(trace['traceEvents']) == 12
+    assert all(e['ph'] == 'X' for e in trace['traceEvents'])
+
+
 if __name__ == '__main__':
     test_run()
@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+from shinestacker.config.constants import constants
+from shinestacker.algorithms.align import (
+    detect_and_compute, feature_detector, flann_matcher, hamming_matcher, clear_pool)
+
+SCRIPT = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'align_benchmark.py')
+
+
+def make_pair():
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur((rng.random((200, 300)) * 255).astype(np.uint8), (0, 0), 2)
+    img = cv2.cvtColor(cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX), cv2.COLOR_GRAY2BGR)
+    m = np.float32([[1, 0, 4], [0, 1, -3]])
+    return cv2.warpAffine(img, m, (300, 200), borderMode=cv2.BORDER_REFLECT), img
+
+
+def test_pool_per_thread():
+    detector = feature_detector(constants.DETECTOR_ORB)
+    assert feature_detector(constants.DETECTOR_ORB) is detector
+    assert hamming_matcher() is hamming_matcher()
+    assert flann_matcher(0, 5, 50) is not flann_matcher(0, 4, 50)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(feature_detector, constants.DETECTOR_ORB).result() \
+            is not detector
+    clear_pool()
+    assert feature_detector(constants.DETECTOR_ORB) is not detector
+
+
+def test_pooled_matches():
+    pair = make_pair()
+    configs = ({'detector': 'SIFT', 'descriptor': 'SIFT'}, {'match_method': 'KNN'}), \
+        ({'detector': 'ORB', 'descriptor': 'ORB'}, {'match_method': 'NORM_HAMMING'})
+    for feature_config, matching_config in configs:
+        clear_pool()
+        expected = len(detect_and_compute(*pair, feature_config, matching_config)[2])
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            n_matches = list(executor.map(
+                lambda p, f=feature_config, m=matching_config: len(
+                    detect_and_compute(*p, f, m)[2]), [pair] * 4))
+        assert n_matches == [expected] * 4
+
+
+def test_benchmark(tmp_path):
+    output = str(tmp_path / 'bench.json')
+    res = subprocess.run([sys.executable, SCRIPT, '--frames', '1', '--megapixels', '0.01',
+                          '--repeat', '1', '-o', output], env=os.environ.copy(),
+                         capture_output=True, text=True, check=False)
+    assert res.returncode == 0, res.stderr
+    with open(output, encoding='utf-8') as f:
+        results = json.load(f)
+    orb = results['combinations']['ORB/ORB/NORM_HAMMING']
+    assert orb['pooled_time'] > 0
+    assert orb['unpooled_time'] > 0
+    assert orb['creation_time'] > 0
+    assert 'SIFT/SIFT/KNN' in results['combinations']
+    assert 'SIFT/ORB/KNN' not in results['combinations']
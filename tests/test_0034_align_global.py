@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from shinestacker.config.constants import constants
+from shinestacker.core.exceptions import AlignmentError
+from shinestacker.algorithms.utils import write_img
+from shinestacker.algorithms.stack_framework import StackJob, CombinedActions
+from shinestacker.algorithms.align import AlignFrames, solve_transforms
+
+N_FRAMES = 5
+REF_IDX = 2
+
+
+def make_texture(shape=(300, 400)):
+    rng = np.random.default_rng(0)
+    noise = rng.random((shape[0] // 4, shape[1] // 4, 3)).astype(np.float32)
+    texture = cv2.resize(noise, (shape[1], shape[0]), interpolation=cv2.INTER_CUBIC)
+    return (np.clip(texture, 0, 1) * 255).astype(np.uint8)
+
+
+def frame_transform(i):
+    angle, scale = 0.3 * (i - REF_IDX), 1 + 0.004 * (i - REF_IDX)
+    m = cv2.getRotationMatrix2D((200, 150), angle, scale)
+    m[:, 2] += (3.0 * (i - REF_IDX), -2.0 * (i - REF_IDX))
+    return np.vstack([m, (0, 0, 1)])
+
+
+@pytest.fixture
+def frames(tmp_path):
+    texture = make_texture()
+    os.makedirs(tmp_path / "input")
+    for i in range(N_FRAMES):
+        img = cv2.warpAffine(texture, frame_transform(i)[:2], (400, 300),
+                             borderMode=cv2.BORDER_REFLECT)
+        write_img(str(tmp_path / "input" / f"img-{i}.png"), img)
+    return tmp_path
+
+
+def run_align(path, align):
+    job = StackJob("job", str(path), input_path="input")
+    job.add_action(CombinedActions("align", [align], output_path="output", ref_idx=REF_IDX))
+    job.run()
+
+
+def test_solve_transforms():
+    rng = np.random.default_rng(1)
+    pts = rng.random((50, 2)) * (400, 300)
+    edges = {}
+    pairs = [(i, i + 1) for i in range(N_FRAMES - 1)] + [(0, REF_IDX), (4, REF_IDX)]
+    for a, b in pairs:
+        to_ref = [np.linalg.inv(frame_transform(i)) for i in (a, b)]
+        pts_b = pts
+        pts_a = cv2.perspectiveTransform(
+            pts_b.reshape(-1, 1, 2), np.linalg.inv(to_ref[0]) @ to_ref[1]).reshape(-1, 2)
+        edges[(a, b)] = (np.linalg.inv(to_ref[1]) @ to_ref[0] @ np.diag([1.01, 0.99, 1]),
+                         pts_a, pts_b)
+    for transform in constants.VALID_TRANSFORMS:
+        transforms = solve_transforms(N_FRAMES, REF_IDX, edges, (300, 400), transform)
+        for i, m in enumerate(transforms):
+            assert np.abs(m - np.linalg.inv(frame_transform(i))).max() < 1e-3
+    del edges[(0, 1)], edges[(0, REF_IDX)]
+    assert solve_transforms(N_FRAMES, REF_IDX, edges, (300, 400))[0] is None
+
+
+@pytest.mark.parametrize("transform", constants.VALID_TRANSFORMS)
+def test_global_alignment(frames, transform):
+    align = AlignFrames(alignment_config={'transform': transform,
+                                          'solver': constants.ALIGN_SOLVER_GLOBAL})
+    run_align(frames, align)
+    assert len(os.listdir(frames / "output")) == N_FRAMES
+    for i, m in enumerate(align.transforms):
+        expected = np.linalg.inv(frame_transform(i))
+        m = m / m[2, 2] if m.shape == (3, 3) else m
+        assert np.abs(m[:2, :2] - expected[:2, :2]).max() < 2e-3
+        assert np.abs(m[:2, 2] - expected[:2, 2]).max() < 0.5
+
+
+def test_global_alignment_error(frames):
+    write_img(str(frames / "input" / "img-0.png"), np.zeros((300, 400, 3), dtype=np.uint8))
+    with pytest.raises(AlignmentError):
+        run_align(frames, AlignFrames(solver=constants.ALIGN_SOLVER_GLOBAL))
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from shinestacker.config.constants import constants
+from shinestacker.algorithms.utils import write_img
+from shinestacker.algorithms.stack_framework import StackJob, CombinedActions
+from shinestacker.algorithms.align import (
+    AlignFrames, align_images, phase_correlation_transform, _DEFAULT_ALIGNMENT_CONFIG)
+
+SHAPE = (400, 600)
+
+
+def make_texture():
+    rng = np.random.default_rng(0)
+    noise = rng.random((SHAPE[0] // 8, SHAPE[1] // 8, 3)).astype(np.float32)
+    texture = cv2.resize(noise, (SHAPE[1], SHAPE[0]), interpolation=cv2.INTER_CUBIC)
+    return (np.clip(texture, 0, 1) * 255).astype(np.uint8)
+
+
+def shifted(img, shift, scale=1.0):
+    m = cv2.getRotationMatrix2D((SHAPE[1] / 2, SHAPE[0] / 2), 0, scale)
+    m[:, 2] += shift
+    return cv2.warpAffine(img, m, (SHAPE[1], SHAPE[0]), borderMode=cv2.BORDER_REFLECT), m
+
+
+@pytest.mark.parametrize("scale", [1.0, 1.01])
+def test_phase_correlation_transform(scale):
+    texture = make_texture()
+    img, m_true = shifted(texture, (7.4, -4.2), scale)
+    config = {**_DEFAULT_ALIGNMENT_CONFIG, 'phase_scale': scale != 1}
+    m, response = phase_correlation_transform(texture, img, config)
+    assert response > 0.5
+    expected = cv2.invertAffineTransform(m_true)
+    pts = np.float32([[0, 0], [SHAPE[1], SHAPE[0]], [SHAPE[1] / 2, SHAPE[0] / 2]])
+    error = cv2.transform(pts[:, np.newaxis], m) - cv2.transform(pts[:, np.newaxis], expected)
+    assert np.abs(error).max() < 0.5
+
+
+def test_fallback_to_features():
+    texture = make_texture()
+    img, _ = shifted(texture, (5, 3))
+    warnings = []
+    config = {'transform': constants.ALIGN_TRANSLATION}
+    n_good_matches, _, aligned = align_images(texture, img, alignment_config=config)
+    assert n_good_matches is None
+    assert np.abs(aligned[20:-20, 20:-20].astype(int) - texture[20:-20, 20:-20]).mean() < 2
+    n_good_matches, m, _ = align_images(
+        texture, img, alignment_config={**config, 'min_phase_response': 1.1},
+        callbacks={'warning': warnings.append})
+    assert n_good_matches > 0
+    assert m.shape == (2, 3)
+    assert len(warnings) == 1
+
+
+def test_align_frames_translation(tmp_path):
+    texture = make_texture()
+    os.makedirs(tmp_path / "input")
+    for i in range(3):
+        write_img(str(tmp_path / "input" / f"img-{i}.png"), shifted(texture, (3 * i, -2 * i))[0])
+    job = StackJob("job", str(tmp_path), input_path="input")
+    job.add_action(CombinedActions("align", [AlignFrames(
+        transform=constants.ALIGN_TRANSLATION, plot_summary=True)], output_path="output"))
+    job.run()
+    assert len(os.listdir(tmp_path / "output")) == 3
+    assert os.path.exists(tmp_path / "plots" / "align-phase-correlation.pdf")
+    assert not os.path.exists(tmp_path / "plots" / "align-matches.pdf")
@@ -0,0 +1,48 @@
+import numpy as np
+import cv2
+import pytest
+from shinestacker.config.constants import constants
+from shinestacker.algorithms.align import warp_image, border_strips
+
+SHAPE = (300, 400)
+
+
+def make_image():
+    rng = np.random.default_rng(0)
+    return (rng.random((*SHAPE, 3)) * 255).astype(np.uint8)
+
+
+def full_frame_blur(img, m, homography):
+    h, w = img.shape[:2]
+    warp = cv2.warpPerspective if homography else cv2.warpAffine
+    img_warp = warp(img, m, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    mask = warp(np.ones_like(img), m, (w, h), borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(img_warp, (21, 21), sigmaX=constants.DEFAULT_BORDER_BLUR)
+    img_warp[mask == 0] = blurred[mask == 0]
+    return img_warp
+
+
+@pytest.mark.parametrize("angle, shift, homography", [
+    (0, (5, -3), False), (2, (20, 10), False), (-10, (-40, 30), False),
+    (1, (10, 5), True), (60, (0, 0), False)])
+def test_border_blur(angle, shift, homography):
+    img = make_image()
+    m = cv2.getRotationMatrix2D((SHAPE[1] / 2, SHAPE[0] / 2), angle, 1.01)
+    m[:, 2] += shift
+    if homography:
+        m = np.vstack([m, (5e-5, -5e-5, 1)])
+    config = {'transform': constants.ALIGN_HOMOGRAPHY if homography else constants.ALIGN_RIGID,
+              'border_mode': constants.BORDER_REPLICATE_BLUR}
+    diff = np.any(warp_image(img, m, config) != full_frame_blur(img, m, homography), axis=2)
+    assert diff.sum() <= 2
+
+
+def test_border_strips():
+    m = np.float64([[1, 0, 5], [0, 1, -3]])
+    assert sorted(border_strips(m, SHAPE)) == [
+        (0, SHAPE[0] - 4, 0, 6), (SHAPE[0] - 4, SHAPE[0], 0, SHAPE[1])]
+    assert border_strips(np.float64([[1, 0, 0], [0, 1, 0]]), SHAPE) == [
+        (0, 1, 0, SHAPE[1]), (SHAPE[0] - 1, SHAPE[0], 0, SHAPE[1]),
+        (1, SHAPE[0] - 1, 0, 1), (1, SHAPE[0] - 1, SHAPE[1] - 1, SHAPE[1])]
+    assert border_strips(cv2.getRotationMatrix2D((200, 150), 90, 1), SHAPE) is None
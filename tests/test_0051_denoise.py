@@ -1,4 +1,5 @@
 import os
+import numpy as np
 from shinestacker.algorithms.denoise import denoise
 from shinestacker.algorithms.utils import read_img, write_img
 
@@ -29,6 +30,14 @@ def test_denoise_16bit():
         assert False
 
 
+def test_denoise_tiled():
+    img = read_img("examples/input/img-jpg/0002.jpg")[:600, :900]
+    whole = denoise(img, 10, tile_size=1024)
+    tiled = denoise(img, 10, tile_size=256)
+    assert np.array_equal(whole, tiled)
+
+
 if __name__ == '__main__':
     test_denoise_8bit()
     test_denoise_16bit()
+    test_denoise_tiled()
@@ -1,4 +1,5 @@
 import os
+import numpy as np
 from shinestacker.algorithms.sharpen import unsharp_mask
 from shinestacker.algorithms.utils import read_img, write_img
 
@@ -29,6 +30,14 @@ def test_unsharpen_mask_16bit():
         assert False
 
 
+def test_unsharpen_mask_tiled():
+    img = read_img("examples/input/img-jpg/0002.jpg")[:600, :900]
+    whole = unsharp_mask(img, radius=2.0, amount=1.5, threshold=10, tile_size=1024)
+    tiled = unsharp_mask(img, radius=2.0, amount=1.5, threshold=10, tile_size=256)
+    assert np.array_equal(whole, tiled)
+
+
 if __name__ == '__main__':
     test_unsharpen_mask_8bit()
     test_unsharpen_mask_16bit()
+    test_unsharpen_mask_tiled()
@@ -1,5 +1,6 @@
 
 import os
+import numpy as np
 from shinestacker.algorithms.white_balance import white_balance_from_rgb
 from shinestacker.algorithms.utils import read_img, write_img
 
@@ -32,6 +33,14 @@ def test_wb_16bit():
         assert False
 
 
+def test_wb_tiled():
+    img = read_img("examples/input/img-jpg/0002.jpg")[:600, :900]
+    whole = white_balance_from_rgb(img, target_rgb, tile_size=1024)
+    tiled = white_balance_from_rgb(img, target_rgb, tile_size=256)
+    assert np.array_equal(whole, tiled)
+
+
 if __name__ == '__main__':
     test_wb_8bit()
     test_wb_16bit()
+    test_wb_tiled()
@@ -0,0 +1,77 @@
+import time
+import tracemalloc
+import numpy as np
+import cv2
+import pytest
+from shinestacker.algorithms.sharpen import unsharp_mask
+from shinestacker.algorithms.white_balance import white_balance_from_rgb
+from shinestacker.algorithms.utils import read_img
+
+
+def reference_unsharp_mask(image, radius, amount, threshold):
+    if image.dtype == np.uint16:
+        threshold = threshold * 256
+    blurred = cv2.GaussianBlur(image, (0, 0), radius)
+    image_float = image.astype(np.float32)
+    blurred_float = blurred.astype(np.float32)
+    diff = image_float - blurred_float
+    mask = np.abs(diff) > threshold
+    sharpened_float = np.where(mask, image_float + amount * diff, image_float)
+    max_val = np.iinfo(image.dtype).max
+    return np.clip(sharpened_float, 0, max_val).astype(image.dtype)
+
+
+def reference_white_balance(img, target_rgb):
+    img_float = img.astype(np.float64)
+    target_bgr = (target_rgb[2], target_rgb[1], target_rgb[0])
+    target_gray = sum(target_bgr) / 3.0
+    scales = [target_gray / val if val != 0 else 1.0 for val in target_bgr]
+    for c in range(3):
+        img_float[..., c] *= scales[c]
+    max_val = np.iinfo(img.dtype).max
+    img_float = np.clip(img_float, 0, max_val)
+    return img_float.astype(img.dtype)
+
+
+@pytest.fixture(params=[np.uint8, np.uint16], ids=['8bit', '16bit'])
+def image(request):
+    img = read_img("examples/input/img-jpg/0002.jpg")
+    return img if request.param == np.uint8 else img.astype(np.uint16) * 257
+
+
+@pytest.fixture
+def benchmark():
+    def measure(func, *args, repeat=3):
+        tracemalloc.start()
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            func(*args)
+        return result, (time.perf_counter() - t0) / repeat, peak
+    return measure
+
+
+def report(name, image, ref_time, ref_peak, new_time, new_peak):
+    print(f"\n{name} {image.dtype}: "
+          f"time {ref_time * 1000:.1f} -> {new_time * 1000:.1f} ms, "
+          f"peak memory {ref_peak / 2**20:.1f} -> {new_peak / 2**20:.1f} MB")
+
+
+def test_unsharp_mask_benchmark(image, benchmark):
+    args = (image, 2.0, 1.5, 10)
+    ref, ref_time, ref_peak = benchmark(reference_unsharp_mask, *args)
+    new, new_time, new_peak = benchmark(unsharp_mask, *args)
+    report("unsharp mask", image, ref_time, ref_peak, new_time, new_peak)
+    assert np.abs(ref.astype(np.int32) - new).max() <= 1
+    assert new_peak < ref_peak
+
+
+def test_white_balance_benchmark(image, benchmark):
+    args = (image, (246, 233, 178))
+    ref, ref_time, ref_peak = benchmark(reference_white_balance, *args)
+    new, new_time, new_peak = benchmark(white_balance_from_rgb, *args)
+    report("white balance", image, ref_time, ref_peak, new_time, new_peak)
+    assert np.array_equal(ref, new)
+    assert new_peak < ref_peak
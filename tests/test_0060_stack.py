@@ -1,5 +1,6 @@
+from shinestacker.config.constants import constants
 from shinestacker.algorithms.stack_framework import StackJob
-from shinestacker.algorithms.stack import FocusStack, FocusStackBunch
+from shinestacker.algorithms.stack import FocusStack, FocusStackBunch, get_bunches
 from shinestacker.algorithms.pyramid import PyramidStack
 from shinestacker.algorithms.depth_map import DepthMapStack
 
@@ -44,8 +45,55 @@ def test_bunches():
         assert False
 
 
+class CountingPyramidStack(PyramidStack):
+    def __init__(self):
+        super().__init__()
+        self.processed = []
+
+    def process_single_image(self, img, levels):
+        self.processed.append(img.shape)
+        return super().process_single_image(img, levels)
+
+
+class CountingDepthMapStack(DepthMapStack):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.energies = 0
+        self.pyramids = 0
+
+    def get_energy(self, img):
+        self.energies += 1
+        return super().get_energy(img)
+
+    def get_laplacian_pyramid(self, img):
+        self.pyramids += 1
+        return super().get_laplacian_pyramid(img)
+
+
+def test_bunches_frame_cache():
+    pyramid = CountingPyramidStack()
+    depth_map = CountingDepthMapStack(map_type=constants.DM_MAP_MAX)
+    job = StackJob("job", "examples", input_path="input/img-jpg")
+    job.add_action(FocusStackBunch("stack-pyramid-cache", pyramid,
+                                   output_path="output/img-jpg-bunches-cache",
+                                   frames=3, overlap=1))
+    job.run()
+    job = StackJob("job", "examples", input_path="input/img-jpg")
+    job.add_action(FocusStackBunch("stack-depthmap-cache", depth_map,
+                                   output_path="output/img-jpg-bunches-cache",
+                                   frames=3, overlap=1, prefix='dm_'))
+    job.run()
+    n_frames = 6
+    assert sum(len(bunch) for bunch in get_bunches(list(range(n_frames)), 3, 1)) > n_frames
+    assert len(pyramid.processed) == n_frames
+    assert depth_map.energies == n_frames
+    assert depth_map.pyramids == n_frames
+    assert pyramid.frame_cache == {} and depth_map.frame_cache == {}
+
+
 if __name__ == '__main__':
     test_jpg()
     test_tif()
     test_jpg_dm()
     test_bunches()
+    test_bunches_frame_cache()
@@ -5,6 +5,8 @@ import os
 from unittest.mock import MagicMock
 from shinestacker.config.constants import constants
 from shinestacker.algorithms.depth_map import DepthMapStack
+from shinestacker.algorithms.utils import prefetch
+from shinestacker.core.metrics import add_bytes_read, io_bytes
 
 n_images = 6
 
@@ -38,6 +40,28 @@ def test_sobel_map_with_examples(example_images):
     assert np.all(sobel_map >= 0)  # Energy should always be positive
 
 
+def test_smooth_energy_matches_bilateral():
+    dms = DepthMapStack()
+    rng = np.random.default_rng(0)
+    energy = cv2.GaussianBlur(rng.random((120, 90)).astype(np.float32), (5, 5), 0)
+    energy /= energy.max()
+    expected = cv2.bilateralFilter(energy, dms.smooth_size, 25, 25)
+    smoothed = dms.smooth_energy(energy)
+    assert smoothed.dtype == np.float32
+    assert np.abs(smoothed - expected).max() < 1e-3
+    assert DepthMapStack(smooth_size=0).smooth_energy(energy) is energy
+
+
+def test_prefetch():
+    assert list(prefetch(lambda x: x * x, range(5))) == [0, 1, 4, 9, 16]
+    assert not list(prefetch(lambda x: x, []))
+    with pytest.raises(ValueError):
+        list(prefetch(int, ['1', 'x']))
+    read_0 = io_bytes()[0]
+    assert list(prefetch(lambda x: add_bytes_read(x) or x, [10, 20])) == [10, 20]
+    assert io_bytes()[0] - read_0 == 30
+
+
 def test_focus_stack_with_examples(example_images):
     dms = DepthMapStack()
     dms.process = MagicMock()
@@ -0,0 +1,80 @@
+import pytest
+import numpy as np
+import cv2
+from shinestacker.config.constants import constants
+from shinestacker.algorithms.pyramid import PyramidStack
+
+
+def reference_convolve(pyr, image):
+    return cv2.filter2D(image, -1, pyr.gen_kernel, borderType=cv2.BORDER_REFLECT101)
+
+
+def reference_reduce(pyr, layer):
+    if len(layer.shape) == 2:
+        return reference_convolve(pyr, layer)[::2, ::2]
+    return np.stack([reference_reduce(pyr, layer[:, :, c])
+                     for c in range(layer.shape[2])], axis=-1)
+
+
+def reference_expand(pyr, layer):
+    if len(layer.shape) == 2:
+        expand = np.zeros((2 * layer.shape[0], 2 * layer.shape[1]), dtype=layer.dtype)
+        expand[::2, ::2] = layer
+        return 4. * reference_convolve(pyr, expand)
+    return np.stack([reference_expand(pyr, layer[:, :, c])
+                     for c in range(layer.shape[2])], axis=-1)
+
+
+@pytest.mark.parametrize("gen_kernel", [0.3, constants.DEFAULT_PY_GEN_KERNEL, 0.5])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("shape", [(37, 53, 3), (64, 48, 3), (5, 4, 3), (33, 20)])
+def test_reduce_expand_match_reference(gen_kernel, dtype, shape):
+    pyr = PyramidStack(gen_kernel=gen_kernel)
+    rng = np.random.default_rng(0)
+    layer = (rng.random(shape) * constants.MAX_UINT16).astype(dtype)
+    tolerance = 0.05 if dtype == np.float32 else 1e-8
+    reduced = pyr.reduce_layer(layer)
+    expected = reference_reduce(pyr, layer)
+    assert reduced.shape == expected.shape
+    assert reduced.dtype == dtype
+    assert np.abs(reduced - expected).max() < tolerance
+    expanded = pyr.expand_layer(layer)
+    expected = reference_expand(pyr, layer)
+    assert expanded.shape == expected.shape
+    assert expanded.dtype == dtype
+    assert np.abs(expanded - expected).max() < tolerance
+
+
+def test_laplacian_pyramid_roundtrip():
+    pyr = PyramidStack()
+    pyr.max_pixel_value = constants.MAX_UINT8
+    rng = np.random.default_rng(1)
+    img = (rng.random((97, 130, 3)) * constants.MAX_UINT8).astype(np.uint8)
+    laplacians = pyr.process_single_image(img, 4)
+    assert all(lap.dtype == np.float32 for lap in laplacians)
+    restored = pyr.collapse(laplacians)
+    assert np.abs(restored - img).max() < 0.01
+
+
+def test_fusion_matches_reference():
+    pyr = PyramidStack()
+    pyr.dtype = np.uint8
+    pyr.num_pixel_values = constants.NUM_UINT8
+    rng = np.random.default_rng(2)
+    laplacians = (rng.standard_normal((4, 40, 30, 3)) * 20).astype(np.float32)
+    energies = [pyr.convolve(np.square(
+        cv2.cvtColor(lap, cv2.COLOR_BGR2GRAY))) for lap in laplacians]
+    best = np.argmax(energies, axis=0)
+    expected = np.zeros_like(laplacians[0])
+    for i, lap in enumerate(laplacians):
+        expected += np.where(best[:, :, np.newaxis] == i, lap, 0)
+    assert np.array_equal(pyr.fuse_laplacian(laplacians), expected)
+    images = (rng.random((3, 12, 10, 3)) * constants.MAX_UINT8).astype(np.float32)
+    gray_images = [cv2.cvtColor(img, cv2.COLOR_BGR2GRAY).astype(np.uint8) for img in images]
+    best_e = np.argmax([pyr.entropy(img) for img in gray_images], axis=0)
+    best_d = np.argmax([pyr.deviation(img) for img in gray_images], axis=0)
+    expected = np.zeros(images.shape[1:], dtype=np.float32)
+    for i, img in enumerate(images):
+        expected += np.where(best_e[:, :, np.newaxis] == i, img, 0)
+        expected += np.where(best_d[:, :, np.newaxis] == i, img, 0)
+    assert np.array_equal(pyr.get_fused_base(images), (expected / 2).astype(np.float32))
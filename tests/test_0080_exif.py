@@ -1,12 +1,14 @@
 import os
 import logging
 import numpy as np
-from PIL import Image
+import cv2
+import pytest
+from PIL import Image, ImageCms
 from PIL.ExifTags import TAGS
 from shinestacker.core.logging import setup_logging
 from shinestacker.algorithms.exif import (
     get_exif, copy_exif_from_file_to_file, print_exif, write_image_with_exif_data,
-    get_tiff_dtype_count)
+    get_tiff_dtype_count, get_metadata, write_image_with_metadata, XMLPACKET)
 
 
 NO_TEST_TIFF_TAGS = [
@@ -230,6 +232,39 @@ def test_get_tiff_dtype_count():
         assert False
 
 
+@pytest.mark.parametrize("ext", ["jpg", "png", "tif"])
+def test_write_image_with_metadata(tmp_path, ext):
+    icc = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    xmp = b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?><x:xmpmeta ' \
+        b'xmlns:x="adobe:ns:meta/"></x:xmpmeta><?xpacket end="w"?>'
+    exif = Image.Exif()
+    exif[272] = 'Test camera'
+    exif_filename = str(tmp_path / "exif.jpg")
+    Image.fromarray(np.zeros((20, 30, 3), np.uint8)).save(
+        exif_filename, exif=exif.tobytes(), icc_profile=icc, xmp=xmp)
+    metadata = get_metadata(exif_filename)
+    img = (np.random.default_rng(0).random((20, 30, 3)) * 255).astype(np.uint8)
+    out_filename = str(tmp_path / f"out.{ext}")
+    write_image_with_metadata(metadata, img, out_filename)
+    if ext == 'jpg':
+        encoded = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])[1]
+        assert np.array_equal(cv2.imread(out_filename), cv2.imdecode(encoded, cv2.IMREAD_COLOR))
+    else:
+        assert np.array_equal(cv2.imread(out_filename), img)
+    with Image.open(out_filename) as image:
+        assert image.getexif()[272] == 'Test camera'
+        assert image.info['icc_profile'] == icc
+    written = get_exif(out_filename)
+    assert written.get(272) == 'Test camera'
+    if ext != 'png':
+        assert b'<x:xmpmeta' in bytes(written[XMLPACKET])
+    copy_filename = str(tmp_path / f"copy.{ext}")
+    copy_exif_from_file_to_file(exif_filename, out_filename, copy_filename)
+    if ext != 'tif':
+        with open(out_filename, 'rb') as f, open(copy_filename, 'rb') as f_copy:
+            assert f.read() == f_copy.read()
+
+
 if __name__ == '__main__':
     test_exif_tiff()
     test_exif_jpg()
@@ -3,6 +3,7 @@ matplotlib.use('Agg')
 from shinestacker.algorithms.utils import read_img
 from shinestacker.algorithms.stack_framework import StackJob, CombinedActions
 from shinestacker.algorithms.vignetting import Vignetting, correct_vignetting
+from shinestacker.core.metrics import MetricsCollector
 
 
 def test_vignetting_function():
@@ -24,6 +25,27 @@ def test_vignetting():
         assert False
 
 
+def test_vignetting_metrics():
+    metrics = MetricsCollector()
+    job = StackJob("job", "examples", input_path="input/img-vignetted", metrics=metrics)
+    job.add_action(CombinedActions("vignette", [Vignetting()],
+                                   output_path="output/img-vignetting"))
+    job.run()
+    summary = {(s['kind'], s['name']): s for s in metrics.summary()}
+    n_frames = summary[('step', 'vignette')]['count']
+    assert n_frames > 0
+    assert summary[('read', 'read_img')]['count'] == n_frames
+    assert summary[('read', 'read_img')]['bytes_read'] > 0
+    assert summary[('sub_action', 'Vignetting')]['count'] == n_frames
+    assert summary[('write', 'write_img')]['bytes_written'] > 0
+    assert summary[('job', 'job')]['bytes_read'] == summary[('read', 'read_img')]['bytes_read']
+    # background writes are credited only to their own records
+    assert summary[('read', 'read_img')]['bytes_written'] == 0
+    assert summary[('sub_action', 'Vignetting')]['bytes_written'] == 0
+    assert summary[('sub_action', 'Vignetting')]['bytes_read'] == 0
+    assert summary[('write', 'write_img')]['bytes_read'] == 0
+
+
 if __name__ == '__main__':
     test_vignetting_function()
     test_vignetting()
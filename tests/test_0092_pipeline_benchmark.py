@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+import cv2
+
+SCRIPT = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'pipeline_benchmark.py')
+
+
+def run_script(*args, cwd=None):
+    return subprocess.run([sys.executable, SCRIPT, *args], cwd=cwd, env=os.environ.copy(),
+                          capture_output=True, text=True, check=False)
+
+
+def test_benchmark(tmp_path):
+    output = str(tmp_path / 'bench.json')
+    working_path = str(tmp_path / 'work')
+    res = run_script('--frames', '3', '--megapixels', '0.05', '--bits', '16',
+                     '--stages', 'Vignetting', 'PyramidStack', '--working-path', working_path,
+                     '-o', output)
+    assert res.returncode == 0, res.stderr
+    with open(output, encoding='utf-8') as f:
+        results = json.load(f)
+    assert results['parameters']['frames'] == 3
+    assert results['parameters']['bits'] == 16
+    assert list(results['stages'].keys()) == ['Vignetting', 'PyramidStack']
+    for stage in results['stages'].values():
+        assert stage['wall_time'] > 0
+        assert stage['cpu_time'] > 0
+    frames = sorted(os.listdir(os.path.join(working_path, 'frames')))
+    assert len(frames) == 3
+    img = cv2.imread(os.path.join(working_path, 'frames', frames[0]), cv2.IMREAD_UNCHANGED)
+    assert img.dtype == np.uint16
+    assert len(os.listdir(os.path.join(working_path, 'stack-PyramidStack'))) == 1
+    res = run_script('--compare', output, output)
+    assert res.returncode == 0
+    assert 'PyramidStack' in res.stdout
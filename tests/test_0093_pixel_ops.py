@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import cv2
+from shinestacker.config.constants import constants
+from shinestacker.algorithms.utils import (
+    img_subsample, img_proxy, img_bw_8bit, read_img, write_img)
+from shinestacker.algorithms.stack_framework import (
+    PixelOp, DeferredFrame, StackJob, CombinedActions)
+from shinestacker.algorithms.vignetting import VignettingOp, Vignetting
+from shinestacker.algorithms.balance import BalanceFrames
+
+
+class LutOp(PixelOp):
+    def __init__(self, lut):
+        self.lut = lut
+
+    def apply(self, tile, _coords):
+        return cv2.LUT(tile, self.lut)
+
+
+def make_image(shape=(300, 400, 3)):
+    h, w = shape[:2]
+    ys, xs = np.mgrid[:h, :w]
+    r = np.sqrt((xs - w / 2)**2 + (ys - h / 2)**2) / np.sqrt((w / 2)**2 + (h / 2)**2)
+    base = 60 + 150 * (0.5 + 0.5 * np.sin(xs / 7.0) * np.cos(ys / 11.0))
+    return np.dstack([base * (1 - 0.5 * r**2)] * shape[2]).astype(np.uint8)
+
+
+def vignetting_op(shape):
+    return VignettingOp(shape, np.array([400.0, 0.01, 300.0]), 200.0, 0.9, 1)
+
+
+def test_fused_ops_match_sequential():
+    img = make_image()
+    ops = [vignetting_op(img.shape), LutOp(np.arange(256, dtype=np.uint8)[::-1].copy())]
+    expected = img
+    for op in ops:
+        expected = DeferredFrame(expected)
+        expected.add_op(op)
+        expected = expected.pixels()
+    frame = DeferredFrame(img)
+    for op in ops:
+        frame.add_op(op)
+    assert np.array_equal(frame.pixels(), expected)
+    assert frame.ops == []
+
+
+def test_ops_after_warp():
+    img = make_image()
+    h, w = img.shape[:2]
+    m = np.float32([[1, 0, 7], [0, 1, -5]])
+    corrected = DeferredFrame(img)
+    corrected.add_op(vignetting_op(img.shape))
+    expected = cv2.warpAffine(corrected.pixels(), m, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    frame = DeferredFrame(img)
+    frame.add_op(vignetting_op(img.shape))
+    frame.warp(cv2.warpAffine(img, m, (w, h), borderMode=cv2.BORDER_REPLICATE), m)
+    assert np.abs(frame.pixels().astype(int) - expected).max() <= 1
+
+
+def test_proxy():
+    img = make_image()
+    frame = DeferredFrame(img)
+    frame.add_op(vignetting_op(img.shape))
+    proxy = frame.proxy(4, True)
+    assert np.array_equal(proxy, img_subsample(frame.pixels(), 4, True))
+
+
+def test_shared_proxy():
+    img = make_image()
+    frame = DeferredFrame(img)
+    proxy = frame.proxy(*Vignetting().working_resolution())
+    assert frame.proxy(*BalanceFrames().working_resolution()) is proxy
+    assert np.array_equal(proxy, img_subsample(img, 8, False))
+    frame.add_op(vignetting_op(img.shape))
+    assert not np.array_equal(frame.proxy(8, False), proxy)
+    frame.warp(img.copy(), np.eye(3))
+    assert frame.proxy(8, False) is not proxy
+
+
+def test_img_proxy():
+    img = make_image().astype(np.uint16) << 8
+    assert np.array_equal(img_proxy(img, 4, True, img_bw_8bit),
+                          img_bw_8bit(img)[::4, ::4])
+    reduced = img_proxy(img, 4, False, img_bw_8bit)
+    assert reduced.dtype == np.uint8
+    assert np.abs(reduced.astype(int) - img_subsample(img_bw_8bit(img), 4, False)).max() <= 1
+
+
+def test_vignetting_balance_job(tmp_path):
+    os.makedirs(tmp_path / "input")
+    for i in range(3):
+        img = np.clip(make_image().astype(int) + 10 * i, 0, 255).astype(np.uint8)
+        write_img(str(tmp_path / "input" / f"img-{i}.png"), img)
+    job = StackJob("job", str(tmp_path), input_path="input")
+    job.add_action(CombinedActions("corr", [
+        Vignetting(), BalanceFrames(channel=constants.BALANCE_LUMI,
+                                    corr_map=constants.BALANCE_LINEAR)],
+        output_path="output", plot_path="plots"))
+    job.run()
+    outputs = [read_img(str(tmp_path / "output" / f"img-{i}.png")) for i in range(3)]
+    assert all(o.shape == outputs[0].shape for o in outputs)
+    assert abs(outputs[0].mean() - outputs[2].mean()) < 1
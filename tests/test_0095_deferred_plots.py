@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pytest
+from shinestacker.algorithms.plots import plot_renderer
+from shinestacker.algorithms.utils import plt, save_plot
+from shinestacker.algorithms.stack_framework import StackJob, CombinedActions
+from shinestacker.algorithms.vignetting import Vignetting
+
+
+@pytest.fixture
+def deferred():
+    plot_renderer.set_deferred(True)
+    yield plot_renderer
+    plot_renderer.shutdown()
+    plot_renderer.set_deferred(None)
+
+
+def draw_histograms():
+    _fig, axs = plt.subplots(1, 2, figsize=(10, 5), sharey=True)
+    for ax, color in zip(axs, ('r', 'b')):
+        ax.set_yscale('log')
+        ax.plot(np.arange(256) + 1, color=color)
+    axs[0].set_xlabel("luminosity")
+    plt.xlim(0, 255)
+
+
+def test_deferred_plot(tmp_path, deferred):
+    filename = str(tmp_path / "plots" / "hist.pdf")
+    draw_histograms()
+    save_plot(filename)
+    plt.close('all')
+    assert deferred.is_recorded(filename)
+    png_path = deferred.thumbnail(filename).result(timeout=60)
+    assert png_path.endswith('.png')
+    assert os.path.getsize(png_path) > 0
+    assert not os.path.exists(filename)
+    assert deferred.render_file(filename).result(timeout=60) == filename
+    with open(filename, 'rb') as f:
+        assert f.read(4) == b'%PDF'
+
+
+def test_pending_plots(tmp_path, deferred):
+    filenames = [str(tmp_path / "plots" / f"hist-{i}.pdf") for i in range(3)]
+    for filename in filenames:
+        draw_histograms()
+        save_plot(filename)
+    deferred.render_file(filenames[0]).result(timeout=60)
+    futures = deferred.render_pending()
+    assert len(futures) == 2
+    assert sorted(f.result(timeout=60) for f in futures) == filenames[1:]
+    draw_histograms()
+    save_plot(str(tmp_path / "plots" / "hist-last.pdf"))
+    deferred.shutdown()
+    for filename in filenames + [str(tmp_path / "plots" / "hist-last.pdf")]:
+        with open(filename, 'rb') as f:
+            assert f.read(4) == b'%PDF'
+
+
+def test_recorded_axes(tmp_path, deferred):
+    filename = str(tmp_path / "plots" / "grid.pdf")
+    _fig, axs = plt.subplots(1, 3)
+    assert len(axs) == 3
+    for i, ax in enumerate(axs):
+        ax.plot(np.arange(10) * i)
+    _fig, grid = plt.subplots(2, 2)
+    assert [len(row) for row in grid] == [2, 2]
+    for row in grid:
+        for ax in row:
+            ax.plot(np.arange(10))
+    grid[1, 0].set_xlabel("x")
+    _fig, ax = plt.subplots()
+    with pytest.raises(TypeError):
+        iter(ax)
+    _fig, axs = plt.subplots(1, 1, squeeze=False)
+    assert len(axs) == 1 and len(axs[0]) == 1
+    axs[0][0].plot(np.arange(10))
+    save_plot(filename)
+    assert deferred.render_file(filename).result(timeout=60) == filename
+    with open(filename, 'rb') as f:
+        assert f.read(4) == b'%PDF'
+
+
+def test_direct_plot(tmp_path):
+    filename = str(tmp_path / "plots" / "hist.pdf")
+    draw_histograms()
+    save_plot(filename)
+    assert not plot_renderer.is_recorded(filename)
+    assert os.path.exists(filename)
+
+
+def test_deferred_plots_job(tmp_path, deferred):
+    plots = []
+    job = StackJob("job", "examples", input_path="input/img-vignetted",
+                   callbacks={'save_plot': lambda _id, name, path: plots.append(path)})
+    job.add_action(CombinedActions("vignette",
+                                   [Vignetting(plot_correction=True, plot_summary=True)],
+                                   output_path="output/img-vignetting-deferred",
+                                   plot_path="output/plots-deferred"))
+    job.run()
+    assert len(plots) > 1
+    for path in plots:
+        assert deferred.is_recorded(path)
+        assert os.path.exists(deferred.thumbnail(path).result(timeout=60))
@@ -4,7 +4,11 @@ import platform
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QPixmap
 from PySide6.QtCore import Qt
-from shinestacker.gui.gui_images import GuiPdfView, GuiImageView, GuiOpenApp, open_file
+from shinestacker.gui.gui_images import (GuiPdfView, GuiImageView, GuiPlotView, GuiOpenApp,
+                                         open_file)
+from shinestacker.algorithms.plots import plot_renderer
+from shinestacker.algorithms.utils import plt, save_plot
+from shinestacker.config.gui_constants import gui_constants
 
 
 @pytest.fixture
@@ -82,6 +86,30 @@ def test_gui_image_view_click(sample_image, qtbot, monkeypatch):
     assert len(calls) >= 1
 
 
+def test_gui_plot_view(tmp_path, qtbot, monkeypatch):
+    calls = []
+    monkeypatch.setattr('shinestacker.gui.gui_images.open_file', calls.append)
+    plot_renderer.set_deferred(True)
+    try:
+        filename = str(tmp_path / "plot.pdf")
+        plt.figure(figsize=(10, 5))
+        plt.plot([1, 2, 3], [3, 1, 2])
+        save_plot(filename)
+        plot_view = GuiPlotView(filename)
+        qtbot.addWidget(plot_view)
+        qtbot.waitUntil(lambda: plot_view.image_label.pixmap() is not None and
+                        not plot_view.image_label.pixmap().isNull(), timeout=60000)
+        assert plot_view.image_label.pixmap().width() == gui_constants.GUI_IMG_WIDTH
+        qtbot.mouseClick(plot_view, Qt.LeftButton)
+        qtbot.waitUntil(lambda: len(calls) == 1, timeout=60000)
+        assert calls[0] == filename
+        with open(filename, 'rb') as f:
+            assert f.read(4) == b'%PDF'
+    finally:
+        plot_renderer.shutdown()
+        plot_renderer.set_deferred(None)
+
+
 def test_gui_pdf_view_initialization(sample_pdf, qtbot):
     pdf_view = GuiPdfView(sample_pdf)
     qtbot.addWidget(pdf_view)
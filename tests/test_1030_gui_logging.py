@@ -1,5 +1,6 @@
 import pytest
 import logging
+from shinestacker.config.gui_constants import gui_constants
 from PySide6.QtWidgets import QApplication
 from shinestacker.gui.gui_logging import (SimpleHtmlFormatter, SimpleHtmlHandler,
                                           GuiLogger, QTextEditLogger, LogManager, LogWorker)
@@ -118,3 +119,60 @@ def test_log_manager_handle_end_message(log_manager):
     assert test_manager.end_status == 1
     assert test_manager.end_id_str == "test_id"
     assert test_manager.end_message == "Test end message"
+
+
+def test_simple_html_formatter_ansi():
+    formatter = SimpleHtmlFormatter()
+    message = "\r\x1b[A\x1b[1m\x1b[34maction\x1b[0m: <step> & \x1b[32mdone\x1b[0m\x1b[K"
+    html = formatter.ansi_to_html(message)
+    assert html == ('<span style="font-weight:bold"><span style="color:#000080">action</span>: '
+                    '&lt;step&gt; &amp; <span style="color:#008000">done</span>')
+
+
+def make_record(msg, level=logging.INFO):
+    return logging.LogRecord(name="test", level=level, pathname="", lineno=0,
+                             msg=msg, args=None, exc_info=None)
+
+
+def test_simple_html_handler_coalesce(qtbot, text_edit_logger):
+    handler = SimpleHtmlHandler()
+    handler.html_signal.connect(text_edit_logger.handle_html_message)
+    handler.overwrite_signal.connect(text_edit_logger.handle_overwrite_message)
+    html_batches, overwrites = [], []
+    handler.html_signal.connect(html_batches.append)
+    handler.overwrite_signal.connect(overwrites.append)
+    handler.emit(make_record("begin run"))
+    for i in range(100):
+        handler.emit(make_record(f"\r\x1b[Astep {i + 1}"))
+    handler.emit(make_record("end run"))
+    handler.flush_pending()
+    assert len(html_batches) == 2
+    assert len(overwrites) == 1
+    handler.emit(make_record("\r\x1b[Astep 101"))
+    handler.flush_pending()
+    text = text_edit_logger.text_edit.toPlainText()
+    assert text.count("step") == 2
+    assert "step 99" not in text
+    assert "step 100" in text
+    assert "step 101" in text
+    handler.emit(make_record("\r\x1b[Astep 102"))
+    handler.flush_pending()
+    text = text_edit_logger.text_edit.toPlainText()
+    assert "step 101" not in text
+    assert "step 102" in text.split("\n")[-1]
+    assert "begin run" in text
+    assert "end run" in text
+    handler.close()
+
+
+def test_text_edit_logger_max_lines(qtbot, text_edit_logger):
+    handler = SimpleHtmlHandler()
+    handler.html_signal.connect(text_edit_logger.handle_html_message)
+    for i in range(gui_constants.LOG_MAX_LINES + 100):
+        handler.emit(make_record(f"line {i}"))
+    handler.flush_pending()
+    document = text_edit_logger.text_edit.document()
+    assert document.blockCount() <= gui_constants.LOG_MAX_LINES
+    assert f"line {gui_constants.LOG_MAX_LINES + 99}" in document.toPlainText()
+    assert "line 0\n" not in document.toPlainText()
+    handler.close()
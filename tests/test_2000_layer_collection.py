@@ -105,6 +105,21 @@ def test_layer_management():
     assert lc.layer_labels == ["A", "B"]
 
 
+def test_add_layer_does_not_copy_stack():
+    lc = LayerCollection()
+    lc.set_layer_stack([np.zeros((4, 4, 3), dtype=np.uint8)])
+    layers = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(1, 4)]
+    for layer in layers:
+        lc.add_layer(layer)
+    assert lc.number_of_layers() == 4
+    for i, layer in enumerate(layers):
+        assert lc.layer_stack[i + 1] is layer
+    lc.set_layer_labels(["Master", "C", "A", "B"])
+    lc.sort_layers('asc')
+    assert [int(layer[0, 0, 0]) for layer in lc.layer_stack] == [0, 2, 3, 1]
+    assert lc.layer_stack[1] is layers[1]
+
+
 def test_sort_layers_ascending_with_master():
     lc = LayerCollection()
     master = MockLayer("master")
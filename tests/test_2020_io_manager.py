@@ -2,7 +2,7 @@ import numpy as np
 import cv2
 import pytest
 from pathlib import Path
-from shinestacker.retouch.io_manager import IOManager
+from shinestacker.retouch.io_manager import IOManager, FrameImporter
 from shinestacker.retouch.layer_collection import LayerCollection
 from shinestacker.algorithms.utils import read_img
 
@@ -60,3 +60,38 @@ def test_save_master(sample_jpg_paths, tmp_path):
     assert output_path.exists()
     saved_img_rgb = read_img(str(output_path))
     np.testing.assert_array_equal(saved_img_rgb, master)
+
+
+def test_iter_frames_keeps_order(sample_jpg_paths):
+    lc = LayerCollection()
+    io = IOManager(lc)
+    frames = list(io.iter_frames(sample_jpg_paths, max_workers=2))
+    assert [label for _, label in frames] == [Path(p).stem for p in sample_jpg_paths]
+    for (img, _), path in zip(frames, sample_jpg_paths):
+        np.testing.assert_array_equal(img, cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB))
+
+
+def test_iter_frames_cancel(sample_jpg_paths):
+    lc = LayerCollection()
+    io = IOManager(lc)
+    frames = []
+    for frame in io.iter_frames(sample_jpg_paths, max_workers=1,
+                                is_cancelled=lambda: len(frames) >= 2):
+        frames.append(frame)
+    assert len(frames) == 2
+
+
+def test_frame_importer(qtbot, sample_jpg_paths):
+    lc = LayerCollection()
+    io = IOManager(lc)
+    importer = FrameImporter(io, sample_jpg_paths[:3])
+    loaded = []
+    progress = []
+    importer.frame_loaded.connect(lambda i, img, label: loaded.append((i, label)))
+    importer.progress.connect(lambda count, total: progress.append((count, total)))
+    with qtbot.waitSignal(importer.finished, timeout=10000) as blocker:
+        importer.start()
+    importer.wait()
+    assert blocker.args == [True]
+    assert loaded == [(i, Path(p).stem) for i, p in enumerate(sample_jpg_paths[:3])]
+    assert progress == [(1, 3), (2, 3), (3, 3)]
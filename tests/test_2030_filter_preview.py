@@ -0,0 +1,76 @@
+import time
+import numpy as np
+import pytest
+from shinestacker.retouch.base_filter import BaseFilter
+
+
+def invert(image, offset=0):
+    return 255 - image + offset
+
+
+def slow_invert(image, offset=0):
+    time.sleep(0.05)
+    return invert(image, offset)
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 200, (1200, 1600, 3), dtype=np.uint8)
+
+
+def collect_results(qtbot, worker):
+    results = []
+    worker.finished.connect(lambda img, rid, region, final: results.append(
+        (img, rid, region, final)))
+    worker.start()
+    return results
+
+
+def test_progressive_preview(qtbot, image):
+    worker = BaseFilter.PreviewWorker(invert, proxy_size=400)
+    results = collect_results(qtbot, worker)
+    request_id = worker.submit(image, (10,))
+    qtbot.waitUntil(lambda: len(results) == 2, timeout=5000)
+    worker.stop()
+    (proxy_img, rid_0, _, final_0), (full_img, rid_1, _, final_1) = results
+    assert rid_0 == rid_1 == request_id
+    assert not final_0 and final_1
+    assert proxy_img.shape == image.shape
+    np.testing.assert_array_equal(full_img, invert(image, 10))
+
+
+def test_region_preview(qtbot, image):
+    worker = BaseFilter.PreviewWorker(invert, proxy_size=400)
+    results = collect_results(qtbot, worker)
+    region = (100, 200, 300, 150)
+    worker.submit(image, (), region, progressive=False)
+    qtbot.waitUntil(lambda: len(results) == 1, timeout=5000)
+    worker.stop()
+    img, _, res_region, final = results[0]
+    assert final
+    assert res_region == region
+    np.testing.assert_array_equal(img, invert(image[200:350, 100:400]))
+
+
+def test_stale_requests_are_dropped(qtbot, image):
+    worker = BaseFilter.PreviewWorker(slow_invert, proxy_size=400)
+    results = collect_results(qtbot, worker)
+    for offset in range(10):
+        last_id = worker.submit(image, (offset,))
+    qtbot.waitUntil(lambda: any(r[1] == last_id and r[3] for r in results), timeout=5000)
+    worker.stop()
+    assert all(rid <= last_id for _, rid, _, _ in results)
+    assert len(results) < 20
+    np.testing.assert_array_equal(results[-1][0], invert(image, 9))
+
+
+def test_cancel(qtbot, image):
+    worker = BaseFilter.PreviewWorker(slow_invert, proxy_size=400)
+    results = collect_results(qtbot, worker)
+    request_id = worker.submit(image)
+    worker.cancel()
+    assert worker.is_cancelled(request_id)
+    qtbot.wait(300)
+    worker.stop()
+    assert not results